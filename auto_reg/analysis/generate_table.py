@@ -75,6 +75,10 @@ def get_table_template(regression_type: str) -> str:
         return LangchainQueries.IV_TABLE
     elif regression_type == get_function_name(group_regression):
         return LangchainQueries.GROUP_TABLE
+    elif regression_type == get_function_name(moderating_regression):
+        return LangchainQueries.MODERATION_TABLE
+    elif regression_type == get_function_name(mediating_regression):
+        return LangchainQueries.MEDIATION_TABLE
     else:
         raise ValueError(f"Invalid regression type: {regression_type}")
 
@@ -0,0 +1,592 @@
+"""
+High-dimensional fixed effects absorption.
+
+PanelOLS supports at most two effects. This backend absorbs any number of
+categorical effects with the method of alternating projections (MAP): each
+effect is swept out in turn by subtracting its group means, computed with
+np.bincount on integer codes, until the columns stop changing. Only the codes
+and one array of group means per effect are kept, so memory stays linear in
+the number of rows.
+
+Select it per regression with RegressionConfig(estimator="absorb").
+"""
+
+import warnings
+import numpy as np
+import pandas as pd
+from linearmodels.panel.utility import check_absorbed
+from typing import ClassVar
+from pydantic import BaseModel, ConfigDict
+from scipy import stats
+from scipy.linalg import cho_factor, cho_solve
+
+from .covariance import Covariances, cluster_dims
+from .demean_cache import DemeanCache, fingerprint
+from .panel_frame import PanelFrame
+
+
+def effect_codes(
+    effects: list[str], df: pd.DataFrame, panel: PanelFrame | None = None
+) -> dict[str, np.ndarray]:
+    """
+    Return the integer codes of every effect, -1 where the label is missing.
+
+    Use "entity" and "time" for the two index levels and the column name for
+    other effects, as in fixed_effects(). The codes are read from panel, a
+    PanelFrame of df, when given, and otherwise encoded here.
+    """
+    if panel is None:
+        panel = PanelFrame(df, effects)
+    elif len(panel) != len(df):
+        raise ValueError("The PanelFrame does not match the rows of df")
+    return panel.effect_codes(effects)
+
+
+def compress_codes(codes: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Renumber codes so that every level in 0..G-1 is present.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: the new codes and the count of each level.
+    """
+    counts = np.bincount(codes)
+    present = counts > 0
+    if present.all():
+        return codes, counts
+    remap = np.cumsum(present) - 1
+    return remap[codes], counts[present]
+
+
+def map_demean(
+    x: np.ndarray,
+    groups: list[tuple[np.ndarray, np.ndarray]],
+    tol: float = 1e-10,
+    max_iter: int = 1000,
+) -> tuple[np.ndarray, int]:
+    """
+    Sweep every effect out of the columns of x by alternating projections.
+
+    Args:
+        x (np.ndarray): n by k array (or a single column), it is not modified.
+        groups (list[tuple[np.ndarray, np.ndarray]]): (codes, counts) of each
+            effect, see compress_codes().
+        tol (float): stop once the largest group mean removed in a sweep is
+            below tol times the scale of the column.
+        max_iter (int): maximum number of sweeps per column.
+
+    Returns:
+        tuple[np.ndarray, int]: the demeaned array and the largest number of
+        sweeps used by any column.
+    """
+    x = np.array(x, dtype=np.float64, order="F")
+    if x.ndim == 1:
+        x = x[:, None]
+    if not groups:
+        return x, 0
+
+    iterations = 0
+    for j in range(x.shape[1]):
+        col = x[:, j]
+        scale = max(np.sqrt(np.mean(col**2)), np.finfo(np.float64).tiny)
+        for sweep in range(1, max_iter + 1):
+            largest = 0.0
+            for codes, counts in groups:
+                means = np.bincount(codes, weights=col, minlength=len(counts)) / counts
+                col -= means[codes]
+                largest = max(largest, np.abs(means).max())
+            # one effect is removed exactly by a single sweep
+            if len(groups) == 1 or largest < tol * scale:
+                break
+        else:
+            warnings.warn(
+                f"Alternating projections did not converge in {max_iter} sweeps",
+                RuntimeWarning,
+                stacklevel=2,
+            )
+        iterations = max(iterations, sweep)
+    return x, iterations
+
+
+def count_absorbed_levels(
+    groups: list[tuple[np.ndarray, np.ndarray]], constant: bool
+) -> int:
+    """
+    Number of parameters used by the absorbed effects.
+
+    Same convention as PanelOLS: one level of each effect is dropped, except
+    for the first effect when the model has no constant.
+    """
+    drop_first = constant
+    levels = 0
+    for _, counts in groups:
+        levels += len(counts) - drop_first
+        drop_first = True
+    return levels
+
+
+class AbsorbingResults(BaseModel):
+    """Results of a regression fitted by absorbing the fixed effects."""
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+    title: ClassVar[str] = "AbsorbingOLS"
+    dependent: str  # name of the dependent variable
+    params: pd.Series  # estimated coefficients
+    cov: pd.DataFrame  # covariance of the coefficients
+    nobs: int  # number of observations used
+    df_model: int  # coefficients plus absorbed levels
+    df_resid: int  # nobs - df_model
+    resid_ss: float  # residual sum of squares
+    total_ss: float  # total sum of squares of the demeaned dependent variable
+    effects: dict[str, int]  # number of levels of each absorbed effect
+    cov_type: str = "clustered"  # name of cov, see covariance.py
+    nclusters: int = 0  # clusters in the first dimension of cov
+    iterations: int = 0  # sweeps used by the alternating projections
+    fitted_values: pd.DataFrame | None = None  # X @ params, without the effects
+    # other covariances computed from the same residuals, by name
+    covariances: dict[str, pd.DataFrame] = {}
+
+    def use_covariance(self, cov_type: str) -> "AbsorbingResults":
+        """Return a copy that reports the covariance named cov_type."""
+        if cov_type == self.cov_type:
+            return self
+        covariances = {self.cov_type: self.cov, **self.covariances}
+        cov = covariances.pop(cov_type)
+        return self.model_copy(
+            update={"cov": cov, "cov_type": cov_type, "covariances": covariances}
+        )
+
+    @property
+    def rsquared(self) -> float:
+        """Within R-squared, i.e. after the effects are absorbed"""
+        return 1 - self.resid_ss / self.total_ss if self.total_ss > 0 else 0.0
+
+    @property
+    def std_errors(self) -> pd.Series:
+        return pd.Series(
+            np.sqrt(np.diag(self.cov.values)), index=self.params.index, name="std_error"
+        )
+
+    @property
+    def tstats(self) -> pd.Series:
+        return (self.params / self.std_errors).rename("tstat")
+
+    @property
+    def pvalues(self) -> pd.Series:
+        pvalues = 2 * stats.t.sf(np.abs(self.tstats), self.df_resid)
+        return pd.Series(pvalues, index=self.params.index, name="pvalue")
+
+    def conf_int(self, level: float = 0.95) -> pd.DataFrame:
+        q = stats.t.ppf((1 + level) / 2, self.df_resid)
+        return pd.DataFrame(
+            {
+                "lower": self.params - q * self.std_errors,
+                "upper": self.params + q * self.std_errors,
+            }
+        )
+
+    @property
+    def summary(self) -> str:
+        absorbed = ", ".join(f"{name} ({n})" for name, n in self.effects.items())
+        header = [
+            ("Dep. Variable:", self.dependent),
+            ("Estimator:", f"{self.title} (MAP)"),
+            ("No. Observations:", str(self.nobs)),
+            ("Cov. Estimator:", self.cov_type),
+            ("No. Clusters:", str(self.nclusters)),
+            ("R-squared (Within):", f"{self.rsquared:.4f}"),
+            ("Absorbed Effects:", absorbed or "None"),
+            ("MAP Sweeps:", str(self.iterations)),
+        ]
+        return self._format_summary(header)
+
+    def _format_summary(self, header: list[tuple[str, str]]) -> str:
+        """Title, the header rows and the parameter table."""
+        table = pd.DataFrame(
+            {
+                "Parameter": self.params,
+                "Std. Err.": self.std_errors,
+                "T-stat": self.tstats,
+                "P-value": self.pvalues,
+                "Lower CI": self.conf_int()["lower"],
+                "Upper CI": self.conf_int()["upper"],
+            }
+        )
+        lines = [f"{self.title} Estimation Summary", "=" * 80]
+        lines += [f"{key:<22}{value}" for key, value in header]
+        lines += ["", "Parameter Estimates", "=" * 80]
+        lines.append(table.to_string(float_format=lambda v: f"{v:.4f}"))
+        return "\n".join(lines)
+
+    def __str__(self) -> str:
+        return self.summary
+
+    def __repr__(self) -> str:
+        return self.summary
+
+
+def absorbing_regression(
+    df: pd.DataFrame,
+    dependent_var: str,
+    exog_vars: list[str],
+    effects: list[str],
+    constant: bool = True,
+    cache: DemeanCache | None = None,
+    cov_types: list[str] | None = None,
+    panel: PanelFrame | None = None,
+) -> AbsorbingResults:
+    """
+    Fit dependent_var on exog_vars, absorbing any number of effects.
+
+    Coefficients and standard errors follow PanelOLS: with a constant, the
+    grand means are added back after demeaning, and the covariance is
+    debiased by the absorbed levels unless the only effect is nested in the
+    clusters.
+
+    cov_types names the covariances to compute (see covariance.py), by
+    default ["clustered"], i.e. by entity. The first is the result's cov, the
+    others are in its covariances.
+
+    panel, a PanelFrame of df, provides the effect and cluster codes; without
+    it they are encoded from df.
+    """
+    return absorbing_regression_multi(
+        df,
+        [dependent_var],
+        exog_vars,
+        effects,
+        constant=constant,
+        cache=cache,
+        cov_types=cov_types,
+        panel=panel,
+    )[0]
+
+
+def absorbing_regression_multi(
+    df: pd.DataFrame,
+    dependent_vars: list[str],
+    exog_vars: list[str],
+    effects: list[str],
+    constant: bool = True,
+    cache: DemeanCache | None = None,
+    cov_types: list[str] | None = None,
+    panel: PanelFrame | None = None,
+) -> list[AbsorbingResults]:
+    """
+    Fit each of dependent_vars on the same exog_vars and effects.
+
+    Outcomes that are missing on the same rows share an estimation sample.
+    For each sample the regressors are demeaned and X'X is factorized once,
+    and all outcomes are solved together as a matrix right-hand side. Only
+    the clustered covariance is computed per outcome.
+
+    Returns:
+        list[AbsorbingResults]: one result per dependent variable, in order.
+    """
+    return _absorbing_fit(
+        df, dependent_vars, exog_vars, effects, constant, cache, cov_types, panel=panel
+    )[0]
+
+
+def absorbing_regression_nested(
+    df: pd.DataFrame,
+    dependent_vars: list[str],
+    exog_vars: list[str],
+    short_vars: list[str],
+    effects: list[str],
+    constant: bool = True,
+    cache: DemeanCache | None = None,
+    short_dependent_vars: list[str] | None = None,
+    cov_types: list[str] | None = None,
+    panel: PanelFrame | None = None,
+    short_panel: PanelFrame | None = None,
+) -> tuple[list[AbsorbingResults], list[AbsorbingResults]]:
+    """
+    Fit the long model on exog_vars for each of dependent_vars, and the short
+    model on short_vars, a subset of exog_vars, for each of
+    short_dependent_vars (all dependent_vars by default).
+
+    The short model is solved from the long model's cross products: its X'X
+    and X'y are blocks of the long ones. Only its residuals, for the
+    clustered covariance, need another pass over the data. When the long
+    model drops rows the short one would keep (missing controls), the short
+    model is fitted on its own sample instead.
+
+    short_panel, a PanelFrame of df, gives the short model a sample of its
+    own (e.g. one that does not require the controls); by default it uses
+    the sample of panel.
+
+    Returns:
+        tuple[list[AbsorbingResults], list[AbsorbingResults]]: the long
+        results, one per dependent_vars, and the short results, one per
+        short_dependent_vars.
+    """
+    if short_dependent_vars is None:
+        short_dependent_vars = dependent_vars
+
+    if short_panel is None:
+        short_panel = panel
+
+    def sample(frame: PanelFrame | None) -> np.ndarray:
+        if frame is None or frame.sample is None:
+            return np.ones(len(df), dtype=bool)
+        return frame.sample
+
+    controls = [name for name in exog_vars if name not in short_vars]
+    long_rows = sample(panel) & ~df[controls].isna().to_numpy().any(axis=1)
+    if not np.array_equal(long_rows, sample(short_panel)):
+        long = _absorbing_fit(
+            df,
+            dependent_vars,
+            exog_vars,
+            effects,
+            constant,
+            cache,
+            cov_types,
+            panel=panel,
+        )
+        short = _absorbing_fit(
+            df,
+            short_dependent_vars,
+            short_vars,
+            effects,
+            constant,
+            cache,
+            cov_types,
+            panel=short_panel,
+        )
+        return long[0], short[0]
+
+    short_outcomes = [dependent_vars.index(name) for name in short_dependent_vars]
+    long, short = _absorbing_fit(
+        df,
+        dependent_vars,
+        exog_vars,
+        effects,
+        constant,
+        cache,
+        cov_types,
+        short_vars=short_vars,
+        short_outcomes=short_outcomes,
+        panel=panel,
+    )
+    return long, [short[k] for k in short_outcomes]
+
+
+def _absorbing_fit(
+    df: pd.DataFrame,
+    dependent_vars: list[str],
+    exog_vars: list[str],
+    effects: list[str],
+    constant: bool,
+    cache: DemeanCache | None,
+    cov_types: list[str] | None = None,
+    short_vars: list[str] | None = None,
+    short_outcomes: list[int] | None = None,
+    panel: PanelFrame | None = None,
+) -> tuple[list[AbsorbingResults], list[AbsorbingResults | None] | None]:
+    if cov_types is None:
+        cov_types = ["clustered"]
+    if panel is None:
+        panel = PanelFrame(df, effects + cluster_dims(cov_types))
+    codes = effect_codes(effects, df, panel)
+    ys = df[dependent_vars].to_numpy(dtype=np.float64)
+    x = df[exog_vars].to_numpy(dtype=np.float64)
+    clusters = effect_codes(cluster_dims(cov_types), df, panel)
+    short_columns = None
+    if short_vars is not None:
+        short_columns = [list(exog_vars).index(name) for name in short_vars]
+        if short_outcomes is None:
+            short_outcomes = list(range(len(dependent_vars)))
+
+    # Drop rows with missing values, as PanelOLS does, and rows out of the
+    # panel's sample
+    keep = ~np.isnan(x).any(axis=1)
+    for effect_code in [*codes.values(), *clusters.values()]:
+        keep &= effect_code >= 0
+    if panel.sample is not None:
+        keep &= panel.sample
+    valid = keep[:, None] & ~np.isnan(ys)
+
+    samples: dict[str, list[int]] = {}
+    for k in range(len(dependent_vars)):
+        samples.setdefault(fingerprint(valid[:, k]), []).append(k)
+
+    long: list[AbsorbingResults | None] = [None] * len(dependent_vars)
+    short: list[AbsorbingResults | None] = [None] * len(dependent_vars)
+    for outcomes in samples.values():
+        keep = valid[:, outcomes[0]]
+        with_short = None
+        if short_columns is not None:
+            with_short = [i for i, k in enumerate(outcomes) if k in short_outcomes]
+        long_fits, short_fits = _fit_sample(
+            ys[keep][:, outcomes],
+            x[keep],
+            {name: effect_code[keep] for name, effect_code in codes.items()},
+            {name: cluster_code[keep] for name, cluster_code in clusters.items()},
+            cov_types,
+            [dependent_vars[k] for k in outcomes],
+            list(exog_vars),
+            constant,
+            cache,
+            df.index[keep],
+            short_columns,
+            with_short,
+        )
+        for i, k in enumerate(outcomes):
+            long[k] = long_fits[i]
+        if short_fits is not None:
+            for i, fit in zip(with_short, short_fits):
+                short[outcomes[i]] = fit
+    return long, (short if short_vars is not None else None)
+
+
+def demean_columns(
+    values: np.ndarray,
+    names: list[str],
+    groups: list[tuple[np.ndarray, np.ndarray]],
+    effects: list[str],
+    cache: DemeanCache | None = None,
+) -> tuple[np.ndarray, int]:
+    """
+    Demean each column of values, reusing columns already in the cache.
+
+    Returns:
+        tuple[np.ndarray, int]: the demeaned columns and the largest number of
+        sweeps used (0 when every column came from the cache).
+    """
+    sample_key = fingerprint(*[effect_code for effect_code, _ in groups])
+    effects_key = ("absorb",) + tuple(effects)
+    iterations = 0
+
+    def demean(column: np.ndarray) -> np.ndarray:
+        nonlocal iterations
+        demeaned, sweeps = map_demean(column, groups)
+        iterations = max(iterations, sweeps)
+        return demeaned[:, 0]
+
+    columns = []
+    for j, name in enumerate(names):
+        column = values[:, j]
+        if cache is None:
+            columns.append(demean(column))
+        else:
+            key = (sample_key, effects_key, name, fingerprint(column))
+            columns.append(cache.get(key, lambda: demean(column)))
+    return np.column_stack(columns), iterations
+
+
+def covariance_fields(
+    covariances: Covariances, covs: dict[str, np.ndarray], names: list[str]
+) -> dict:
+    """The covariance fields of AbsorbingResults, from Covariances.compute()."""
+    frames = {
+        cov_type: pd.DataFrame(cov, index=names, columns=names)
+        for cov_type, cov in covs.items()
+    }
+    cov_type = covariances.cov_types[0]
+    return {
+        "cov": frames.pop(cov_type),
+        "cov_type": cov_type,
+        "nclusters": covariances.nclusters(cov_type),
+        "covariances": frames,
+    }
+
+
+def _fit_sample(
+    y: np.ndarray,
+    x: np.ndarray,
+    codes: dict[str, np.ndarray],
+    clusters: dict[str, np.ndarray],
+    cov_types: list[str],
+    dependent_vars: list[str],
+    names: list[str],
+    constant: bool,
+    cache: DemeanCache | None,
+    index: pd.Index,
+    short_columns: list[int] | None = None,
+    short_outcomes: list[int] | None = None,
+) -> tuple[list[AbsorbingResults], list[AbsorbingResults] | None]:
+    """
+    Fit the n by K outcomes y on x, all rows already in the sample.
+
+    When short_columns is given, also fit the nested model on those columns
+    of x (plus the constant) from the same cross products, for the outcomes
+    in short_outcomes.
+    """
+    groups = [compress_codes(effect_code) for effect_code in codes.values()]
+    effects = list(codes)
+
+    nobs = x.shape[0]
+    y_dm, y_sweeps = demean_columns(y, dependent_vars, groups, effects, cache)
+    x_dm, x_sweeps = demean_columns(x, names, groups, effects, cache)
+    columns = list(range(x.shape[1]))
+    if constant:
+        x = np.column_stack([x, np.ones(nobs)])
+        names = names + ["constant"]
+        if groups:
+            # A constant demeans to zero; PanelOLS adds the grand means back
+            x_dm = np.column_stack([x_dm, np.zeros(nobs)]) + x.mean(0)
+            y_dm = y_dm + y.mean(0)
+        else:
+            x_dm = np.column_stack([x_dm, np.ones(nobs)])
+        columns.append(x.shape[1] - 1)
+        if short_columns is not None:
+            short_columns = short_columns + [x.shape[1] - 1]
+
+    if groups:
+        check_absorbed(x_dm, names)
+
+    # Cross products shared by every outcome and by the nested model
+    xpx = x_dm.T @ x_dm
+    xpy = x_dm.T @ y_dm
+
+    neffects = count_absorbed_levels(groups, constant)
+    covariances = Covariances(
+        cov_types, clusters, [effect_code for effect_code, _ in groups], neffects
+    )
+
+    y_centered = y_dm - (y.mean(0) if constant else 0.0)
+    total_ss = (y_centered**2).sum(0)
+    absorbed = {name: len(counts) for name, (_, counts) in zip(effects, groups)}
+    iterations = max(x_sweeps, y_sweeps)
+
+    def solve(columns: list[int], outcomes: list[int]) -> list[AbsorbingResults]:
+        nvar = len(columns)
+        used = names if nvar == len(names) else [names[j] for j in columns]
+        x_used = x_dm if nvar == len(names) else x_dm[:, columns]
+
+        # One factorization of X'X for every outcome
+        factor = cho_factor(xpx[np.ix_(columns, columns)])
+        xpx_inv = cho_solve(factor, np.eye(nvar))
+        params = cho_solve(factor, xpy[np.ix_(columns, outcomes)])
+        eps = y_dm[:, outcomes] - x_used @ params
+        resid_ss = (eps**2).sum(0)
+        fitted = x[:, columns] @ params
+
+        results = []
+        for k, outcome in enumerate(outcomes):
+            covs = covariances.compute(x_used, eps[:, k], xpx_inv)
+            results.append(
+                AbsorbingResults(
+                    dependent=dependent_vars[outcome],
+                    params=pd.Series(params[:, k], index=used, name="parameter"),
+                    **covariance_fields(covariances, covs, used),
+                    nobs=nobs,
+                    df_model=nvar + neffects,
+                    df_resid=nobs - nvar - neffects,
+                    resid_ss=float(resid_ss[k]),
+                    total_ss=float(total_ss[outcome]),
+                    effects=absorbed,
+                    iterations=iterations,
+                    fitted_values=pd.DataFrame(
+                        fitted[:, k], index=index, columns=["fitted_values"]
+                    ),
+                )
+            )
+        return results
+
+    long = solve(columns, list(range(len(dependent_vars))))
+    short = None
+    if short_columns is not None:
+        short = solve(short_columns, short_outcomes) if short_outcomes else []
+    return long, short
@@ -0,0 +1,332 @@
+"""
+Run one research config over many panels (per country, vendor vintage or
+sample period) as a batch of load + fit jobs.
+
+Each job loads the columns of one data source that the config uses (see
+load_panel()), runs every spec of the config with run_regressions() and
+returns its coefficients as a long table, one row per (spec, result,
+term). Jobs run on a pool of worker processes that persist across jobs, so
+imports are paid once per worker and not once per panel, and each job keeps
+its own DemeanCache. Only the result tables come back to the parent, which
+appends them to one Arrow IPC or Parquet file as jobs finish: the rows of a
+dataset are contiguous, in the order the jobs completed.
+
+Memory is bounded by the number of jobs in flight. With a memory_limit, a
+job is started only while the estimated memory of the panels being fitted
+stays within the limit (a job larger than the limit runs alone), so a few
+large panels do not run side by side while small ones fill the pool. The
+estimates come from estimate_nbytes(), before any panel is loaded.
+
+Every job records where its time went (queued, load, fit) and what it
+loaded; a job that fails records its error and the batch goes on.
+"""
+
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from pydantic import BaseModel
+
+from .demean_cache import DemeanCache
+from .loader import columnar_writer, estimate_nbytes, load_panel
+from .panel_data import RegressionResult, run_regressions
+from .parallel import capped_blas_threads
+from .regression_config import ResearchConfig
+
+RESULT_COLUMNS = {
+    "dataset": "string",
+    "spec": "string",
+    "position": "int64",
+    "regression_type": "string",
+    "dependent": "string",
+    "term": "string",
+    "estimate": "float64",
+    "std_error": "float64",
+    "pvalue": "float64",
+    "nobs": "int64",
+    "rsquared": "float64",
+    "cov_type": "string",
+    "nclusters": "int64",
+}
+
+
+class DataSource(BaseModel):
+    """One panel of a batch."""
+
+    path: str
+    name: str = ""  # label of its rows in the result file, the file stem by default
+    index: list[str] | None = None  # entity and time columns, see load_panel()
+
+    @property
+    def dataset(self) -> str:
+        return self.name or Path(self.path).stem
+
+
+class JobTiming(BaseModel):
+    """What one load + fit job read, and where its time went."""
+
+    dataset: str
+    path: str
+    worker: int = 0  # process id
+    estimated_nbytes: int = 0
+    nbytes: int = 0  # loaded panel, see LoadReport
+    rows: int = 0
+    specs: int = 0
+    results: int = 0  # rows written to the result file
+    queued_seconds: float = 0.0
+    load_seconds: float = 0.0
+    fit_seconds: float = 0.0
+    error: str = ""
+
+
+class BatchReport(BaseModel):
+    """The result file of a batch and the timings of its jobs, in job order."""
+
+    path: str
+    jobs: list[JobTiming]
+    wall_seconds: float
+
+    @property
+    def failed(self) -> list[JobTiming]:
+        return [job for job in self.jobs if job.error]
+
+    def timings(self) -> pd.DataFrame:
+        """One row per job, indexed by dataset."""
+        return pd.DataFrame([job.model_dump() for job in self.jobs]).set_index(
+            "dataset"
+        )
+
+    def __str__(self) -> str:
+        table = self.timings()[
+            ["rows", "results", "queued_seconds", "load_seconds", "fit_seconds"]
+        ]
+        lines = [
+            "Batch Run",
+            "=" * 80,
+            f"{'Result File:':<22}{self.path}",
+            f"{'Jobs:':<22}{len(self.jobs)} ({len(self.failed)} failed)",
+            f"{'Wall Time:':<22}{self.wall_seconds:.2f} s",
+            f"{'Job Time:':<22}"
+            f"{(table['load_seconds'] + table['fit_seconds']).sum():.2f} s",
+            "",
+            table.to_string(float_format=lambda v: f"{v:.2f}"),
+        ]
+        lines += [f"{job.dataset}: {job.error}" for job in self.failed]
+        return "\n".join(lines)
+
+    def __repr__(self) -> str:
+        return str(self)
+
+
+def results_table(
+    regression_results: list[RegressionResult], dataset: str = ""
+) -> pd.DataFrame:
+    """
+    The coefficients of compact results (see run_regressions(compact=True))
+    as a long table with the columns of RESULT_COLUMNS, one row per
+    (spec, result, term).
+    """
+    frames = []
+    for regression_result in regression_results:
+        for position, result in enumerate(regression_result.results):
+            frames.append(
+                pd.DataFrame(
+                    {
+                        "spec": regression_result.description,
+                        "position": position,
+                        "regression_type": regression_result.regression_type,
+                        "dependent": result.dependent,
+                        "term": result.params.index,
+                        "estimate": result.params.to_numpy(),
+                        "std_error": result.std_errors.to_numpy(),
+                        "pvalue": result.pvalues.to_numpy(),
+                        "nobs": result.nobs,
+                        "rsquared": result.rsquared,
+                        "cov_type": result.cov_type,
+                        "nclusters": result.nclusters,
+                    }
+                )
+            )
+    if not frames:
+        return pd.DataFrame(
+            {name: pd.Series(dtype=dtype) for name, dtype in RESULT_COLUMNS.items()}
+        )
+    table = pd.concat(frames, ignore_index=True)
+    table.insert(0, "dataset", dataset)
+    return table.astype(RESULT_COLUMNS)
+
+
+def run_job(
+    source: DataSource,
+    research_config: ResearchConfig,
+    downcast: bool = False,
+    submitted: float | None = None,
+) -> tuple[pd.DataFrame, JobTiming]:
+    """
+    Load one data source and run every spec of the research config on it.
+
+    Args:
+        source (DataSource): the panel.
+        research_config (ResearchConfig): the specs.
+        downcast (bool): see load_panel().
+        submitted (float | None): time.time() when the job was scheduled,
+            for its queued time.
+
+    Returns:
+        tuple[pd.DataFrame, JobTiming]: the results_table() of the job, empty
+        when it failed, and its timing.
+    """
+    start = time.time()
+    timing = JobTiming(
+        dataset=source.dataset,
+        path=source.path,
+        worker=os.getpid(),
+        queued_seconds=0.0 if submitted is None else max(start - submitted, 0.0),
+    )
+    try:
+        df, report = load_panel(
+            source.path, research_config, index=source.index, downcast=downcast
+        )
+        research_config.validate_research_config(df)
+        loaded = time.time()
+        configs = research_config.generate_regression_configs()
+        regression_results = run_regressions(
+            df, configs, cache=DemeanCache(), compact=True
+        )
+        table = results_table(regression_results, source.dataset)
+    except Exception as error:
+        timing.error = f"{type(error).__name__}: {error}"
+        return results_table([], source.dataset), timing
+    timing.rows = report.rows
+    timing.nbytes = report.nbytes
+    timing.specs = len(configs)
+    timing.results = len(table)
+    timing.load_seconds = loaded - start
+    timing.fit_seconds = time.time() - loaded
+    return table, timing
+
+
+def run_batch(
+    research_config: ResearchConfig,
+    sources: list[str | Path | DataSource],
+    path: str | Path,
+    workers: int = 1,
+    memory_limit: int | None = None,
+    downcast: bool = False,
+    blas_threads: int | None = None,
+) -> BatchReport:
+    """
+    Run the research config on every data source and write all results to
+    one columnar file.
+
+    With workers > 1 the calling script must guard its entry point with
+    `if __name__ == "__main__":`, as workers are spawned.
+
+    Args:
+        research_config (ResearchConfig): the specs of every job.
+        sources (list[str | Path | DataSource]): panel files (CSV, Arrow IPC
+            or Parquet), their names default to the file stems.
+        path (str | Path): .arrow/.feather/.ipc or .parquet/.pq result file
+            with the columns of RESULT_COLUMNS.
+        workers (int): worker processes; 1 runs the jobs in this process.
+        memory_limit (int | None): bytes of loaded panels allowed in flight,
+            see the module docstring; only the worker count bounds it when
+            None.
+        downcast (bool): see load_panel().
+        blas_threads (int | None): BLAS threads per worker, by default the
+            cores divided evenly between the workers.
+
+    Raises:
+        ValueError: for two sources with the same name, or an unknown suffix
+        of path.
+    """
+    import pyarrow as pa
+
+    sources = [
+        source if isinstance(source, DataSource) else DataSource(path=str(source))
+        for source in sources
+    ]
+    names = [source.dataset for source in sources]
+    duplicated = sorted({name for name in names if names.count(name) > 1})
+    if duplicated:
+        raise ValueError(f"Data sources with the same name: {duplicated}")
+
+    path = Path(path)
+    schema = pa.Schema.from_pandas(results_table([]), preserve_index=False)
+    timings: list[JobTiming | None] = [None] * len(sources)
+    started = time.time()
+    with columnar_writer(path, schema) as writer:
+
+        def collect(job: int, table: pd.DataFrame, timing: JobTiming) -> None:
+            table = pa.Table.from_pandas(table, schema=schema, preserve_index=False)
+            writer.write_table(table)
+            timings[job] = timing
+
+        if workers <= 1:
+            for job, source in enumerate(sources):
+                collect(job, *run_job(source, research_config, downcast, time.time()))
+        else:
+            _run_pool(
+                research_config,
+                sources,
+                collect,
+                workers,
+                memory_limit,
+                downcast,
+                blas_threads,
+            )
+    return BatchReport(path=str(path), jobs=timings, wall_seconds=time.time() - started)
+
+
+def _run_pool(
+    research_config: ResearchConfig,
+    sources: list[DataSource],
+    collect,
+    workers: int,
+    memory_limit: int | None,
+    downcast: bool,
+    blas_threads: int | None,
+) -> None:
+    """Schedule the jobs on a process pool within the memory limit."""
+    if blas_threads is None:
+        blas_threads = max(1, (os.cpu_count() or 1) // workers)
+    estimates = np.zeros(len(sources), dtype=np.int64)
+    if memory_limit is not None:
+        for job, source in enumerate(sources):
+            try:
+                estimates[job] = estimate_nbytes(
+                    source.path, research_config, source.index
+                )
+            except Exception:
+                pass  # the job reports why the file cannot be read
+
+    with capped_blas_threads(blas_threads), ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+    ) as executor:
+        pending = list(range(len(sources)))
+        running = {}
+        while pending or running:
+            in_flight = sum(estimates[job] for job in running.values())
+            while pending and len(running) < workers:
+                job = pending[0]
+                if (
+                    memory_limit is not None
+                    and running
+                    and in_flight + estimates[job] > memory_limit
+                ):
+                    break
+                future = executor.submit(
+                    run_job, sources[job], research_config, downcast, time.time()
+                )
+                running[future] = pending.pop(0)
+                in_flight += estimates[job]
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                job = running.pop(future)
+                table, timing = future.result()
+                timing.estimated_nbytes = int(estimates[job])
+                collect(job, table, timing)
@@ -0,0 +1,319 @@
+"""
+Wild cluster bootstrap (WCR: restricted, null imposed) for fitted regressions.
+
+For a coefficient j and null value r, the bootstrap outcomes are
+y*_b = X_r b_r + r x_j + v_gb u_r, where (b_r, u_r) is the fit restricted to
+the null and v_gb is the weight of cluster g in draw b. Every quantity the
+bootstrap t-statistic needs reduces to cluster level:
+
+- beta*_b - r = sum_g v_gb d_g, with d_g the cluster sums of a * u_r and
+  a = X (X'X)^-1 e_j
+- the cluster score of coefficient j in draw b is v_gb d_g - (C v_b)_g,
+  with C = A (X'X)^-1 U', A and U the cluster sums of a * X and X * u_r
+
+So with the B by G weight matrix V, all draws come from two matrix products
+(V * d and V C') instead of B refits, and the cost after the setup does not
+depend on the number of rows. Draws are made in batches to bound memory, and
+can be split across processes.
+"""
+
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from pydantic import BaseModel, ConfigDict
+
+from .absorb import compress_codes, demean_columns, effect_codes
+from .covariance import ClusterSegments, parse_cov_type
+from .demean_cache import DemeanCache
+from .parallel import capped_blas_threads
+
+BOOTSTRAP_WEIGHTS = ("rademacher", "webb")
+
+# Webb's six-point distribution
+WEBB_POINTS = np.array(
+    [-np.sqrt(1.5), -1.0, -np.sqrt(0.5), np.sqrt(0.5), 1.0, np.sqrt(1.5)]
+)
+
+
+def bootstrap_weights(
+    rng: np.random.Generator, draws: int, nclusters: int, weights: str
+) -> np.ndarray:
+    """Return a draws by nclusters matrix of Rademacher or Webb weights."""
+    if weights == "rademacher":
+        return rng.integers(0, 2, size=(draws, nclusters)) * 2.0 - 1.0
+    if weights == "webb":
+        return WEBB_POINTS[rng.integers(0, 6, size=(draws, nclusters))]
+    raise ValueError(f"Unknown weights {weights!r}, expected {BOOTSTRAP_WEIGHTS}")
+
+
+class WildBootstrapResult(BaseModel):
+    """Wild cluster bootstrap of some coefficients of one regression."""
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+    dependent: str
+    params: pd.Series  # estimates of the tested coefficients
+    tstats: pd.Series  # cluster-robust t-statistics against the null
+    pvalues: pd.Series  # symmetric bootstrap p-values
+    null: float  # value of the coefficients under the null
+    draws: int
+    weights: str
+    cluster: str
+    nclusters: int
+
+    def __str__(self) -> str:
+        table = pd.DataFrame(
+            {
+                "Parameter": self.params,
+                "T-stat": self.tstats,
+                "Bootstrap P-value": self.pvalues,
+            }
+        )
+        lines = [
+            "Wild Cluster Bootstrap (WCR)",
+            "=" * 80,
+            f"{'Dep. Variable:':<22}{self.dependent}",
+            f"{'Draws:':<22}{self.draws} ({self.weights})",
+            f"{'Clusters:':<22}{self.cluster} ({self.nclusters})",
+            f"{'Null:':<22}coefficient = {self.null}",
+            "",
+            table.to_string(float_format=lambda v: f"{v:.4f}"),
+        ]
+        return "\n".join(lines)
+
+    def __repr__(self) -> str:
+        return str(self)
+
+
+def bootstrap_terms(
+    y: np.ndarray,
+    x: np.ndarray,
+    clusters: np.ndarray,
+    column: int,
+    null: float = 0.0,
+) -> tuple[float, float, np.ndarray, np.ndarray]:
+    """
+    Cluster-level terms of the WCR bootstrap of coefficient column of x.
+
+    Returns:
+        tuple: the estimate, its t-statistic against null (CR1 scaling,
+        G / (G - 1)), and the d (G) and C (G by G) terms.
+    """
+    segments = ClusterSegments(clusters)
+    nclusters = len(segments)
+    xpx_inv = np.linalg.inv(x.T @ x)
+    a = x @ xpx_inv[:, column]
+
+    params = xpx_inv @ (x.T @ y)
+    resid = y - x @ params
+    score = segments.sums(a * resid)
+    scale = nclusters / (nclusters - 1)
+    tstat = (params[column] - null) / np.sqrt(scale * (score**2).sum())
+
+    # Fit restricted to the null
+    restricted = np.delete(np.arange(x.shape[1]), column)
+    x_r = x[:, restricted]
+    y_r = y - null * x[:, column]
+    resid_r = y_r - x_r @ np.linalg.lstsq(x_r, y_r, rcond=None)[0]
+
+    d = segments.sums(a * resid_r)
+    u = segments.sums(x * resid_r[:, None])
+    big_a = segments.sums(x * a[:, None])
+    c = big_a @ xpx_inv @ u.T
+    return float(params[column]), float(tstat), d, c
+
+
+def bootstrap_tstats(v: np.ndarray, d: np.ndarray, c: np.ndarray) -> np.ndarray:
+    """Bootstrap t-statistics for the B by G weights v, see bootstrap_terms()."""
+    scale = len(d) / (len(d) - 1)
+    scores = v * d - v @ c.T
+    return (v @ d) / np.sqrt(scale * (scores**2).sum(axis=1))
+
+
+def _exceedances(
+    seed: np.random.SeedSequence,
+    draws: int,
+    weights: str,
+    terms: list[tuple[float, np.ndarray, np.ndarray]],
+    batch_size: int,
+) -> np.ndarray:
+    """Count the draws with |t*| >= |t| for each (t, d, c) in terms."""
+    rng = np.random.default_rng(seed)
+    nclusters = len(terms[0][1])
+    counts = np.zeros(len(terms), dtype=np.int64)
+    for start in range(0, draws, batch_size):
+        v = bootstrap_weights(rng, min(batch_size, draws - start), nclusters, weights)
+        for i, (tstat, d, c) in enumerate(terms):
+            counts[i] += (np.abs(bootstrap_tstats(v, d, c)) >= abs(tstat)).sum()
+    return counts
+
+
+def wild_cluster_bootstrap(
+    y: np.ndarray,
+    x: np.ndarray,
+    clusters: np.ndarray,
+    names: list[str],
+    test_names: list[str],
+    draws: int = 9999,
+    weights: str = "rademacher",
+    null: float = 0.0,
+    seed: int | None = None,
+    workers: int = 1,
+    batch_size: int = 1000,
+) -> tuple[pd.Series, pd.Series, pd.Series]:
+    """
+    WCR bootstrap p-values of test_names, on the (demeaned) arrays y and x.
+
+    Every coefficient is tested with the same weight draws.
+
+    Args:
+        y (np.ndarray): n outcomes.
+        x (np.ndarray): n by k regressors, named by names.
+        clusters (np.ndarray): n cluster codes.
+        test_names (list[str]): coefficients to test.
+        draws (int): bootstrap draws.
+        weights (str): "rademacher" or "webb".
+        null (float): value of each coefficient under the null.
+        seed (int | None): seed of the weight draws.
+        workers (int): processes to split the draws across.
+        batch_size (int): draws per matrix product.
+
+    Returns:
+        tuple[pd.Series, pd.Series, pd.Series]: estimates, t-statistics and
+        bootstrap p-values.
+    """
+    if weights not in BOOTSTRAP_WEIGHTS:
+        raise ValueError(f"Unknown weights {weights!r}, expected {BOOTSTRAP_WEIGHTS}")
+    params, tstats, terms = {}, {}, []
+    for name in test_names:
+        param, tstat, d, c = bootstrap_terms(y, x, clusters, names.index(name), null)
+        params[name], tstats[name] = param, tstat
+        terms.append((tstat, d, c))
+
+    seeds = np.random.SeedSequence(seed).spawn(max(workers, 1))
+    shares = [len(chunk) for chunk in np.array_split(np.arange(draws), len(seeds))]
+    if workers > 1:
+        blas_threads = max(1, (os.cpu_count() or 1) // workers)
+        with capped_blas_threads(blas_threads), ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+        ) as executor:
+            futures = [
+                executor.submit(_exceedances, seed, share, weights, terms, batch_size)
+                for seed, share in zip(seeds, shares)
+            ]
+            counts = sum(future.result() for future in futures)
+    else:
+        counts = _exceedances(seeds[0], draws, weights, terms, batch_size)
+
+    return (
+        pd.Series(params, name="parameter"),
+        pd.Series(tstats, name="tstat"),
+        pd.Series(counts / draws, index=test_names, name="pvalue"),
+    )
+
+
+def bootstrap_regression(
+    df: pd.DataFrame,
+    regression_result,
+    result_index: int = -1,
+    test_names: list[str] | None = None,
+    cluster: str | None = None,
+    draws: int = 9999,
+    weights: str = "rademacher",
+    null: float = 0.0,
+    seed: int | None = None,
+    workers: int = 1,
+    cache: DemeanCache | None = None,
+) -> WildBootstrapResult:
+    """
+    Wild cluster bootstrap of one fitted result of a RegressionResult.
+
+    The sample is the fitted result's (e.g. one level of a group regression)
+    and the effects and constant come from the regression config. The
+    regressors are demeaned as in absorb.py.
+
+    Args:
+        df (pd.DataFrame): the panel the result was fitted on.
+        regression_result (RegressionResult): output of run_regression(s).
+        result_index (int): which of its results, the last by default.
+        test_names (list[str] | None): coefficients to test, by default the
+            independent variables.
+        cluster (str | None): "entity", "time" or a column, by default the
+            first cluster of the config's cov_type, else entity.
+        draws, weights, null, seed, workers: see wild_cluster_bootstrap().
+        cache (DemeanCache | None): reuse demeaned columns.
+
+    Raises:
+        ValueError: for 2SLS results, or regressors not in df (e.g. the
+        interactions of a pooled heterogeneity model).
+    """
+    config = regression_result.regression_config
+    result = regression_result.results[result_index]
+    if hasattr(result, "instruments"):
+        raise ValueError("The wild bootstrap of 2SLS results is not supported")
+
+    names = list(result.params.index)
+    exog_vars = [name for name in names if name != "constant"]
+    missing = [name for name in exog_vars if name not in df.columns]
+    if missing:
+        raise ValueError(f"Regressors not in the data: {missing}")
+    if hasattr(result, "dependent") and isinstance(result.dependent, str):
+        dependent_var = result.dependent
+    else:
+        dependent_var = result.model.dependent.vars[0]
+    if test_names is None:
+        test_names = [name for name in config.independent_vars if name in names]
+    if cluster is None:
+        kind, dims = parse_cov_type(config.cov_type)
+        cluster = dims[0] if kind == "clustered" else "entity"
+
+    # used columns, on the rows of the fitted sample
+    columns = [dependent_var] + exog_vars
+    columns += [
+        col for col in config.effects + [cluster] if col not in ["entity", "time"]
+    ]
+    rows = df.index.get_indexer(result.fitted_values.index)
+    sample = df[list(dict.fromkeys(columns))].iloc[rows]
+    y = sample[dependent_var].to_numpy(dtype=np.float64)
+    x = sample[exog_vars].to_numpy(dtype=np.float64)
+    codes = effect_codes(config.effects, sample)
+    groups = [compress_codes(effect_code) for effect_code in codes.values()]
+    clusters = effect_codes([cluster], sample)[cluster]
+
+    effects = list(codes)
+    y_dm = demean_columns(y[:, None], [dependent_var], groups, effects, cache)[0]
+    x_dm = demean_columns(x, exog_vars, groups, effects, cache)[0]
+    if "constant" in names:
+        nobs = len(y)
+        if groups:
+            x_dm = np.column_stack([x_dm, np.zeros(nobs)]) + np.append(x.mean(0), 1)
+            y_dm = y_dm + y.mean()
+        else:
+            x_dm = np.column_stack([x_dm, np.ones(nobs)])
+        exog_vars = exog_vars + ["constant"]
+
+    params, tstats, pvalues = wild_cluster_bootstrap(
+        y_dm[:, 0],
+        x_dm,
+        clusters,
+        exog_vars,
+        test_names,
+        draws=draws,
+        weights=weights,
+        null=null,
+        seed=seed,
+        workers=workers,
+    )
+    return WildBootstrapResult(
+        dependent=dependent_var,
+        params=params,
+        tstats=tstats,
+        pvalues=pvalues,
+        null=null,
+        draws=draws,
+        weights=weights,
+        cluster=cluster,
+        nclusters=len(np.unique(clusters)),
+    )
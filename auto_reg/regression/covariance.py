@@ -0,0 +1,202 @@
+"""
+Covariance estimators for the array backends (absorb.py, iv.py).
+
+A covariance is named by a string:
+- "unadjusted": homoskedastic
+- "robust": heteroskedasticity robust
+- "clustered": clustered by entity
+- "clustered:<a>" or "clustered:<a>,<b>": one- or two-way clustered, where a
+  cluster is "entity", "time" or a column of the panel
+
+The scores X * e are formed once per outcome and every requested covariance
+is computed from them. The clustered meat sorts the scores by cluster code
+(the order is computed once per sample) and sums each cluster's contiguous
+segment with np.add.reduceat. Two-way clustering combines the one-way meats
+by inclusion-exclusion: S_a + S_b - S_ab, where ab is the intersection of the
+two clusterings.
+
+Small-sample scaling follows PanelOLS with debiased=True: n / (n - k - d),
+where d is the number of absorbed levels, or 0 for a clustered covariance
+when the only effect is nested in every clustering dimension.
+"""
+
+import numpy as np
+import pandas as pd
+
+COV_KINDS = ("unadjusted", "robust", "clustered")
+
+
+def parse_cov_type(cov_type: str) -> tuple[str, list[str]]:
+    """
+    Split a covariance name into its kind and clustering dimensions.
+
+    Raises:
+        ValueError: unknown kind, clusters on a non-clustered kind, or more
+        than two clustering dimensions.
+    """
+    kind, _, dims = cov_type.partition(":")
+    if kind not in COV_KINDS:
+        raise ValueError(
+            f"Unknown covariance {cov_type!r}, expected one of {COV_KINDS}"
+        )
+    if kind != "clustered":
+        if dims:
+            raise ValueError(f"Only clustered covariances take clusters: {cov_type!r}")
+        return kind, []
+    clusters = [dim.strip() for dim in dims.split(",")] if dims else ["entity"]
+    if len(clusters) > 2 or len(set(clusters)) != len(clusters):
+        raise ValueError(f"Use one or two distinct clusters: {cov_type!r}")
+    return kind, clusters
+
+
+def cluster_dims(cov_types: list[str]) -> list[str]:
+    """Every clustering dimension used by cov_types, in order of appearance."""
+    dims: list[str] = []
+    for cov_type in cov_types:
+        for dim in parse_cov_type(cov_type)[1]:
+            if dim not in dims:
+                dims.append(dim)
+    return dims
+
+
+def is_nested(effect: np.ndarray, clusters: np.ndarray) -> bool:
+    """True when every level of effect falls inside a single cluster."""
+    pairs = np.unique(np.column_stack([effect, clusters]), axis=0)
+    return len(pairs) == len(np.unique(effect))
+
+
+class ClusterSegments:
+    """
+    Sort order of the rows by cluster code and the start of each cluster.
+
+    Computed once per sample and clustering, then used for every score array.
+    """
+
+    def __init__(self, codes: np.ndarray):
+        self.order = np.argsort(codes, kind="stable")
+        sorted_codes = codes[self.order]
+        self.starts = np.flatnonzero(
+            np.concatenate([[True], sorted_codes[1:] != sorted_codes[:-1]])
+        )
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def sums(self, scores: np.ndarray) -> np.ndarray:
+        """Sum the n by k scores within each cluster, a G by k array."""
+        return np.add.reduceat(scores[self.order], self.starts, axis=0)
+
+    def cross_products(self, x: np.ndarray) -> np.ndarray:
+        """The cross products X_g'X_g of the n by k x in each cluster, G by k by k."""
+        x_sorted = x[self.order]
+        k = x.shape[1]
+        blocks = np.empty((len(self), k, k))
+        for j in range(k):
+            products = x_sorted[:, j:] * x_sorted[:, [j]]
+            blocks[:, j, j:] = np.add.reduceat(products, self.starts, axis=0)
+            blocks[:, j:, j] = blocks[:, j, j:]
+        return blocks
+
+    def meat(self, scores: np.ndarray) -> np.ndarray:
+        sums = self.sums(scores)
+        return sums.T @ sums
+
+
+def intersect_codes(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Codes of the (a, b) pairs, for the intersection of two clusterings."""
+    return pd.factorize(a.astype(np.int64) * (int(b.max()) + 1) + b)[0]
+
+
+class Covariances:
+    """
+    The requested covariances of the fits on one estimation sample.
+
+    Args:
+        cov_types (list[str]): covariance names, see parse_cov_type().
+        cluster_codes (dict[str, np.ndarray]): codes of every clustering
+            dimension used, restricted to the sample.
+        effects (list[np.ndarray]): codes of each absorbed effect.
+        neffects (int): degrees of freedom used by the absorbed effects.
+    """
+
+    def __init__(
+        self,
+        cov_types: list[str],
+        cluster_codes: dict[str, np.ndarray],
+        effects: list[np.ndarray],
+        neffects: int,
+    ):
+        self.cov_types = cov_types
+        self.neffects = neffects
+        self._kinds = {}
+        self._segments: dict[tuple[str, ...], ClusterSegments] = {}
+        self._extra_df = {}
+        for cov_type in cov_types:
+            kind, dims = parse_cov_type(cov_type)
+            self._kinds[cov_type] = (kind, dims)
+            extra_df = neffects
+            if kind == "clustered":
+                for dim in dims:
+                    self._cluster((dim,), cluster_codes)
+                if len(dims) == 2:
+                    self._cluster(tuple(dims), cluster_codes)
+                # An effect nested in the clusters does not use degrees of freedom
+                if len(effects) == 1 and all(
+                    is_nested(effects[0], cluster_codes[dim]) for dim in dims
+                ):
+                    extra_df = 0
+            self._extra_df[cov_type] = extra_df
+
+    def _cluster(
+        self, dims: tuple[str, ...], cluster_codes: dict[str, np.ndarray]
+    ) -> None:
+        if dims in self._segments:
+            return
+        if len(dims) == 1:
+            codes = cluster_codes[dims[0]]
+        else:
+            codes = intersect_codes(cluster_codes[dims[0]], cluster_codes[dims[1]])
+        self._segments[dims] = ClusterSegments(codes)
+
+    def nclusters(self, cov_type: str) -> int:
+        """Clusters in the first dimension of cov_type, 0 if not clustered."""
+        kind, dims = self._kinds[cov_type]
+        return len(self._segments[(dims[0],)]) if kind == "clustered" else 0
+
+    def compute(
+        self, x: np.ndarray, eps: np.ndarray, xpx_inv: np.ndarray
+    ) -> dict[str, np.ndarray]:
+        """
+        Every requested covariance of one fit.
+
+        Args:
+            x (np.ndarray): n by k regressors of the score (the projected
+                regressors for 2SLS).
+            eps (np.ndarray): n residuals.
+            xpx_inv (np.ndarray): inverse of x'x.
+        """
+        nobs, nvar = x.shape
+        scores = x * eps[:, None]
+        meats: dict[tuple[str, ...], np.ndarray] = {}
+
+        def meat(dims: tuple[str, ...]) -> np.ndarray:
+            if dims not in meats:
+                meats[dims] = self._segments[dims].meat(scores)
+            return meats[dims]
+
+        out = {}
+        for cov_type in self.cov_types:
+            kind, dims = self._kinds[cov_type]
+            scale = nobs / (nobs - self._extra_df[cov_type] - nvar)
+            if kind == "unadjusted":
+                cov = scale * float(eps @ eps) / nobs * xpx_inv
+            else:
+                if kind == "robust":
+                    xeex = scores.T @ scores
+                elif len(dims) == 1:
+                    xeex = meat((dims[0],))
+                else:
+                    xeex = meat((dims[0],)) + meat((dims[1],)) - meat(tuple(dims))
+                cov = scale * xpx_inv @ xeex @ xpx_inv
+            out[cov_type] = (cov + cov.T) / 2
+        return out
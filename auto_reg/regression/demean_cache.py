@@ -0,0 +1,187 @@
+import hashlib
+import numpy as np
+from linearmodels.panel import PanelOLS
+from linearmodels.panel.data import PanelData
+from linearmodels.shared.utility import ensure_unique_column
+
+
+def fingerprint(*arrays: np.ndarray) -> str:
+    """
+    Return a short digest of the raw buffers of the given arrays.
+
+    Dtype and shape are part of the digest, so two arrays only share a
+    fingerprint when they hold exactly the same values.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for array in arrays:
+        array = np.ascontiguousarray(array)
+        digest.update(f"{array.dtype}{array.shape}".encode())
+        digest.update(memoryview(array).cast("B"))
+    return digest.hexdigest()
+
+
+class DemeanCache:
+    """
+    Cache of within-transformed (demeaned) columns shared across regressions.
+
+    The key is (sample, effects, column):
+    - sample: fingerprint of the estimation sample, i.e. the entity, time and
+      other-effect codes left after missing values are dropped
+    - effects: which effects are absorbed
+    - column: the column name and a fingerprint of its values in the sample
+
+    Specs that use the same column under the same effects and sample read the
+    transformed column from the cache instead of demeaning it again.
+    """
+
+    def __init__(self):
+        self._columns: dict[tuple, np.ndarray] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: tuple, compute) -> np.ndarray:
+        """
+        Return the cached column for key, computing and storing it on a miss.
+
+        Args:
+            key (tuple): (sample, effects, column) key of the column.
+            compute (Callable[[], np.ndarray]): builds the column on a miss.
+        """
+        column = self._columns.get(key)
+        if column is not None:
+            self.hits += 1
+            return column
+
+        self.misses += 1
+        column = compute()
+        self._columns[key] = column
+        return column
+
+    def clear(self) -> None:
+        """Drop every cached column and reset the counters."""
+        self._columns.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self) -> dict[str, int]:
+        """Return the hit/miss counts and the number of cached columns."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "columns": len(self._columns),
+            "nbytes": sum(column.nbytes for column in self._columns.values()),
+        }
+
+    def __len__(self) -> int:
+        return len(self._columns)
+
+
+class CachedPanelOLS(PanelOLS):
+    """
+    PanelOLS that reads its within-transformed columns from a DemeanCache.
+
+    Only the demeaning step is replaced, so the fitted PanelEffectsResults is
+    the same as the one from PanelOLS.
+    """
+
+    def __init__(self, *args, cache: DemeanCache, **kwargs):
+        super().__init__(*args, **kwargs)
+        # results print the model's name; they should read as plain PanelOLS
+        self._name = "PanelOLS"
+        self._demean_cache = cache
+        self._demean_groups: PanelData | None = None
+
+    def __getstate__(self) -> dict:
+        # Results keep a reference to their model; do not pickle the cache with it
+        state = self.__dict__.copy()
+        state["_demean_cache"] = None
+        state["_demean_groups"] = None
+        return state
+
+    def _effects_key(self, low_memory: bool) -> tuple:
+        effects = []
+        if self.entity_effects:
+            effects.append("entity")
+        if self.time_effects:
+            effects.append("time")
+        if self.other_effects:
+            effects.extend(str(col) for col in self._other_effect_cats.vars)
+        return tuple(effects) + (("low_memory",) if low_memory else ())
+
+    def _sample_key(self) -> str:
+        codes = [self.dependent.entity_ids, self.dependent.time_ids]
+        if self.other_effects:
+            codes.append(self._other_effect_cats.values2d)
+        return fingerprint(*codes)
+
+    def _groups(self) -> PanelData:
+        """Return the other-effect groups, plus entity or time when also absorbed."""
+        if self._demean_groups is None:
+            groups = self._other_effect_cats
+            if self.entity_effects or self.time_effects:
+                groups = groups.copy()
+                if self.entity_effects:
+                    effect = self.dependent.entity_ids
+                else:
+                    effect = self.dependent.time_ids
+                col = ensure_unique_column("additional.effect", groups.dataframe)
+                groups.dataframe[col] = effect
+            self._demean_groups = groups
+        return self._demean_groups
+
+    def _demean_column(self, column: PanelData, low_memory: bool) -> np.ndarray:
+        """Same branches as PanelOLS._fast_path, for a single column."""
+        if self.other_effects:
+            demeaned = column.general_demean(self._groups())
+        elif self.entity_effects and self.time_effects:
+            demeaned = column.demean("both", low_memory=low_memory)
+        elif self.entity_effects:
+            demeaned = column.demean("entity")
+        else:
+            demeaned = column.demean("time")
+        return demeaned.values2d[:, 0]
+
+    def _cached_columns(
+        self, panel: PanelData, sample_key: str, effects_key: tuple, low_memory: bool
+    ) -> np.ndarray:
+        values = panel.values2d
+        frame = panel.dataframe
+        columns = []
+        for i, col in enumerate(frame.columns):
+            if panel is self.exog and self.has_constant and i == self._constant_index:
+                # A constant demeans to zero under any effect
+                columns.append(np.zeros(values.shape[0]))
+                continue
+            key = (sample_key, effects_key, str(col), fingerprint(values[:, i]))
+            columns.append(
+                self._demean_cache.get(
+                    key,
+                    lambda: self._demean_column(
+                        PanelData(frame.iloc[:, [i]]), low_memory
+                    ),
+                )
+            )
+        return np.column_stack(columns)
+
+    def _fast_path(self, low_memory: bool):
+        if not self._has_effect:
+            return super()._fast_path(low_memory)
+
+        _y = self.dependent.values2d
+        _x = self.exog.values2d
+        ybar = np.asarray(_y.mean(0))
+
+        sample_key = self._sample_key()
+        effects_key = self._effects_key(low_memory)
+        y_arr = self._cached_columns(
+            self.dependent, sample_key, effects_key, low_memory
+        )
+        x_arr = self._cached_columns(self.exog, sample_key, effects_key, low_memory)
+
+        if self.has_constant:
+            y_arr = y_arr + ybar
+            x_arr = x_arr + _x.mean(0)
+        else:
+            ybar = np.asarray(0.0)
+
+        return y_arr, x_arr, ybar
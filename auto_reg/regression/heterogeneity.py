@@ -0,0 +1,179 @@
+"""
+Heterogeneity analysis over the levels of a group variable.
+
+The panel is sorted by the group codes once. Every level is then a
+contiguous block of rows, so the per-level samples are row slices of the
+sorted frame (views, not copies) and a group variable with many levels
+(terciles, industries, regions) costs one sort instead of one boolean-mask
+copy of the frame per level.
+"""
+
+import numpy as np
+import pandas as pd
+from pydantic import BaseModel
+from scipy import stats
+
+from .absorb import effect_codes
+from .panel_frame import PanelFrame
+
+
+class GroupedPanel:
+    """
+    A panel sorted by the levels of one group variable.
+
+    Rows whose group is missing are moved to the front and left out of every
+    level. Within a level the rows keep their original order.
+
+    The group codes are read from panel, a PanelFrame of df, when given (it
+    must encode group_var), and otherwise encoded here. Rows out of the
+    panel's sample are treated as missing a group.
+
+    Attributes:
+        df (pd.DataFrame): the sorted panel.
+        panel (PanelFrame): the codes of the sorted panel.
+        levels (pd.Index): the group levels, sorted (category order for
+            categoricals).
+        offsets (np.ndarray): level i is rows offsets[i]:offsets[i + 1].
+        codes (np.ndarray): the level code of every sorted row, -1 if missing.
+    """
+
+    def __init__(
+        self,
+        df: pd.DataFrame,
+        group_var: str,
+        columns: list[str] | None = None,
+        panel: PanelFrame | None = None,
+    ):
+        if panel is None:
+            panel = PanelFrame(df, [group_var])
+        codes = panel.codes[group_var]
+        levels = panel.levels[group_var]
+        present = panel.counts[group_var] > 0
+        if panel.sample is not None:
+            # rows out of the sample are left out like missing groups
+            codes = np.where(panel.sample, codes, -1)
+            present = np.bincount(codes[codes >= 0], minlength=len(levels)) > 0
+        if not present.all():
+            # panel is a subset of the rows: drop the levels it does not have
+            codes = np.append(np.cumsum(present) - 1, -1).astype(np.int32)[codes]
+            levels = levels[present]
+        order = np.argsort(codes, kind="stable")
+        if columns is not None:
+            df = df[list(dict.fromkeys(columns + [group_var]))]
+        self.df = df.take(order)
+        self.panel = panel.take(order)
+        self.group_var = group_var
+        self.levels = pd.Index(levels)
+        self.codes = codes[order]
+        self.offsets = np.searchsorted(self.codes, np.arange(len(levels) + 1))
+
+    def __len__(self) -> int:
+        return len(self.levels)
+
+    def bounds(self, i: int) -> tuple[int, int]:
+        """Row range of level i in the sorted panel."""
+        return int(self.offsets[i]), int(self.offsets[i + 1])
+
+    def level(self, i: int) -> pd.DataFrame:
+        """Rows of level i, a slice of the sorted panel."""
+        start, stop = self.bounds(i)
+        return self.df.iloc[start:stop]
+
+    def valid(self) -> pd.DataFrame:
+        """Rows that belong to some level."""
+        return self.df.iloc[self.offsets[0] :]
+
+    def valid_panel(self) -> PanelFrame:
+        """The codes of valid()."""
+        return self.panel.take(slice(self.offsets[0], None))
+
+    def nested_in(self, effects: list[str]) -> bool:
+        """
+        Whether the group is constant within the levels of one of the effects,
+        in which case the level dummies are absorbed by that effect.
+        """
+        df = self.valid()
+        group = self.codes[self.offsets[0] :]
+        panel = self.valid_panel()
+        if not all(effect in panel for effect in effects):
+            panel = None
+        for codes in effect_codes(effects, df, panel).values():
+            pairs = pd.unique(codes.astype(np.int64) * len(self.levels) + group)
+            if len(pairs) == len(pd.unique(codes)):
+                return True
+        return False
+
+    def interacted(
+        self, exog_vars: list[str], dummies: bool
+    ) -> tuple[pd.DataFrame, list[str]]:
+        """
+        Build the fully interacted pooled sample.
+
+        Every regressor is interacted with the dummy of each level but the
+        first, so the interaction coefficients are the differences from the
+        first level.
+
+        Args:
+            exog_vars (list[str]): regressors to interact.
+            dummies (bool): also add the level dummies (when they are not
+                absorbed by the effects).
+
+        Returns:
+            tuple[pd.DataFrame, list[str]]: the valid rows with the added
+            columns, and the names of the interaction columns.
+        """
+        df = self.valid()
+        group = self.codes[self.offsets[0] :]
+        x = df[exog_vars].to_numpy(dtype=np.float64)
+
+        added = {}
+        interactions = []
+        for i in range(1, len(self.levels)):
+            dummy = (group == i).astype(np.float64)
+            suffix = f"{self.group_var}={self.levels[i]}"
+            if dummies:
+                added[suffix] = dummy
+            for j, var in enumerate(exog_vars):
+                name = f"{var}:{suffix}"
+                added[name] = x[:, j] * dummy
+                interactions.append(name)
+        return df.assign(**added), interactions
+
+
+class WaldTest(BaseModel):
+    """F form of a Wald test that some coefficients are jointly zero."""
+
+    stat: float  # Wald statistic divided by the number of restrictions
+    pval: float
+    df_num: int  # number of restrictions
+    df_denom: int  # residual degrees of freedom of the model
+    restrictions: list[str]  # names of the coefficients restricted to zero
+
+    def __str__(self) -> str:
+        return (
+            f"Wald test of {self.df_num} restrictions: "
+            f"F({self.df_num}, {self.df_denom}) = {self.stat:.4f}, "
+            f"p-value = {self.pval:.4f}"
+        )
+
+
+def wald_test(result, names: list[str]) -> WaldTest:
+    """
+    Test that the named coefficients of a fitted result are jointly zero,
+    using the result's (clustered) covariance.
+
+    Args:
+        result (PanelEffectsResults | AbsorbingResults): fitted regression.
+        names (list[str]): coefficients under test.
+    """
+    params = result.params[names].to_numpy()
+    cov = result.cov.loc[names, names].to_numpy()
+    stat = float(params @ np.linalg.solve(cov, params)) / len(names)
+    df_denom = int(result.df_resid)
+    return WaldTest(
+        stat=stat,
+        pval=float(stats.f.sf(stat, len(names), df_denom)),
+        df_num=len(names),
+        df_denom=df_denom,
+        restrictions=names,
+    )
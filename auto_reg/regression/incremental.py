@@ -0,0 +1,324 @@
+"""
+Regressions updated in place as new periods are appended to the panel.
+
+An IncrementalFit keeps sufficient statistics instead of the data. With
+z = [y, x, d] a row of the dependent variable, the regressors and the dummies
+of the other effects, it stores for each level i of the first effect the
+count n_i, the sums s_i and the products S_i of z. The within products of a
+level are S_i - s_i s_i' / n_i; their total gives the coefficients and their
+sums within each cluster give the clustered scores, as in streaming.py.
+
+New rows only change the levels they fall in: the within products of those
+levels are taken out of the totals, recomputed and added back. An update
+costs the new rows times p^2 plus one solve and the per-cluster scores,
+whatever the length of the history.
+
+The first effect is absorbed, the others (typically the periods, one new
+level per update) enter as dummies. The coefficients are those of absorbing
+every effect (Frisch-Waugh-Lovell), so they match the "absorb" estimator,
+but the dummies make p grow with the levels of the other effects, which
+should be few. Covariances: "unadjusted" and one-way "clustered", where the
+first effect must be nested in the clusters (entity effects with entity or
+industry clusters). This is checked as the rows arrive.
+"""
+
+import numpy as np
+import pandas as pd
+from scipy.linalg import cho_factor, cho_solve
+
+from .absorb import AbsorbingResults
+from .covariance import ClusterSegments, parse_cov_type
+from .panel_data import RegressionResult, run_regression
+from .regression_config import RegressionConfig
+from .streaming import LevelCodes, _labels
+
+
+def _pad(array: np.ndarray, sizes: dict[int, int]) -> np.ndarray:
+    """Grow the given axes of array with zeros, sizes maps axis to length."""
+    width = [(0, sizes.get(axis, n) - n) for axis, n in enumerate(array.shape)]
+    return np.pad(array, width)
+
+
+def _within(counts: np.ndarray, sums: np.ndarray, products: np.ndarray):
+    """Within-level products S - s s' / n of each level."""
+    n = np.maximum(counts, 1)[:, None, None]
+    return products - sums[:, :, None] * sums[:, None, :] / n
+
+
+class IncrementalFit:
+    """
+    One regression absorbing the effects, updatable with new rows.
+
+    Call update() with the initial panel, then with each batch of new rows
+    (indexed by entity and time as the panel), and result() for the fit on
+    every row added so far. The fit can be pickled between updates.
+
+    Args:
+        dependent_var (str): dependent variable.
+        exog_vars (list[str]): regressors.
+        effects (list[str]): "entity", "time" or columns. The first is
+            absorbed, the others are fitted as dummies.
+        cov_type (str): "unadjusted" or one-way "clustered[:<cluster>]".
+        constant (bool): include a constant.
+    """
+
+    def __init__(
+        self,
+        dependent_var: str,
+        exog_vars: list[str],
+        effects: list[str],
+        cov_type: str = "clustered",
+        constant: bool = True,
+    ):
+        if not effects:
+            raise ValueError("An incremental fit needs an effect to absorb")
+        kind, dims = parse_cov_type(cov_type)
+        if kind == "robust" or len(dims) > 1:
+            raise ValueError(f"{cov_type!r} cannot be updated incrementally")
+        self.dependent_var = dependent_var
+        self.exog_vars = list(exog_vars)
+        self.effects = list(effects)
+        self.cov_type = cov_type
+        self.constant = constant
+        self.cluster = dims[0] if dims else None
+        keys = self.effects + ([self.cluster] if self.cluster else [])
+        self.codes = {key: LevelCodes() for key in dict.fromkeys(keys)}
+        # column of the dummy of each (effect, level), the first level has none
+        self.dummies: dict[tuple[str, int], int] = {}
+
+        width = 1 + len(self.exog_vars)
+        self.nobs = 0
+        self.totals = np.zeros(width)  # sums of y and x, for the grand means
+        self.shift = None  # subtracted from y and x for accuracy
+        self.counts = np.zeros(0, dtype=np.int64)
+        self.sums = np.zeros((0, width))
+        self.products = np.zeros((0, width, width))
+        self.within = np.zeros((width, width))
+        self.cluster_of = np.zeros(0, dtype=np.int64)  # of each absorbed level
+        self.cluster_within = np.zeros((0, width, width))
+
+    def update(self, df: pd.DataFrame) -> "IncrementalFit":
+        """
+        Add new rows. Rows already added must not be passed again.
+
+        Raises:
+            ValueError: when the rows put a level of the first effect in a
+            second cluster. The fit is left unchanged.
+        """
+        frame = df.reset_index()
+        index = list(df.index.names)
+        variables = [self.dependent_var] + self.exog_vars
+        values = frame[variables].to_numpy(dtype=np.float64)
+        labels = {key: _labels(frame, key, index) for key in self.codes}
+        valid = ~np.isnan(values).any(axis=1)
+        for key in self.codes:
+            valid &= labels[key].notna().to_numpy()
+        values = values[valid]
+        labels = {key: label[valid] for key, label in labels.items()}
+        if self.cluster is not None and self.cluster != self.effects[0]:
+            self._check_nested(labels[self.effects[0]], labels[self.cluster])
+        if not len(values):
+            return self
+        codes = {key: self.codes[key].codes(label) for key, label in labels.items()}
+
+        for effect in self.effects[1:]:
+            for code in np.unique(codes[effect]):
+                if code > 0 and (effect, code) not in self.dummies:
+                    self.dummies[(effect, code)] = len(self.dummies)
+        self._grow()
+
+        if self.shift is None:
+            self.shift = values.mean(0)
+        z = np.zeros((len(values), self.within.shape[0]))
+        z[:, : values.shape[1]] = values - self.shift
+        for effect in self.effects[1:]:
+            column = np.full(len(self.codes[effect]), -1)
+            for (name, code), j in self.dummies.items():
+                if name == effect:
+                    column[code] = values.shape[1] + j
+            rows = np.flatnonzero(column[codes[effect]] >= 0)
+            z[rows, column[codes[effect]][rows]] = 1.0
+
+        level = codes[self.effects[0]]
+        segments = ClusterSegments(level)
+        touched = level[segments.order[segments.starts]]
+        old = _within(self.counts[touched], self.sums[touched], self.products[touched])
+        self.counts[touched] += np.diff(np.append(segments.starts, len(level)))
+        self.sums[touched] += segments.sums(z)
+        self.products[touched] += segments.sums(z[:, :, None] * z[:, None, :])
+        delta = (
+            _within(self.counts[touched], self.sums[touched], self.products[touched])
+            - old
+        )
+        self.within += delta.sum(0)
+        if self.cluster is not None:
+            self.cluster_of[level] = codes[self.cluster]
+            np.add.at(self.cluster_within, self.cluster_of[touched], delta)
+        self.nobs += len(values)
+        self.totals += values.sum(0)
+        return self
+
+    def _check_nested(self, levels: pd.Series, clusters: pd.Series) -> None:
+        """Raise unless every level of the first effect stays in one cluster."""
+        pairs = pd.DataFrame(
+            {"level": levels.to_numpy(), "cluster": clusters.to_numpy()}
+        ).drop_duplicates()
+        nested = not pairs["level"].duplicated().any()
+        known = self.codes[self.effects[0]].levels.get_indexer(pairs["level"])
+        seen = known >= 0
+        if nested and seen.any():
+            cluster_codes = self.codes[self.cluster].levels.get_indexer(
+                pairs["cluster"][seen]
+            )
+            nested = bool((self.cluster_of[known[seen]] == cluster_codes).all())
+        if not nested:
+            raise ValueError(
+                f"{self.effects[0]!r} is not nested in the clusters "
+                f"{self.cluster!r}, the clustered covariance cannot be updated"
+            )
+
+    def _grow(self) -> None:
+        """Make room for new levels, clusters and dummy columns."""
+        nlevels = len(self.codes[self.effects[0]])
+        width = 1 + len(self.exog_vars) + len(self.dummies)
+        self.counts = _pad(self.counts, {0: nlevels})
+        self.sums = _pad(self.sums, {0: nlevels, 1: width})
+        self.products = _pad(self.products, {0: nlevels, 1: width, 2: width})
+        self.within = _pad(self.within, {0: width, 1: width})
+        if self.cluster is not None:
+            nclusters = len(self.codes[self.cluster])
+            self.cluster_of = _pad(self.cluster_of, {0: nlevels})
+            self.cluster_within = _pad(
+                self.cluster_within, {0: nclusters, 1: width, 2: width}
+            )
+
+    def result(self) -> AbsorbingResults:
+        """The fit on every row added so far."""
+        nobs = self.nobs
+        k = len(self.exog_vars)
+        x, d = slice(1, 1 + k), slice(1 + k, None)
+        w = self.within
+        # y and x net of the dummies
+        if self.dummies:
+            gamma = np.linalg.pinv(w[d, d]) @ w[d, : 1 + k]
+        else:
+            gamma = np.zeros((0, 1 + k))
+        resid = w[: 1 + k, : 1 + k] - w[: 1 + k, d] @ gamma
+        factor = cho_factor(resid[x, x])
+        xpx_inv = cho_solve(factor, np.eye(k))
+        params = cho_solve(factor, resid[x, 0])
+        total_ss = float(resid[0, 0])
+        resid_ss = float(total_ss - resid[x, 0] @ params)
+
+        # levels used by the effects, as count_absorbed_levels()
+        effects = {effect: len(self.codes[effect]) for effect in self.effects}
+        neffects = sum(effects.values()) - len(effects) + (not self.constant)
+        nvar = k + self.constant
+        if self.cluster is None:
+            s2 = resid_ss / (nobs - neffects - nvar)
+            cov = s2 * xpx_inv
+            nclusters = 0
+        else:
+            # residual e = z . coef within each absorbed level
+            coef = np.concatenate(
+                [[1.0], -params, -(gamma[:, 0] - gamma[:, 1:] @ params)]
+            )
+            scores = self.cluster_within @ coef
+            scores = scores[:, x] - scores[:, d] @ gamma[:, 1:]
+            # the only effect is nested in the clusters
+            extra_df = 0 if len(effects) == 1 else neffects
+            scale = nobs / (nobs - extra_df - nvar)
+            cov = scale * xpx_inv @ (scores.T @ scores) @ xpx_inv
+            nclusters = len(self.codes[self.cluster])
+
+        names = list(self.exog_vars)
+        if self.constant:
+            # the constant is the grand mean: its score sums to zero within
+            # every level of the absorbed effect, hence every cluster
+            means = self.totals / nobs
+            params = np.append(params, means[0] - means[1:] @ params)
+            cross = -means[1:] @ cov
+            variance = means[1:] @ cov @ means[1:]
+            if self.cluster is None:
+                variance += s2 / nobs
+            cov = np.block([[cov, cross[:, None]], [cross, variance]])
+            names.append("constant")
+        cov = (cov + cov.T) / 2
+
+        return AbsorbingResults(
+            dependent=self.dependent_var,
+            params=pd.Series(params, index=names, name="parameter"),
+            cov=pd.DataFrame(cov, index=names, columns=names),
+            nobs=nobs,
+            df_model=nvar + neffects,
+            df_resid=nobs - nvar - neffects,
+            resid_ss=resid_ss,
+            total_ss=total_ss,
+            effects=effects,
+            cov_type=self.cov_type,
+            nclusters=nclusters,
+        )
+
+
+class IncrementalRegressions:
+    """
+    The basic specs of a research config, updated as periods are appended.
+
+    Each spec keeps one IncrementalFit per model (with and without
+    controls). Results match run_regressions() with the "absorb" estimator
+    on every row added so far.
+
+    Args:
+        regression_configs (dict[str, RegressionConfig]): specs by
+            description; 2SLS, group, moderating and mediating specs, and
+            extra covariances, raise a ValueError.
+    """
+
+    def __init__(self, regression_configs: dict[str, RegressionConfig]):
+        unsupported = [
+            description
+            for description, config in regression_configs.items()
+            if config.instrument_var
+            or config.instrument_vars
+            or config.group_var
+            or config.moderating_var
+            or config.mediating_var
+            or config.extra_cov_types
+        ]
+        if unsupported:
+            raise ValueError(f"Only basic panel specs can be updated: {unsupported}")
+        self.regression_configs = regression_configs
+        self.fits: dict[str, list[IncrementalFit]] = {}
+        for description, config in regression_configs.items():
+            models = [config.independent_vars + config.control_vars]
+            if config.run_another_regression_without_controls:
+                models = [config.independent_vars] + models
+            self.fits[description] = [
+                IncrementalFit(
+                    config.dependent_vars[0],
+                    exog_vars,
+                    config.effects,
+                    cov_type=config.cov_type,
+                    constant=config.constant,
+                )
+                for exog_vars in models
+            ]
+
+    def update(self, df: pd.DataFrame) -> list[RegressionResult]:
+        """Add the new rows to every fit and return the updated results."""
+        for fits in self.fits.values():
+            for fit in fits:
+                fit.update(df)
+        return self.results()
+
+    def results(self) -> list[RegressionResult]:
+        # the results are given, run_regression does not read the data
+        return [
+            run_regression(
+                None,
+                description,
+                config,
+                results=[fit.result() for fit in self.fits[description]],
+            )
+            for description, config in self.regression_configs.items()
+        ]
@@ -0,0 +1,239 @@
+"""
+Instrumental variables (2SLS) with absorbed fixed effects.
+
+Everything works on arrays taken from the panel's columns; the panel itself
+is never copied or extended. The effects are absorbed as in absorb.py, so
+the demeaned columns are shared with the other regressions through the
+DemeanCache.
+
+For endogenous regressors X, exogenous regressors W and excluded instruments
+Z (all demeaned):
+- first stage: each column of X on [Z, W], giving the projection X_hat
+- second stage: y on [X_hat, W]
+The second-stage residuals use the actual X, and the clustered covariance
+uses the scores of [X_hat, W], so the standard errors are the 2SLS ones, not
+those of OLS on fitted values. Outcomes that share the regressors and
+instruments reuse the first stage and one factorization of the projected
+cross products.
+"""
+
+import numpy as np
+import pandas as pd
+from scipy.linalg import cho_factor, cho_solve
+
+from .absorb import (
+    AbsorbingResults,
+    _fit_sample,
+    compress_codes,
+    count_absorbed_levels,
+    covariance_fields,
+    demean_columns,
+    effect_codes,
+)
+from .covariance import Covariances, cluster_dims
+from .demean_cache import DemeanCache, fingerprint
+from .heterogeneity import WaldTest, wald_test
+from .panel_frame import PanelFrame
+
+
+class IVResults(AbsorbingResults):
+    """Second stage of a 2SLS regression with absorbed effects."""
+
+    title = "IV-2SLS"
+    endogenous: list[str]  # instrumented regressors
+    instruments: list[str]  # excluded instruments
+    first_stage_f: dict[str, WaldTest]  # excluded instruments, per endogenous
+
+    @property
+    def summary(self) -> str:
+        lines = [super().summary, "", "First Stage (excluded instruments)", "=" * 80]
+        lines += [f"{name:<22}{test}" for name, test in self.first_stage_f.items()]
+        return "\n".join(lines)
+
+
+def iv_regression(
+    df: pd.DataFrame,
+    dependent_vars: list[str],
+    endogenous_vars: list[str],
+    exog_vars: list[str],
+    instrument_vars: list[str],
+    effects: list[str],
+    constant: bool = True,
+    cache: DemeanCache | None = None,
+    cov_types: list[str] | None = None,
+    panel: PanelFrame | None = None,
+) -> tuple[list[AbsorbingResults], list[IVResults]]:
+    """
+    2SLS of each of dependent_vars on endogenous_vars and exog_vars, with
+    instrument_vars as excluded instruments, absorbing the effects.
+
+    cov_types are computed for both stages as in absorbing_regression(), by
+    default clustered by entity. The first-stage F statistics use the first
+    of them. Outcomes missing on the same rows share the first stage. The
+    effect and cluster codes come from panel, a PanelFrame of df, if given.
+
+    Returns:
+        tuple[list[AbsorbingResults], list[IVResults]]: the first stage of
+        each endogenous regressor (on the sample of the first outcome), and
+        the second stage of each dependent variable.
+    """
+    if len(instrument_vars) < len(endogenous_vars):
+        raise ValueError(
+            f"{len(endogenous_vars)} endogenous regressors need at least as many "
+            f"instruments, got {len(instrument_vars)}"
+        )
+    if cache is None:
+        # the first and second stages demean the same columns
+        cache = DemeanCache()
+    if cov_types is None:
+        cov_types = ["clustered"]
+
+    if panel is None:
+        panel = PanelFrame(df, effects + cluster_dims(cov_types))
+    codes = effect_codes(effects, df, panel)
+    ys = df[dependent_vars].to_numpy(dtype=np.float64)
+    x_endog = df[endogenous_vars].to_numpy(dtype=np.float64)
+    first_vars = instrument_vars + exog_vars
+    z = df[first_vars].to_numpy(dtype=np.float64)
+    clusters = effect_codes(cluster_dims(cov_types), df, panel)
+
+    keep = ~np.isnan(x_endog).any(axis=1) & ~np.isnan(z).any(axis=1)
+    for effect_code in [*codes.values(), *clusters.values()]:
+        keep &= effect_code >= 0
+    if panel.sample is not None:
+        keep &= panel.sample
+    valid = keep[:, None] & ~np.isnan(ys)
+
+    samples: dict[str, list[int]] = {}
+    for k in range(len(dependent_vars)):
+        samples.setdefault(fingerprint(valid[:, k]), []).append(k)
+
+    first_stage: list[AbsorbingResults] = []
+    second_stage: list[IVResults | None] = [None] * len(dependent_vars)
+    for outcomes in samples.values():
+        keep = valid[:, outcomes[0]]
+        first, second = _iv_sample(
+            ys[keep][:, outcomes],
+            x_endog[keep],
+            z[keep],
+            {name: effect_code[keep] for name, effect_code in codes.items()},
+            {name: cluster_code[keep] for name, cluster_code in clusters.items()},
+            cov_types,
+            [dependent_vars[k] for k in outcomes],
+            endogenous_vars,
+            exog_vars,
+            instrument_vars,
+            constant,
+            cache,
+            df.index[keep],
+        )
+        if not first_stage:
+            first_stage = first
+        for k, result in zip(outcomes, second):
+            second_stage[k] = result
+    return first_stage, second_stage
+
+
+def _iv_sample(
+    y: np.ndarray,
+    x_endog: np.ndarray,
+    z: np.ndarray,
+    codes: dict[str, np.ndarray],
+    clusters: dict[str, np.ndarray],
+    cov_types: list[str],
+    dependent_vars: list[str],
+    endogenous_vars: list[str],
+    exog_vars: list[str],
+    instrument_vars: list[str],
+    constant: bool,
+    cache: DemeanCache,
+    index: pd.Index,
+) -> tuple[list[AbsorbingResults], list[IVResults]]:
+    """2SLS for the outcomes y, all rows already in the sample."""
+    first_vars = instrument_vars + exog_vars
+    first, _ = _fit_sample(
+        x_endog,
+        z,
+        codes,
+        clusters,
+        cov_types,
+        endogenous_vars,
+        first_vars,
+        constant,
+        cache,
+        index,
+    )
+
+    # The first stage stored the demeaned columns, these are cache hits
+    groups = [compress_codes(effect_code) for effect_code in codes.values()]
+    effects = list(codes)
+    nobs = y.shape[0]
+    y_dm, y_sweeps = demean_columns(y, dependent_vars, groups, effects, cache)
+    x_dm, _ = demean_columns(x_endog, endogenous_vars, groups, effects, cache)
+    z_dm, _ = demean_columns(z, first_vars, groups, effects, cache)
+    w_index = list(range(len(instrument_vars), len(first_vars)))
+    names = endogenous_vars + exog_vars
+    x = np.column_stack([x_endog, z[:, w_index]])
+    if constant:
+        x = np.column_stack([x, np.ones(nobs)])
+        z = np.column_stack([z, np.ones(nobs)])
+        if groups:
+            # as in absorb._fit_sample, the grand means are added back
+            z_dm = np.column_stack([z_dm, np.zeros(nobs)]) + z.mean(0)
+            x_dm = x_dm + x_endog.mean(0)
+            y_dm = y_dm + y.mean(0)
+        else:
+            z_dm = np.column_stack([z_dm, np.ones(nobs)])
+        names = names + ["constant"]
+        w_index.append(z.shape[1] - 1)
+
+    # Projection of the endogenous regressors on the instruments
+    pi = np.column_stack([result.params.to_numpy() for result in first])
+    x_hat = np.column_stack([z_dm @ pi, z_dm[:, w_index]])
+    x_dm = np.column_stack([x_dm, z_dm[:, w_index]])
+
+    nvar = len(names)
+    factor = cho_factor(x_hat.T @ x_hat)
+    xhx_inv = cho_solve(factor, np.eye(nvar))
+    params = cho_solve(factor, x_hat.T @ y_dm)
+    # 2SLS residuals use the actual endogenous regressors
+    eps = y_dm - x_dm @ params
+    resid_ss = (eps**2).sum(0)
+    fitted = x @ params
+
+    neffects = count_absorbed_levels(groups, constant)
+    covariances = Covariances(
+        cov_types, clusters, [effect_code for effect_code, _ in groups], neffects
+    )
+    y_centered = y_dm - (y.mean(0) if constant else 0.0)
+    total_ss = (y_centered**2).sum(0)
+    absorbed = {name: len(counts) for name, (_, counts) in zip(effects, groups)}
+    first_stage_f = {
+        name: wald_test(result, instrument_vars)
+        for name, result in zip(endogenous_vars, first)
+    }
+
+    second = []
+    for k, dependent in enumerate(dependent_vars):
+        covs = covariances.compute(x_hat, eps[:, k], xhx_inv)
+        second.append(
+            IVResults(
+                dependent=dependent,
+                params=pd.Series(params[:, k], index=names, name="parameter"),
+                **covariance_fields(covariances, covs, names),
+                nobs=nobs,
+                df_model=nvar + neffects,
+                df_resid=nobs - nvar - neffects,
+                resid_ss=float(resid_ss[k]),
+                total_ss=float(total_ss[k]),
+                effects=absorbed,
+                iterations=max(y_sweeps, first[0].iterations),
+                fitted_values=pd.DataFrame(
+                    fitted[:, k], index=index, columns=["fitted_values"]
+                ),
+                endogenous=endogenous_vars,
+                instruments=instrument_vars,
+                first_stage_f=first_stage_f,
+            )
+        )
+    return first, second
@@ -0,0 +1,335 @@
+"""
+Load the columns of a panel file that a research config uses.
+
+Vendor files often carry hundreds of columns while a project reads a few
+dozen. load_panel() reads the used columns only (the variables of
+ResearchConfig._all_vars(), the effect and cluster columns and the
+entity/time index), optionally downcasts them, and sets the (entity, time)
+MultiIndex. The report compares the memory of the loaded panel with an
+estimate of loading every column at the default dtypes, made from the first
+rows of the file.
+
+Files:
+- CSV: parsed on every load.
+- Arrow IPC (.arrow, .feather, .ipc): memory-mapped. Numeric columns without
+  missing values in one chunk are NumPy views of the mapped file, so loading
+  costs no parsing and no copy; the pages are read as the regressions touch
+  them. convert_csv() writes such a file from a CSV, once.
+- Parquet (.parquet, .pq): the used columns are decoded, nothing else.
+"""
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from pydantic import BaseModel
+
+from .covariance import cluster_dims
+from .regression_config import ResearchConfig
+from .streaming import PARQUET_SUFFIXES
+
+ARROW_SUFFIXES = (".arrow", ".feather", ".ipc")
+
+
+class LoadReport(BaseModel):
+    """What load_panel() read, and the memory it saved."""
+
+    path: str
+    rows: int
+    columns_read: list[str]  # index first
+    columns_skipped: int
+    nbytes: int  # memory of the loaded panel, index included
+    full_nbytes: int  # estimate for every column at the default dtypes
+    mapped_nbytes: int = 0  # part of nbytes that is views of a mapped file
+
+    @property
+    def saved(self) -> int:
+        return self.full_nbytes - self.nbytes
+
+    def __str__(self) -> str:
+        share = self.saved / self.full_nbytes if self.full_nbytes else 0.0
+        return (
+            f"Loaded {self.rows} rows and {len(self.columns_read)} columns of "
+            f"{self.path} ({self.columns_skipped} skipped): "
+            f"{self.nbytes / 2**20:.1f} MiB instead of about "
+            f"{self.full_nbytes / 2**20:.1f} MiB, {share:.0%} saved"
+            + (
+                f", {self.mapped_nbytes / 2**20:.1f} MiB memory-mapped"
+                if self.mapped_nbytes
+                else ""
+            )
+        )
+
+
+def panel_index(research_config: ResearchConfig) -> list[str]:
+    """
+    The entity and time columns named by effects_vars/extra_effects_vars.
+
+    Raises:
+        ValueError: when the config does not name them, pass index instead.
+    """
+    names = dict(
+        zip(
+            research_config.effects + research_config.extra_effects,
+            research_config.effects_vars + research_config.extra_effects_vars,
+        )
+    )
+    missing = [effect for effect in ["entity", "time"] if effect not in names]
+    if missing:
+        raise ValueError(f"The research config does not name the {missing} column")
+    return [names["entity"], names["time"]]
+
+
+def research_columns(research_config: ResearchConfig, index: list[str]) -> list[str]:
+    """Every column the research config uses, the index first."""
+    effects = [
+        var
+        for effect, var in zip(
+            research_config.effects + research_config.extra_effects,
+            research_config.effects_vars + research_config.extra_effects_vars,
+        )
+        if effect not in ["entity", "time"]
+    ]
+    clusters = [
+        dim
+        for dim in cluster_dims(
+            [research_config.cov_type] + research_config.extra_cov_types
+        )
+        if dim not in ["entity", "time"]
+    ]
+    return list(dict.fromkeys(index + research_config._all_vars() + effects + clusters))
+
+
+def downcast_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Floats to float32, integers to the smallest integer type, and strings
+    to categories. Booleans and other columns are left as they are.
+    """
+    columns = {}
+    for col in df.columns:
+        values = df[col]
+        if pd.api.types.is_bool_dtype(values):
+            continue
+        if pd.api.types.is_float_dtype(values):
+            columns[col] = values.astype(np.float32)
+        elif pd.api.types.is_integer_dtype(values):
+            columns[col] = pd.to_numeric(values, downcast="integer")
+        elif pd.api.types.is_string_dtype(values) or values.dtype == object:
+            columns[col] = values.astype("category")
+    return df.assign(**columns)
+
+
+def convert_csv(
+    csv_path: str | Path,
+    out_path: str | Path,
+    columns: list[str] | None = None,
+) -> Path:
+    """
+    Convert a CSV file to Arrow IPC (or Parquet, by the suffix of out_path).
+
+    Missing values of float columns are stored as NaN, and integer columns
+    with missing values become float64, so numeric columns have no validity
+    bitmap. Every column is written as one chunk, uncompressed, which makes
+    the numeric columns zero-copy views when load_panel() maps the file. The
+    conversion holds the table in memory once, as Arrow.
+
+    Args:
+        csv_path (str | Path): the CSV file.
+        out_path (str | Path): .arrow/.feather/.ipc or .parquet/.pq file.
+        columns (list[str] | None): columns to keep, all by default.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pa_csv
+
+    out_path = Path(out_path)
+    convert_options = pa_csv.ConvertOptions(include_columns=columns or [])
+    table = pa_csv.read_csv(csv_path, convert_options=convert_options)
+    for i, column in enumerate(table.columns):
+        if pa.types.is_integer(column.type) and column.null_count:
+            column = column.cast(pa.float64())
+        if pa.types.is_floating(column.type) and column.null_count:
+            column = pc.fill_null(column, np.nan)
+        table = table.set_column(i, table.field(i).with_type(column.type), column)
+    table = table.combine_chunks()
+
+    if out_path.suffix in PARQUET_SUFFIXES:
+        import pyarrow.parquet as pq
+
+        pq.write_table(table, out_path)
+    else:
+        with pa.ipc.new_file(out_path, table.schema) as writer:
+            writer.write_table(table)
+    return out_path
+
+
+def columnar_writer(path: str | Path, schema):
+    """
+    A writer of Arrow tables to an Arrow IPC or Parquet file, by the suffix
+    of path. Close it (or use it as a context manager) to finish the file.
+
+    Raises:
+        ValueError: for other suffixes.
+    """
+    import pyarrow as pa
+
+    path = Path(path)
+    if path.suffix in PARQUET_SUFFIXES:
+        import pyarrow.parquet as pq
+
+        return pq.ParquetWriter(path, schema)
+    if path.suffix in ARROW_SUFFIXES:
+        return pa.ipc.new_file(path, schema)
+    raise ValueError(f"Unknown columnar file suffix: {path.suffix}")
+
+
+def _arrow_frame(table) -> tuple[pd.DataFrame, list[str]]:
+    """
+    A DataFrame of an Arrow table, and the columns it shares with the table.
+
+    Numeric columns without nulls in a single chunk become views of the
+    Arrow buffers, the others are converted.
+    """
+    import pyarrow as pa
+
+    columns = {}
+    shared = []
+    for name, column in zip(table.column_names, table.columns):
+        numeric = pa.types.is_floating(column.type) or pa.types.is_integer(column.type)
+        if numeric and column.num_chunks == 1 and column.null_count == 0:
+            columns[name] = column.chunk(0).to_numpy(zero_copy_only=True)
+            shared.append(name)
+        else:
+            columns[name] = column.to_pandas()
+    return pd.DataFrame(columns, copy=False), shared
+
+
+def _read_sample(path: str | Path, nrows: int) -> pd.DataFrame:
+    """The first rows of every column of the file."""
+    suffix = Path(path).suffix
+    if suffix in ARROW_SUFFIXES:
+        import pyarrow as pa
+
+        table = pa.ipc.open_file(pa.memory_map(str(path))).read_all()
+        return table.slice(0, nrows).to_pandas()
+    if suffix in PARQUET_SUFFIXES:
+        import pyarrow.parquet as pq
+
+        parquet_file = pq.ParquetFile(path)
+        return next(parquet_file.iter_batches(batch_size=nrows)).to_pandas()
+    return pd.read_csv(path, nrows=nrows)
+
+
+def _read_columns(
+    path: str | Path, columns: list[str]
+) -> tuple[pd.DataFrame, list[str]]:
+    """The columns of the file, and those that are views of a mapped file."""
+    suffix = Path(path).suffix
+    if suffix in ARROW_SUFFIXES:
+        import pyarrow as pa
+
+        table = pa.ipc.open_file(pa.memory_map(str(path))).read_all()
+        return _arrow_frame(table.select(columns))
+    if suffix in PARQUET_SUFFIXES:
+        import pyarrow.parquet as pq
+
+        df, _ = _arrow_frame(pq.read_table(path, columns=columns))
+        # decoded, not mapped
+        return df, []
+    return pd.read_csv(path, usecols=columns), []
+
+
+def estimate_nbytes(
+    path: str | Path,
+    research_config: ResearchConfig,
+    index: list[str] | None = None,
+) -> int:
+    """
+    Estimated memory of the panel load_panel() reads from path, without
+    loading it: bytes per row of the used columns in the first rows of the
+    file, times its rows (from the metadata of Arrow and Parquet files, by
+    counting lines of a CSV).
+    """
+    path = Path(path)
+    if index is None:
+        index = panel_index(research_config)
+    columns = research_columns(research_config, index)
+    sample = _read_sample(path, 1000)
+    used = [col for col in columns if col in sample.columns]
+    row_nbytes = sample[used].memory_usage(deep=True).sum() / max(len(sample), 1)
+    if path.suffix in ARROW_SUFFIXES:
+        import pyarrow as pa
+
+        rows = pa.ipc.open_file(pa.memory_map(str(path))).read_all().num_rows
+    elif path.suffix in PARQUET_SUFFIXES:
+        import pyarrow.parquet as pq
+
+        rows = pq.ParquetFile(path).metadata.num_rows
+    else:
+        with open(path, "rb") as f:
+            lines = sum(
+                chunk.count(b"\n") for chunk in iter(lambda: f.read(1 << 20), b"")
+            )
+        rows = max(lines - 1, 0)  # header
+    return int(row_nbytes * rows)
+
+
+def load_panel(
+    path: str | Path,
+    research_config: ResearchConfig,
+    index: list[str] | None = None,
+    downcast: bool = False,
+    sample_rows: int = 10_000,
+) -> tuple[pd.DataFrame, LoadReport]:
+    """
+    Read the columns of a panel file used by research_config.
+
+    The regressions convert their columns to float64, so float32 storage
+    only rounds the data, it does not change the engines. Downcasting copies
+    the memory-mapped columns of an Arrow file.
+
+    Args:
+        path (str | Path): CSV, Arrow IPC or Parquet file (by suffix).
+        research_config (ResearchConfig): decides the columns.
+        index (list[str] | None): entity and time columns, by default from
+            the config's effects_vars.
+        downcast (bool): see downcast_columns().
+        sample_rows (int): rows read with every column to estimate the
+            memory of a full load.
+
+    Returns:
+        tuple[pd.DataFrame, LoadReport]: the panel indexed by (entity, time),
+        and the report.
+
+    Raises:
+        ValueError: a used column is not in the file.
+    """
+    if index is None:
+        index = panel_index(research_config)
+    columns = research_columns(research_config, index)
+
+    sample = _read_sample(path, sample_rows)
+    missing = [col for col in columns if col not in sample.columns]
+    if missing:
+        raise ValueError(f"Columns not in {path}: {missing}")
+
+    df, mapped = _read_columns(path, columns)
+    rows = len(df)
+    row_nbytes = sample.memory_usage(deep=True).sum() / max(len(sample), 1)
+    if downcast:
+        df = downcast_columns(df)
+        mapped = []
+    # the index is copied into the MultiIndex
+    mapped_nbytes = sum(df[col].nbytes for col in mapped if col not in index)
+    df = df.set_index(index)[[col for col in columns if col not in index]]
+
+    report = LoadReport(
+        path=str(path),
+        rows=rows,
+        columns_read=columns,
+        columns_skipped=len(sample.columns) - len(columns),
+        nbytes=int(df.memory_usage(deep=True).sum()),
+        full_nbytes=int(row_nbytes * rows),
+        mapped_nbytes=int(mapped_nbytes),
+    )
+    return df, report
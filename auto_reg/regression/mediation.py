@@ -0,0 +1,300 @@
+"""
+Mediation analysis: the indirect effect a * b of a treatment x on an outcome
+y through a mediator m, from the two equations
+
+    m = a x + controls + effects            (mediator equation)
+    y = c x + b m + controls + effects      (outcome equation)
+
+fitted on their common sample. The indirect effect is tested two ways:
+
+- Sobel: se(ab) = sqrt(b^2 se(a)^2 + a^2 se(b)^2), using the covariance of
+  the fitted equations, and a normal p-value
+- a pairs cluster bootstrap: each draw resamples G clusters with replacement
+  (a B by G array of cluster indices) and refits both equations
+
+Both equations are least squares fits on the columns Z = [x, m, controls,
+constant, y], so every draw needs only Z*'Z* = sum_g c_gb Z_g'Z_g, with c_gb
+the number of times cluster g is drawn in draw b. The cluster blocks Z_g'Z_g
+come from one pass over the rows; a batch of draws is then one matrix
+product of the B by G counts with the G by K^2 blocks, and both equations of
+all draws are solved as batched K by K systems. The cost after the setup
+does not depend on the number of rows, instead of 2 B refits.
+
+The columns are demeaned once on the full sample, as in absorb.py. When
+every absorbed effect is nested in the clusters (entity effects with entity
+or industry clusters), a resampled cluster brings its own effect levels and
+its demeaned rows are unchanged, so the draws are those of refits on the
+resampled panel. Otherwise the demeaning is held at its full-sample value
+and the result says so.
+"""
+
+import numpy as np
+import pandas as pd
+from pydantic import BaseModel, ConfigDict
+from scipy import stats
+
+from .absorb import compress_codes, demean_columns, effect_codes
+from .covariance import ClusterSegments, is_nested, parse_cov_type
+from .demean_cache import DemeanCache
+from .regression_config import RegressionConfig
+
+
+class MediationTest(BaseModel):
+    """Sobel and cluster bootstrap inference on the indirect effect a * b."""
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+    dependent: str
+    treatment: str
+    mediator: str
+    a: float  # effect of the treatment on the mediator
+    se_a: float
+    b: float  # effect of the mediator on the outcome, given the treatment
+    se_b: float
+    indirect: float  # a * b
+    sobel_se: float
+    sobel_z: float
+    sobel_pvalue: float
+    bootstrap: np.ndarray  # indirect effect in each draw, NaN if singular
+    level: float
+    ci_lower: float  # percentile bootstrap interval
+    ci_upper: float
+    cluster: str
+    nclusters: int
+    exact: bool  # False when the demeaning is held at its full-sample value
+
+    @property
+    def bootstrap_se(self) -> float:
+        return float(np.nanstd(self.bootstrap, ddof=1))
+
+    def __str__(self) -> str:
+        lines = [
+            "Mediation Analysis",
+            "=" * 80,
+            f"{'Dep. Variable:':<22}{self.dependent}",
+            f"{'Treatment:':<22}{self.treatment}",
+            f"{'Mediator:':<22}{self.mediator}",
+            f"{'a (x -> m):':<22}{self.a:.4f} ({self.se_a:.4f})",
+            f"{'b (m -> y):':<22}{self.b:.4f} ({self.se_b:.4f})",
+            f"{'Indirect (a*b):':<22}{self.indirect:.4f}",
+            f"{'Sobel:':<22}se = {self.sobel_se:.4f}, z = {self.sobel_z:.4f}, "
+            f"p-value = {self.sobel_pvalue:.4f}",
+            f"{'Bootstrap:':<22}{len(self.bootstrap)} draws, "
+            f"se = {self.bootstrap_se:.4f}",
+            f"{f'{self.level:.0%} CI:':<22}[{self.ci_lower:.4f}, {self.ci_upper:.4f}]",
+            f"{'Clusters:':<22}{self.cluster} ({self.nclusters})",
+            f"{'Exact:':<22}{self.exact}",
+        ]
+        return "\n".join(lines)
+
+    def __repr__(self) -> str:
+        return str(self)
+
+
+def sobel_test(
+    a: float, se_a: float, b: float, se_b: float
+) -> tuple[float, float, float]:
+    """
+    Sobel test of a * b = 0.
+
+    Returns:
+        tuple[float, float, float]: the standard error of a * b, its z
+        statistic and the two-sided normal p-value.
+    """
+    se = float(np.sqrt(b**2 * se_a**2 + a**2 * se_b**2))
+    z = a * b / se
+    return se, float(z), float(2 * stats.norm.sf(abs(z)))
+
+
+def cluster_draws(rng: np.random.Generator, draws: int, nclusters: int) -> np.ndarray:
+    """
+    Clusters of each bootstrap draw, drawn with replacement: a draws by
+    nclusters array of cluster indices.
+    """
+    return rng.integers(0, nclusters, size=(draws, nclusters))
+
+
+def draw_counts(indices: np.ndarray, nclusters: int) -> np.ndarray:
+    """Times each cluster is drawn in each row of indices, draws by nclusters."""
+    draws = len(indices)
+    offsets = (np.arange(draws) * nclusters)[:, None]
+    counts = np.bincount((indices + offsets).ravel(), minlength=draws * nclusters)
+    return counts.reshape(draws, nclusters).astype(np.float64)
+
+
+def solve_draws(
+    products: np.ndarray, columns: np.ndarray, outcome: int, position: int
+) -> np.ndarray:
+    """
+    Coefficient at position of the fit of Z[:, outcome] on Z[:, columns] in
+    every draw, from the draws' K by K cross products of Z. NaN for draws
+    whose regressors are collinear.
+    """
+    xpx = products[:, columns][:, :, columns]
+    xpy = products[:, columns, outcome]
+    try:
+        return np.linalg.solve(xpx, xpy[:, :, None])[:, position, 0]
+    except np.linalg.LinAlgError:
+        params = np.full(len(products), np.nan)
+        for draw in range(len(products)):
+            try:
+                params[draw] = np.linalg.solve(xpx[draw], xpy[draw])[position]
+            except np.linalg.LinAlgError:
+                pass
+        return params
+
+
+def bootstrap_indirect(
+    z: np.ndarray,
+    clusters: np.ndarray,
+    a_columns: list[int],
+    b_columns: list[int],
+    mediator: int,
+    outcome: int,
+    draws: int = 5000,
+    seed: int | None = None,
+    batch_size: int = 1000,
+) -> np.ndarray:
+    """
+    Pairs cluster bootstrap of the indirect effect.
+
+    Args:
+        z (np.ndarray): n by K columns of both equations.
+        clusters (np.ndarray): n cluster codes (0..G-1).
+        a_columns (list[int]): regressors of the mediator equation, the
+            treatment first.
+        b_columns (list[int]): regressors of the outcome equation, the
+            treatment first and the mediator second.
+        mediator, outcome (int): columns of the mediator and the outcome.
+        draws (int): number of bootstrap draws.
+        seed (int | None): seed of the cluster draws.
+        batch_size (int): draws solved together, bounds the memory to
+            batch_size by K^2 cross products.
+
+    Returns:
+        np.ndarray: a * b in each draw.
+    """
+    segments = ClusterSegments(clusters)
+    nclusters = len(segments)
+    k = z.shape[1]
+    blocks = segments.cross_products(z).reshape(nclusters, k * k)
+    a_columns = np.asarray(a_columns)
+    b_columns = np.asarray(b_columns)
+
+    rng = np.random.default_rng(seed)
+    indirect = np.empty(draws)
+    for start in range(0, draws, batch_size):
+        stop = min(start + batch_size, draws)
+        counts = draw_counts(cluster_draws(rng, stop - start, nclusters), nclusters)
+        products = (counts @ blocks).reshape(-1, k, k)
+        a = solve_draws(products, a_columns, mediator, 0)
+        b = solve_draws(products, b_columns, outcome, 1)
+        indirect[start:stop] = a * b
+    return indirect
+
+
+def mediation_test(
+    df: pd.DataFrame,
+    regression_config: RegressionConfig,
+    a_result,
+    b_result,
+    cluster: str | None = None,
+    draws: int = 5000,
+    level: float = 0.95,
+    seed: int | None = None,
+    batch_size: int = 1000,
+    cache: DemeanCache | None = None,
+) -> MediationTest:
+    """
+    Sobel and cluster bootstrap tests of the indirect effect of the first
+    independent variable through the config's mediating_var.
+
+    Args:
+        df (pd.DataFrame): the panel the equations were fitted on.
+        regression_config (RegressionConfig): the mediating spec.
+        a_result, b_result (PanelEffectsResults | AbsorbingResults): the
+            mediator and outcome equations, fitted on the same sample (see
+            panel_data.mediating_regression()).
+        cluster (str | None): "entity", "time" or a column to resample, by
+            default the first cluster of the config's cov_type, else entity.
+        draws, seed, batch_size: see bootstrap_indirect().
+        level (float): coverage of the percentile interval.
+        cache (DemeanCache | None): reuse demeaned columns.
+
+    Raises:
+        ValueError: for missing values in the cluster column.
+    """
+    config = regression_config
+    treatment = config.independent_vars[0]
+    mediator = config.mediating_var
+    dependent_var = config.dependent_vars[0]
+    if cluster is None:
+        kind, dims = parse_cov_type(config.cov_type)
+        cluster = dims[0] if kind == "clustered" else "entity"
+
+    a = float(a_result.params[treatment])
+    se_a = float(a_result.std_errors[treatment])
+    b = float(b_result.params[mediator])
+    se_b = float(b_result.std_errors[mediator])
+    sobel_se, sobel_z, sobel_pvalue = sobel_test(a, se_a, b, se_b)
+
+    # Z = [x, m, controls, (constant), y] on the rows of the common sample
+    names = config.independent_vars + [mediator] + config.control_vars
+    columns = names + [dependent_var]
+    columns += [
+        col for col in config.effects + [cluster] if col not in ["entity", "time"]
+    ]
+    rows = df.index.get_indexer(b_result.fitted_values.index)
+    sample = df[list(dict.fromkeys(columns))].iloc[rows]
+    z = sample[names + [dependent_var]].to_numpy(dtype=np.float64)
+    codes = effect_codes(config.effects, sample)
+    groups = [compress_codes(effect_code) for effect_code in codes.values()]
+    cluster_codes = effect_codes([cluster], sample)[cluster]
+    if (cluster_codes < 0).any():
+        raise ValueError(f"Missing values in the cluster column {cluster!r}")
+    clusters, counts = compress_codes(cluster_codes)
+    exact = all(is_nested(code, clusters) for code in codes.values())
+
+    z_dm = demean_columns(z, names + [dependent_var], groups, list(codes), cache)[0]
+    regressors = list(range(len(names)))
+    if config.constant:
+        if groups:
+            z_dm = z_dm + z.mean(0)
+        z_dm = np.column_stack([z_dm, np.ones(len(z_dm))])
+        regressors.append(len(names) + 1)
+    nx = len(config.independent_vars)
+    b_columns = [0, nx] + [j for j in regressors if j not in (0, nx)]
+    a_columns = [j for j in b_columns if j != nx]
+
+    indirect = bootstrap_indirect(
+        z_dm,
+        clusters,
+        a_columns,
+        b_columns,
+        mediator=nx,
+        outcome=len(names),
+        draws=draws,
+        seed=seed,
+        batch_size=batch_size,
+    )
+    tail = (1 - level) / 2
+    ci_lower, ci_upper = np.nanquantile(indirect, [tail, 1 - tail])
+    return MediationTest(
+        dependent=dependent_var,
+        treatment=treatment,
+        mediator=mediator,
+        a=a,
+        se_a=se_a,
+        b=b,
+        se_b=se_b,
+        indirect=a * b,
+        sobel_se=sobel_se,
+        sobel_z=sobel_z,
+        sobel_pvalue=sobel_pvalue,
+        bootstrap=indirect,
+        level=level,
+        ci_lower=float(ci_lower),
+        ci_upper=float(ci_upper),
+        cluster=cluster,
+        nclusters=len(counts),
+        exact=exact,
+    )
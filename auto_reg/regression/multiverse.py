@@ -0,0 +1,367 @@
+"""
+Specification curves: the multiverse of controls, effects and outcomes.
+
+The grid is every subset of the research config's control_vars, crossed
+with the alternative effects (effects, and extra_effects when set) and the
+alternative outcomes (dependent_vars and replacement_y_vars). Twelve
+controls alone give 4,096 specs.
+
+The specs of one (outcome, effects) block differ only in which controls
+they include, so they are fitted from shared sufficient statistics:
+
+1. the sample is the rows where the outcome, the independent variables,
+   every candidate control and the effect/cluster codes are present (see
+   validity.py), so the curve compares specifications, not samples
+2. the outcome and every regressor are demeaned once (through the
+   DemeanCache, so blocks with the same sample and effects share them)
+3. Z'Z and Z'y of all regressors, and the same cross products within each
+   cluster, are formed once
+4. each spec is a sub-block solve: by Frisch-Waugh the coefficients of the
+   regressors it keeps solve the corresponding block of Z'Z, and its
+   clustered scores are Z_g'y_g - Z_g'Z_g b, so no spec passes over the rows
+
+The fits are the "absorb" estimator's (any number of effects). With
+workers > 1 the blocks are split into chunks of specs that run on a process
+pool, so a grid of one block (one outcome and effects, many control
+subsets) is spread over the workers too; each worker's DemeanCache keeps
+the demeaned columns of a block for its other chunks, and only the cross
+products are formed again per chunk. The results (the coefficient of the
+first independent variable) are written to an Arrow IPC or Parquet file
+block by block, or chunk by chunk as the pool finishes them.
+
+Covariances: "unadjusted" and one-way "clustered". The per-cluster cross
+products take clusters times K^2 floats, K the number of regressors.
+"""
+
+from collections.abc import Iterator
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from linearmodels.panel.utility import check_absorbed
+from scipy import stats
+from scipy.linalg import cho_factor, cho_solve
+
+from .absorb import compress_codes, count_absorbed_levels, demean_columns
+from .covariance import ClusterSegments, cluster_dims, is_nested, parse_cov_type
+from .demean_cache import DemeanCache
+from .loader import columnar_writer
+from .panel_frame import PanelFrame
+from .parallel import parallel_imap
+from .regression_config import ResearchConfig
+from .validity import ValidityIndex
+
+# bits of the controls mask are control_vars positions, so at most 62 controls
+MAX_CONTROLS = 62
+
+
+def multiverse_grid(
+    research_config: ResearchConfig,
+    outcomes: list[str] | None = None,
+    effects_sets: list[list[str]] | None = None,
+    min_controls: int = 0,
+) -> pd.DataFrame:
+    """
+    Enumerate the specs of the multiverse.
+
+    Args:
+        research_config (ResearchConfig): the variables and settings.
+        outcomes (list[str] | None): dependent variables, by default
+            dependent_vars followed by replacement_y_vars.
+        effects_sets (list[list[str]] | None): alternative effects, by
+            default effects and, when set, extra_effects.
+        min_controls (int): leave out the subsets with fewer controls.
+
+    Returns:
+        pd.DataFrame: one row per spec, with its id, outcome, effects (names
+        joined by "+"), controls mask (bit i is control_vars[i]) and number
+        of controls. Specs of one block are contiguous.
+    """
+    controls = research_config.control_vars
+    if len(controls) > MAX_CONTROLS:
+        raise ValueError(f"At most {MAX_CONTROLS} controls, got {len(controls)}")
+    if outcomes is None:
+        outcomes = research_config.dependent_vars + research_config.replacement_y_vars
+    if effects_sets is None:
+        effects_sets = [research_config.effects]
+        if research_config.extra_effects:
+            effects_sets.append(research_config.extra_effects)
+
+    masks = np.arange(1 << len(controls), dtype=np.int64)
+    sizes = np.array([bin(mask).count("1") for mask in masks])
+    masks = masks[sizes >= min_controls]
+    sizes = sizes[sizes >= min_controls]
+    blocks = [(outcome, effects) for outcome in outcomes for effects in effects_sets]
+    return pd.DataFrame(
+        {
+            "spec": np.arange(len(blocks) * len(masks)),
+            "outcome": np.repeat([outcome for outcome, _ in blocks], len(masks)),
+            "effects": np.repeat(
+                ["+".join(effects) for _, effects in blocks], len(masks)
+            ),
+            "controls_mask": np.tile(masks, len(blocks)),
+            "n_controls": np.tile(sizes, len(blocks)),
+        }
+    )
+
+
+def multiverse_block(
+    df: pd.DataFrame,
+    outcome: str,
+    effects: list[str],
+    independent_vars: list[str],
+    control_vars: list[str],
+    masks: np.ndarray,
+    first_spec: int,
+    constant: bool = True,
+    cov_type: str = "clustered",
+    cache: DemeanCache | None = None,
+    panel: PanelFrame | None = None,
+    validity: ValidityIndex | None = None,
+) -> pd.DataFrame:
+    """
+    Fit the specs of one (outcome, effects) block, one per controls mask.
+
+    Returns:
+        pd.DataFrame: the estimate of independent_vars[0] in every spec, with
+        its standard error, t-stat, p-value, nobs and within R-squared.
+    """
+    kind, dims = parse_cov_type(cov_type)
+    if kind == "robust" or len(dims) > 1:
+        raise ValueError(
+            f"The multiverse supports unadjusted and one-way clustered covariances, "
+            f"got {cov_type!r}"
+        )
+    clusters = cluster_dims([cov_type])
+    index_effects = ["entity", "time"]
+    if panel is None:
+        panel = PanelFrame(df, effects + clusters)
+    if validity is None:
+        columns = [outcome] + independent_vars + control_vars + effects + clusters
+        columns = [col for col in columns if col not in index_effects]
+        validity = ValidityIndex(df, columns, panel)
+
+    names = independent_vars + control_vars
+    sample = validity.sample([outcome] + names + effects + clusters).copy()
+    for code in panel.effect_codes(effects + clusters).values():
+        sample &= code >= 0
+    rows = np.flatnonzero(sample)
+    codes = {name: code[rows] for name, code in panel.effect_codes(effects).items()}
+    groups = [compress_codes(code) for code in codes.values()]
+
+    y = df[outcome].to_numpy(dtype=np.float64)[rows]
+    x = df[names].to_numpy(dtype=np.float64)[rows]
+    nobs = len(rows)
+    y_dm = demean_columns(y[:, None], [outcome], groups, effects, cache)[0][:, 0]
+    z = demean_columns(x, names, groups, effects, cache)[0]
+    if constant:
+        names = names + ["constant"]
+        if groups:
+            # as in absorb.py: the grand means are added back
+            z = np.column_stack([z, np.zeros(nobs)]) + np.append(x.mean(0), 1)
+            y_dm = y_dm + y.mean()
+        else:
+            z = np.column_stack([z, np.ones(nobs)])
+    if groups:
+        check_absorbed(z, names)
+
+    zpz = z.T @ z
+    zpy = z.T @ y_dm
+    yty = float(y_dm @ y_dm)
+    total_ss = float(((y_dm - (y.mean() if constant else 0.0)) ** 2).sum())
+    neffects = count_absorbed_levels(groups, constant)
+    extra_df = neffects
+
+    cluster_zpz = cluster_zpy = None
+    if kind == "clustered":
+        cluster_code = panel.codes[dims[0]][rows]
+        segments = ClusterSegments(cluster_code)
+        if len(groups) == 1 and is_nested(groups[0][0], cluster_code):
+            extra_df = 0
+        z_sorted = z[segments.order]
+        ncol = z.shape[1]
+        cluster_zpz = np.empty((len(segments), ncol, ncol))
+        for j in range(ncol):
+            products = z_sorted[:, j:] * z_sorted[:, [j]]
+            cluster_zpz[:, j, j:] = np.add.reduceat(products, segments.starts, axis=0)
+            cluster_zpz[:, j:, j] = cluster_zpz[:, j, j:]
+        cluster_zpy = np.add.reduceat(
+            z_sorted * y_dm[segments.order, None], segments.starts, axis=0
+        )
+
+    nfixed = len(independent_vars)
+    tail = [len(names) - 1] if constant else []
+    estimates = np.empty(len(masks))
+    variances = np.empty(len(masks))
+    resid_ss = np.empty(len(masks))
+    nvars = np.empty(len(masks), dtype=np.int64)
+    for s, mask in enumerate(masks):
+        columns = list(range(nfixed))
+        columns += [nfixed + i for i in range(len(control_vars)) if mask >> i & 1]
+        columns += tail
+        nvar = len(columns)
+        block = zpz[np.ix_(columns, columns)]
+        factor = cho_factor(block)
+        params = cho_solve(factor, zpy[columns])
+        inverse = cho_solve(factor, np.eye(nvar))
+        rss = max(yty - params @ zpy[columns], 0.0)
+        if kind == "unadjusted":
+            variance = rss / (nobs - neffects - nvar) * inverse[0, 0]
+        else:
+            scores = cluster_zpy[:, columns] - np.einsum(
+                "gij,j->gi", cluster_zpz[:, columns][:, :, columns], params
+            )
+            bread = scores @ inverse[:, 0]
+            variance = nobs / (nobs - extra_df - nvar) * float(bread @ bread)
+        estimates[s] = params[0]
+        variances[s] = variance
+        resid_ss[s] = rss
+        nvars[s] = nvar
+
+    df_resid = nobs - nvars - neffects
+    std_errors = np.sqrt(variances)
+    tstats = estimates / std_errors
+    return pd.DataFrame(
+        {
+            "spec": first_spec + np.arange(len(masks)),
+            "outcome": outcome,
+            "effects": "+".join(effects),
+            "controls": [
+                "+".join(c for i, c in enumerate(control_vars) if mask >> i & 1)
+                for mask in masks
+            ],
+            "controls_mask": np.asarray(masks, dtype=np.int64),
+            "n_controls": nvars - nfixed - len(tail),
+            "estimate": estimates,
+            "std_error": std_errors,
+            "tstat": tstats,
+            "pvalue": 2 * stats.t.sf(np.abs(tstats), df_resid),
+            "nobs": nobs,
+            "df_resid": df_resid,
+            "rsquared": 1 - resid_ss / total_ss if total_ss > 0 else 0.0,
+            "cov_type": cov_type,
+        }
+    )
+
+
+def iter_multiverse(
+    df: pd.DataFrame,
+    research_config: ResearchConfig,
+    grid: pd.DataFrame | None = None,
+    workers: int = 1,
+    cache: DemeanCache | None = None,
+    chunk_size: int | None = None,
+) -> Iterator[pd.DataFrame]:
+    """
+    Fit the multiverse block by block, yielding the results of each block
+    (or chunk of specs, with workers > 1).
+
+    Args:
+        df (pd.DataFrame): panel indexed by (entity, time).
+        research_config (ResearchConfig): independent and control
+            variables, constant and cov_type.
+        grid (pd.DataFrame | None): specs from multiverse_grid(), all by
+            default.
+        workers (int): processes; chunks of the blocks are spread over a
+            pool sharing the panel (see parallel_imap) and yielded in spec
+            order as they are done.
+        cache (DemeanCache | None): demeaned columns, with workers == 1.
+        chunk_size (int | None): specs per chunk with workers > 1, by
+            default enough for about four chunks per worker.
+    """
+    if grid is None:
+        grid = multiverse_grid(research_config)
+    blocks = []
+    for (outcome, effects), specs in grid.groupby(["outcome", "effects"], sort=False):
+        blocks.append(
+            (
+                outcome,
+                effects.split("+") if effects else [],
+                research_config.independent_vars,
+                research_config.control_vars,
+                specs["controls_mask"].to_numpy(),
+                int(specs["spec"].iloc[0]),
+                research_config.constant,
+                research_config.cov_type,
+            )
+        )
+
+    effect_columns = [
+        col
+        for _, effects, *_ in blocks
+        for col in effects + cluster_dims([research_config.cov_type])
+        if col not in ["entity", "time"]
+    ]
+    panel = PanelFrame(df, effect_columns)
+    columns = list(
+        dict.fromkeys(
+            list(grid["outcome"].unique())
+            + research_config.independent_vars
+            + research_config.control_vars
+            + effect_columns
+        )
+    )
+    validity = ValidityIndex(df, columns, panel)
+
+    if workers > 1:
+        if chunk_size is None:
+            chunk_size = -(-len(grid) // (4 * workers))
+        chunks = []
+        for outcome, effects, independent, controls, masks, first, *rest in blocks:
+            for start in range(0, len(masks), chunk_size):
+                chunk = masks[start : start + chunk_size]
+                chunks.append(
+                    (outcome, effects, independent, controls, chunk, first + start)
+                    + tuple(rest)
+                )
+        if len(chunks) > 1:
+            yield from parallel_imap(
+                df,
+                multiverse_block,
+                chunks,
+                workers=workers,
+                columns=columns,
+                shared={"panel": panel, "validity": validity},
+            )
+            return
+    if cache is None:
+        cache = DemeanCache()
+    for block in blocks:
+        yield multiverse_block(df, *block, cache=cache, panel=panel, validity=validity)
+
+
+def run_multiverse(
+    df: pd.DataFrame,
+    research_config: ResearchConfig,
+    path: str | Path | None = None,
+    grid: pd.DataFrame | None = None,
+    workers: int = 1,
+    cache: DemeanCache | None = None,
+    chunk_size: int | None = None,
+) -> pd.DataFrame | Path:
+    """
+    Fit the multiverse (see iter_multiverse()).
+
+    With a path (.arrow/.feather/.ipc or .parquet/.pq), every block (or
+    chunk, with workers > 1) is written to the file as soon as it is fitted
+    and the path is returned; otherwise the results are returned as one
+    DataFrame, sorted by spec.
+    """
+    results = iter_multiverse(df, research_config, grid, workers, cache, chunk_size)
+    if path is None:
+        return pd.concat(list(results), ignore_index=True)
+
+    import pyarrow as pa
+
+    path = Path(path)
+    writer = None
+    try:
+        for result in results:
+            table = pa.Table.from_pandas(result, preserve_index=False)
+            if writer is None:
+                writer = columnar_writer(path, table.schema)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+    return path
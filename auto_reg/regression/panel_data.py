@@ -1,7 +1,34 @@
+from functools import partial
 from linearmodels.panel import PanelOLS
+import numpy as np
 import pandas as pd
+from linearmodels.panel.covariance import setup_covariance_estimator
+from linearmodels.panel.data import PanelData
 from linearmodels.panel.results import PanelEffectsResults
+from scipy.linalg import cho_factor, cho_solve
 from .regression_config import RegressionConfig
+from .covariance import cluster_dims, parse_cov_type
+from .demean_cache import CachedPanelOLS, DemeanCache
+from .absorb import (
+    AbsorbingResults,
+    absorbing_regression,
+    absorbing_regression_multi,
+    absorbing_regression_nested,
+)
+from .heterogeneity import GroupedPanel, WaldTest, wald_test
+from .iv import IVResults, iv_regression
+from .mediation import MediationTest, mediation_test
+from .panel_frame import PanelFrame
+from .parallel import parallel_map
+from .prepass import DesignPrepass, DesignReport
+from .validity import ValidityIndex
+from .result_cache import (
+    CompactResults,
+    ResultCache,
+    column_digests,
+    compact_result,
+    index_digest,
+)
 from pydantic import BaseModel, ConfigDict
 
 
@@ -9,15 +36,20 @@ class RegressionResult(BaseModel):
     model_config = ConfigDict(arbitrary_types_allowed=True)
     description: str  # A textual description of the regression result
     results: list[
-        PanelEffectsResults
+        PanelEffectsResults | AbsorbingResults
     ]  # A list of regression results from the panel data model
     regression_type: str  # The type of regression performed
     regression_config: (
         RegressionConfig  # The configuration settings used for the regression
     )
+    equality_test: WaldTest | None = None  # heterogeneity: equal coefficients
+    mediation_test: MediationTest | None = None  # mediation: indirect effect
+    design: DesignReport | None = None  # what the DesignPrepass dropped
 
 
-def fixed_effects(effects: list[str], df: pd.DataFrame) -> tuple[bool, bool, bool]:
+def fixed_effects(
+    effects: list[str], df: pd.DataFrame, panel: PanelFrame | None = None
+) -> tuple[bool, bool, bool]:
     """
     Return the fixed effects for the regression
 
@@ -25,6 +57,8 @@ def fixed_effects(effects: list[str], df: pd.DataFrame) -> tuple[bool, bool, boo
     Use "time" to indicate the time effect, not the variable name
     For other effects, directly use the column name
 
+    With a PanelFrame of df, other effects are passed as their codes instead
+    of their labels.
     """
     if "entity" in effects:
         entity_effects = True
@@ -38,162 +72,751 @@ def fixed_effects(effects: list[str], df: pd.DataFrame) -> tuple[bool, bool, boo
 
     other_effects = None
     other_cols = [col for col in effects if col not in ["entity", "time"]]
+    columns = df if panel is None else panel.frame(other_cols, df.index)
     if len(other_cols) == 1:
-        other_effects = df[other_cols[0]]
+        other_effects = columns[other_cols[0]]
     elif len(other_cols) > 1:
-        other_effects = df[other_cols]
+        other_effects = columns[other_cols]
 
     return entity_effects, time_effects, other_effects
 
 
-def panel_regression(
-    df: pd.DataFrame,
-    regression_config: RegressionConfig,
-) -> list[PanelEffectsResults]:
+def panel_model(
+    dependent: pd.DataFrame,
+    exog: pd.DataFrame,
+    entity_effects: bool,
+    time_effects: bool,
+    other_effects: pd.DataFrame | None,
+    cache: DemeanCache | None = None,
+) -> PanelOLS:
     """
-    Basic panel data model.
+    Build the PanelOLS model for one regression.
 
-    When run another regression without controls, the first regression is the one with controls.
+    When a DemeanCache is given, the within transformation of each column is
+    read from (and stored in) the cache.
     """
-    regression_results = []
+    if cache is None:
+        return PanelOLS(
+            dependent=dependent,
+            exog=exog,
+            entity_effects=entity_effects,
+            time_effects=time_effects,
+            other_effects=other_effects,
+        )
+    return CachedPanelOLS(
+        dependent=dependent,
+        exog=exog,
+        entity_effects=entity_effects,
+        time_effects=time_effects,
+        other_effects=other_effects,
+        cache=cache,
+    )
 
-    dep_var = df[regression_config.dependent_vars]
 
-    exog_vars = df[regression_config.independent_vars + regression_config.control_vars]
+def fit_regression(
+    df: pd.DataFrame,
+    dependent_var: str,
+    exog_vars: list[str],
+    regression_config: RegressionConfig,
+    cache: DemeanCache | None = None,
+    panel: PanelFrame | None = None,
+) -> PanelEffectsResults | AbsorbingResults:
+    """
+    Fit one regression of dependent_var on exog_vars.
 
+    The effects, constant, covariance and estimator backend come from the
+    regression config: "panelols" fits PanelOLS, "absorb" absorbs the effects
+    by alternating projections. The effects and clusters are read from panel,
+    a PanelFrame of df (built here for effects or clusters other than entity
+    and time when not given), and the fit uses the rows of its sample where
+    none of their labels is missing (coded -1).
+    """
+    if regression_config.estimator == "absorb":
+        return absorbing_regression(
+            df,
+            dependent_var,
+            exog_vars,
+            regression_config.effects,
+            constant=regression_config.constant,
+            cache=cache,
+            cov_types=regression_config.cov_types(),
+            panel=panel,
+        )
+
+    df, panel = panelols_sample(
+        df, [dependent_var] + exog_vars, regression_config, panel
+    )
+    dep_var = df[[dependent_var]]
+    exog = df[exog_vars]
     if regression_config.constant:
-        exog_vars = exog_vars.assign(constant=1)
+        exog = exog.assign(constant=1)
 
     entity_effects, time_effects, other_effects = fixed_effects(
-        regression_config.effects, df
+        regression_config.effects, df, panel
     )
 
-    model = PanelOLS(
+    model = panel_model(
         dependent=dep_var,
-        exog=exog_vars,
+        exog=exog,
         entity_effects=entity_effects,
         time_effects=time_effects,
         other_effects=other_effects,
+        cache=cache,
     )
+    return model.fit(**panelols_cov_config(regression_config.cov_type, df, panel))
+
+
+def panelols_sample(
+    df: pd.DataFrame,
+    columns: list[str],
+    regression_config: RegressionConfig,
+    panel: PanelFrame | None = None,
+) -> tuple[pd.DataFrame, PanelFrame | None]:
+    """
+    The rows of df, and their PanelFrame, that a PanelOLS fit reads.
+
+    The effects and clusters are read from panel, a PanelFrame of df (built
+    here for effects or clusters other than entity and time when not given).
+    The rows are those of its sample where none of their labels is missing
+    (coded -1); when some are left out, only the given columns are copied.
+    """
+    encoded = effect_columns({"": regression_config})
+    if panel is None and encoded:
+        panel = PanelFrame(df, encoded)
+    if panel is not None:
+        dims = regression_config.effects + cluster_dims(regression_config.cov_types())
+        keep = np.ones(len(panel), dtype=bool) if panel.sample is None else panel.sample
+        for code in panel.effect_codes(dims).values():
+            keep = keep & (code >= 0)
+        if panel.sample is not None or not keep.all():
+            rows = np.flatnonzero(keep)
+            df = df[columns].iloc[rows]
+            panel = panel.take(rows)
+    return df, panel
+
+
+def panelols_cov_config(
+    cov_type: str, df: pd.DataFrame, panel: PanelFrame | None = None
+) -> dict:
+    """
+    PanelOLS.fit arguments for a covariance name (see covariance.py).
+
+    Entity and time clusters use PanelOLS' own flags, other clusters are
+    passed as columns of df, or as their codes with a PanelFrame of df.
+    """
+    kind, dims = parse_cov_type(cov_type)
+    if kind != "clustered":
+        return {"cov_type": kind}
+    config = {
+        "cov_type": "clustered",
+        "cluster_entity": "entity" in dims,
+        "cluster_time": "time" in dims,
+    }
+    columns = [dim for dim in dims if dim not in ["entity", "time"]]
+    if columns:
+        config["clusters"] = (
+            df[columns] if panel is None else panel.frame(columns, df.index)
+        )
+    return config
+
+
+def panel_regression(
+    df: pd.DataFrame,
+    regression_config: RegressionConfig,
+    cache: DemeanCache | None = None,
+    panel: PanelFrame | None = None,
+    short_panel: PanelFrame | None = None,
+) -> list[PanelEffectsResults | AbsorbingResults]:
+    """
+    Basic panel data model.
+
+    When run another regression without controls, the first regression is the one with controls.
+
+    The regression without controls is solved from the cross products of
+    the one with controls: by the "absorb" estimator (see
+    absorbing_regression_nested), and with PanelOLS by nested_panelols(),
+    which returns its PanelOLS statistics as CompactResults. It is refitted
+    when it keeps rows the one with controls drops.
+
+    short_panel, a PanelFrame of df, is the sample of the regression without
+    controls when it differs from the sample of panel (see group_panels()).
+    """
+    if regression_config.estimator == "absorb":
+        return panel_regression_batch(
+            df, [regression_config], cache=cache, panel=panel, short_panel=short_panel
+        )[0]
+
+    regression_results = []
+
+    dependent_var = regression_config.dependent_vars[0]
+    exog_vars = regression_config.independent_vars + regression_config.control_vars
+
+    # the regression without controls is solved from the demeaned columns of
+    # the one with controls when both use the same rows
+    nested = regression_config.run_another_regression_without_controls
+    if nested and short_panel is not None and short_panel is not panel:
+        nested = np.array_equal(_sample_mask(panel), _sample_mask(short_panel))
+    long_df, long_panel = df, panel
+    if nested:
+        long_df, long_panel = panelols_sample(
+            df, [dependent_var] + exog_vars, regression_config, panel
+        )
+        used = long_df[[dependent_var] + regression_config.independent_vars]
+        missing = long_df[regression_config.control_vars].isna().any(axis=1)
+        nested = not (used.notna().all(axis=1) & missing).any()
+    own_cache = nested and cache is None
+    if own_cache:
+        cache = DemeanCache()
 
     # run regression
-    result = model.fit(cov_type="clustered", cluster_entity=True)
+    result = fit_regression(
+        long_df,
+        dependent_var,
+        exog_vars,
+        regression_config,
+        cache=cache,
+        panel=long_panel,
+    )
     regression_results.append(result)
 
     # run another regression without controls
-    if regression_config.run_another_regression_without_controls:
+    if nested:
+        result = nested_panelols(
+            result,
+            regression_config.independent_vars,
+            regression_config,
+            long_df,
+            long_panel,
+        )
+        regression_results = [result] + regression_results
+        if own_cache:
+            cache.clear()
+    elif regression_config.run_another_regression_without_controls:
+        result = fit_regression(
+            df,
+            dependent_var,
+            regression_config.independent_vars,
+            regression_config,
+            cache=cache,
+            panel=panel if short_panel is None else short_panel,
+        )
+        regression_results = [result] + regression_results
 
-        exog_vars = df[regression_config.independent_vars]
-        if regression_config.constant:
-            exog_vars = exog_vars.assign(constant=1)
+    return regression_results
 
-        model = PanelOLS(
-            dependent=dep_var,
-            exog=exog_vars,
-            entity_effects=entity_effects,
-            time_effects=time_effects,
-            other_effects=other_effects,
+
+def _sample_mask(panel: PanelFrame | None) -> np.ndarray | None:
+    return None if panel is None or panel.sample is None else panel.sample
+
+
+def nested_panelols(
+    result: PanelEffectsResults,
+    short_vars: list[str],
+    regression_config: RegressionConfig,
+    df: pd.DataFrame,
+    panel: PanelFrame | None = None,
+) -> CompactResults:
+    """
+    The PanelOLS fit on short_vars, a subset of the regressors of result,
+    on the same rows.
+
+    The within-transformed columns of result's model are read back from its
+    DemeanCache (see CachedPanelOLS), so the short model's X'X and X'y are
+    blocks of the long model's cross products and nothing is demeaned again.
+    The clustered scores, and the between, within and overall R-squared,
+    take one more pass over the model's data. The estimates, covariance and
+    fit statistics are those of PanelOLS.
+
+    df and panel are the data result was fitted on (see panelols_sample()).
+    """
+    model = result.model
+    y, x, _ = model._fast_path(low_memory=model._choose_twoway_algo())
+    names = list(model.exog.vars)
+    columns = [names.index(name) for name in short_vars]
+    if regression_config.constant:
+        columns.append(names.index("constant"))
+    used = [names[j] for j in columns]
+    x_short = x[:, columns]
+
+    factor = cho_factor(x_short.T @ x_short)
+    params = cho_solve(factor, x_short.T @ y)
+    eps = y - x_short @ params
+
+    # the covariance PanelOLS.fit would compute, with its degrees of freedom
+    cov_config = panelols_cov_config(regression_config.cov_type, df, panel)
+    cov_type = cov_config.pop("cov_type")
+    cov_config = model._setup_clusters(cov_config)
+    neffects = result.df_model - x.shape[1]
+    adjust = model._determine_df_adjustment(cov_type, **cov_config)
+    cov = setup_covariance_estimator(
+        model._cov_estimators,
+        cov_type,
+        y,
+        x_short,
+        params,
+        model.dependent.entity_ids,
+        model.dependent.time_ids,
+        debiased=True,  # PanelOLS.fit's default
+        extra_df=neffects if adjust else 0,
+        **cov_config,
+    ).cov
+
+    # R-squared variants, as PanelOLS._rsquared computes them
+    constant_only = model.has_constant and len(columns) == 1
+
+    def rsquared(y: np.ndarray, x: np.ndarray, centered: bool) -> float:
+        resid = y - x @ params
+        total = y - y.mean() if centered else y
+        total_ss = float(np.squeeze(total.T @ total))
+        if constant_only or total_ss <= 0:
+            return 0.0
+        return 1 - float(np.squeeze(resid.T @ resid)) / total_ss
+
+    y_between, x_between, _ = model._prepare_between()
+    x_raw = model.exog.values2d[:, columns]
+    rsquared_between = rsquared(y_between, x_between[:, columns], model.has_constant)
+    rsquared_overall = rsquared(model.dependent.values2d, x_raw, model.has_constant)
+    rsquared_within = 0.0
+    if model.dependent.nobs > 1:
+        rsquared_within = rsquared(
+            model.dependent.demean("entity", return_panel=False),
+            PanelData(model.exog.dataframe.iloc[:, columns]).demean(
+                "entity", return_panel=False
+            ),
+            centered=False,
         )
-        result = model.fit(cov_type="clustered", cluster_entity=True)
-        regression_results = [result] + regression_results
+
+    # rows, effects and clusters are those of result
+    return compact_result(result, df, regression_config, panel).model_copy(
+        update={
+            "params": pd.Series(params[:, 0], index=used, name="parameter"),
+            "cov": pd.DataFrame(cov, index=used, columns=used),
+            "df_model": len(columns) + neffects,
+            "df_resid": result.nobs - len(columns) - neffects,
+            "resid_ss": float(np.squeeze(eps.T @ eps)),
+            "rsquared_within": rsquared_within,
+            "rsquared_between": rsquared_between,
+            "rsquared_overall": rsquared_overall,
+            "fitted_values": pd.DataFrame(
+                x_raw @ params, index=model.dependent.index, columns=["fitted_values"]
+            ),
+        }
+    )
+
+
+def panel_regression_batch(
+    df: pd.DataFrame,
+    regression_configs: list[RegressionConfig],
+    cache: DemeanCache | None = None,
+    panel: PanelFrame | None = None,
+    short_panel: PanelFrame | None = None,
+) -> list[list[AbsorbingResults]]:
+    """
+    panel_regression for specs that differ only in the dependent variable.
+
+    All outcomes are solved with one factorization of the demeaned regressors
+    (see absorbing_regression_multi). The specs must come from one group of
+    outcome_groups().
+
+    Returns:
+        list[list[AbsorbingResults]]: the panel_regression results of each spec.
+    """
+    first = regression_configs[0]
+    dependent_vars = [config.dependent_vars[0] for config in regression_configs]
+    exog_vars = first.independent_vars + first.control_vars
+
+    # specs that also run another regression without controls
+    short = [
+        config.dependent_vars[0]
+        for config in regression_configs
+        if config.run_another_regression_without_controls
+    ]
+    if not short:
+        with_controls = absorbing_regression_multi(
+            df,
+            dependent_vars,
+            exog_vars,
+            first.effects,
+            constant=first.constant,
+            cache=cache,
+            cov_types=first.cov_types(),
+            panel=panel,
+        )
+        return [[result] for result in with_controls]
+
+    # the short models come from the long models' cross products
+    with_controls, without_controls = absorbing_regression_nested(
+        df,
+        dependent_vars,
+        exog_vars,
+        first.independent_vars,
+        first.effects,
+        constant=first.constant,
+        cache=cache,
+        short_dependent_vars=short,
+        cov_types=first.cov_types(),
+        panel=panel,
+        short_panel=short_panel,
+    )
+    without_controls = iter(without_controls)
+    regression_results = []
+    for config, result in zip(regression_configs, with_controls):
+        if config.run_another_regression_without_controls:
+            regression_results.append([next(without_controls), result])
+        else:
+            regression_results.append([result])
 
     return regression_results
 
 
-def two_stage_regression(
-    df: pd.DataFrame, regression_config: RegressionConfig
-) -> list[PanelEffectsResults]:
+def spec_sample(
+    df: pd.DataFrame,
+    columns: list[str],
+    regression_config: RegressionConfig,
+    panel: PanelFrame | None = None,
+) -> np.ndarray:
     """
-    Two stage regression using instrumental variables (2SLS)
+    Mask of the rows where none of columns and none of the spec's effects or
+    clusters is missing, within the sample of panel.
+    """
+    keep = ~np.isnan(df[columns].to_numpy(dtype=np.float64)).any(axis=1)
+    if panel is None:
+        panel = PanelFrame(df, effect_columns({"": regression_config}))
+    dims = regression_config.effects + cluster_dims(regression_config.cov_types())
+    for code in panel.effect_codes(dims).values():
+        keep &= code >= 0
+    if panel.sample is not None:
+        keep &= panel.sample
+    return keep
+
+
+def moderation_terms(regression_config: RegressionConfig) -> list[str]:
+    """Names of the interactions of a moderating spec, "x:m" for each x."""
+    moderating_var = regression_config.moderating_var
+    return [f"{var}:{moderating_var}" for var in regression_config.independent_vars]
+
+
+def moderation_frame(
+    df: pd.DataFrame,
+    regression_config: RegressionConfig,
+    panel: PanelFrame | None = None,
+) -> pd.DataFrame:
+    """
+    df with the interactions of a moderating spec as extra columns.
 
-    First stage: Regress endogenous variable on instruments and controls
-    Second stage: Use predicted values from first stage
+    The products are computed on the arrays and added to a shallow copy, so
+    df is left unchanged and its columns are not copied. Centered products
+    use the means on the spec's sample: the rows where none of its variables,
+    effects or clusters is missing, within the sample of panel.
     """
-    # Get the endogenous variable (first independent variable)
-    endogenous_var = regression_config.independent_vars[0]
+    moderating_var = regression_config.moderating_var
+    independent_vars = regression_config.independent_vars
+    x = df[independent_vars].to_numpy(dtype=np.float64)
+    m = df[moderating_var].to_numpy(dtype=np.float64)
+    if regression_config.moderation_centered:
+        columns = (
+            regression_config.dependent_vars[:1]
+            + independent_vars
+            + [moderating_var]
+            + regression_config.control_vars
+        )
+        keep = spec_sample(df, columns, regression_config, panel)
+        x = x - x[keep].mean(0)
+        m = m - m[keep].mean()
+    products = x * m[:, None]
+    return df.assign(
+        **{
+            name: products[:, j]
+            for j, name in enumerate(moderation_terms(regression_config))
+        }
+    )
 
-    # First stage: regress endogenous variable on instrument and controls
-    dep_var = df[endogenous_var]  # endogenous variable is now dependent variable
-    exog_vars = df[[regression_config.instrument_var] + regression_config.control_vars]
 
-    if regression_config.constant:
-        exog_vars = exog_vars.assign(constant=1)
+def moderating_regression(
+    df: pd.DataFrame,
+    regression_config: RegressionConfig,
+    cache: DemeanCache | None = None,
+    panel: PanelFrame | None = None,
+    short_panel: PanelFrame | None = None,
+) -> list[PanelEffectsResults | AbsorbingResults]:
+    """
+    Moderating effect model: panel_regression of the dependent variable on
+    the independent variables, the moderator, their interactions (see
+    moderation_frame()) and the controls.
 
-    entity_effects, time_effects, other_effects = fixed_effects(
-        regression_config.effects, df
+    With centered interactions the main effects are those at the means of
+    the other variable; x and m enter uncentered, which only moves the
+    constant, so specs with different moderators share the demeaned x and
+    control columns through the cache.
+    """
+    expanded = regression_config.model_copy(
+        update={
+            "independent_vars": regression_config.independent_vars
+            + [regression_config.moderating_var]
+            + moderation_terms(regression_config),
+            "moderating_var": "",
+        }
+    )
+    return panel_regression(
+        moderation_frame(df, regression_config, panel),
+        expanded,
+        cache=cache,
+        panel=panel,
+        short_panel=short_panel,
     )
 
-    model = PanelOLS(
-        dependent=dep_var,
-        exog=exog_vars,
-        entity_effects=entity_effects,
-        time_effects=time_effects,
-        other_effects=other_effects,
+
+def mediating_regression(
+    df: pd.DataFrame,
+    regression_config: RegressionConfig,
+    cache: DemeanCache | None = None,
+    panel: PanelFrame | None = None,
+) -> tuple[list[PanelEffectsResults | AbsorbingResults], MediationTest]:
+    """
+    Mediating effect model: the mediator equation (mediating_var on the
+    independent variables and controls) and the outcome equation (the
+    dependent variable on the independent variables, the mediator and the
+    controls), fitted on their common sample.
+
+    The indirect effect of the first independent variable is tested by
+    mediation_test() with the config's mediation_draws and a fixed seed, so
+    reruns and process pools give the same interval.
+
+    Returns:
+        tuple[list, MediationTest]: the mediator and outcome equations, and
+        the test of the indirect effect.
+    """
+    mediator = regression_config.mediating_var
+    dependent_var = regression_config.dependent_vars[0]
+    independent_vars = regression_config.independent_vars
+    control_vars = regression_config.control_vars
+    if panel is None:
+        panel = PanelFrame(df, effect_columns({"": regression_config}))
+    columns = [dependent_var, mediator] + independent_vars + control_vars
+    panel = panel.with_sample(spec_sample(df, columns, regression_config, panel))
+
+    a_result = fit_regression(
+        df,
+        mediator,
+        independent_vars + control_vars,
+        regression_config,
+        cache=cache,
+        panel=panel,
+    )
+    b_result = fit_regression(
+        df,
+        dependent_var,
+        independent_vars + [mediator] + control_vars,
+        regression_config,
+        cache=cache,
+        panel=panel,
     )
-    first_stage = model.fit(cov_type="clustered", cluster_entity=True)
+    test = mediation_test(
+        df,
+        regression_config,
+        a_result,
+        b_result,
+        draws=regression_config.mediation_draws,
+        seed=0,
+        cache=cache,
+    )
+    return [a_result, b_result], test
 
-    # Second stage: use predicted values
-    df_with_predicted = df.copy()
-    df_with_predicted[f"{endogenous_var}_predicted"] = first_stage.fitted_values
 
-    # Run second stage with predicted values
-    dep_var = df_with_predicted[regression_config.dependent_vars]
-    exog_vars = df_with_predicted[
-        [f"{endogenous_var}_predicted"] + regression_config.control_vars
-    ]
+def iv_variables(
+    regression_config: RegressionConfig,
+) -> tuple[list[str], list[str], list[str]]:
+    """
+    Return the endogenous regressors, exogenous regressors and excluded
+    instruments of an instrumental variables spec.
 
-    model = PanelOLS(
-        dependent=dep_var,
-        exog=exog_vars,
-        entity_effects=entity_effects,
-        time_effects=time_effects,
-        other_effects=other_effects,
+    The instruments are instrument_var and instrument_vars. The endogenous
+    regressors are endogenous_vars, by default the first independent
+    variable; the other independent variables and the controls are exogenous.
+    """
+    instruments = (
+        [regression_config.instrument_var] if regression_config.instrument_var else []
     )
-    second_stage = model.fit(cov_type="clustered", cluster_entity=True)
+    instruments += [
+        var for var in regression_config.instrument_vars if var not in instruments
+    ]
+    endogenous = (
+        regression_config.endogenous_vars or regression_config.independent_vars[:1]
+    )
+    exog = [
+        var for var in regression_config.independent_vars if var not in endogenous
+    ] + regression_config.control_vars
+    return endogenous, exog, instruments
 
-    return [first_stage, second_stage]
 
+def two_stage_regression(
+    df: pd.DataFrame,
+    regression_config: RegressionConfig,
+    cache: DemeanCache | None = None,
+    panel: PanelFrame | None = None,
+) -> list[AbsorbingResults | IVResults]:
+    """
+    Two stage regression using instrumental variables (2SLS)
+
+    First stage: Regress each endogenous variable on instruments and controls
+    Second stage: Regress the dependent variable on the endogenous variables
+    instrumented by the first stage, with 2SLS standard errors
 
-def group_regression(
-    df: pd.DataFrame, regression_config: RegressionConfig
-) -> list[PanelEffectsResults]:
+    Works on the arrays of the used columns, df is not copied. See iv.py.
     """
-    Group regression.
+    return two_stage_regression_batch(
+        df, [regression_config], cache=cache, panel=panel
+    )[0]
+
+
+def two_stage_regression_batch(
+    df: pd.DataFrame,
+    regression_configs: list[RegressionConfig],
+    cache: DemeanCache | None = None,
+    panel: PanelFrame | None = None,
+) -> list[list[AbsorbingResults | IVResults]]:
+    """
+    two_stage_regression for specs that differ only in the dependent variable.
+
+    The specs share one first stage, i.e. one projection on the instruments,
+    and one factorization of the second-stage cross products.
 
-    The first regression is the one with dummy variable == 0
-    The second regression is the one with dummy variable == 1
+    Returns:
+        list[list[AbsorbingResults | IVResults]]: the first stages followed by
+        the second stage, for each spec.
     """
-    group_var = regression_config.group_var
+    first = regression_configs[0]
+    endogenous, exog, instruments = iv_variables(first)
+    first_stage, second_stage = iv_regression(
+        df,
+        [config.dependent_vars[0] for config in regression_configs],
+        endogenous,
+        exog,
+        instruments,
+        first.effects,
+        constant=first.constant,
+        cache=cache,
+        cov_types=first.cov_types(),
+        panel=panel,
+    )
+    return [first_stage + [result] for result in second_stage]
 
-    # Split sample based on group variable
-    df_group_0 = df[df[group_var] == 0]
-    df_group_1 = df[df[group_var] == 1]
 
-    # Run regression for each group
-    results = []
-    for group_df in [df_group_0, df_group_1]:
-        dep_var = group_df[regression_config.dependent_vars]
+def fit_group_slice(
+    df: pd.DataFrame,
+    start: int,
+    stop: int,
+    dependent_var: str,
+    exog_vars: list[str],
+    regression_config: RegressionConfig,
+    cache: DemeanCache | None = None,
+    panel: PanelFrame | None = None,
+) -> PanelEffectsResults | AbsorbingResults:
+    """fit_regression on rows start:stop of df (panel is a PanelFrame of df)."""
+    return fit_regression(
+        df.iloc[start:stop],
+        dependent_var,
+        exog_vars,
+        regression_config,
+        cache=cache,
+        panel=None if panel is None else panel.take(slice(start, stop)),
+    )
 
-        exog_vars = group_df[
-            regression_config.independent_vars + regression_config.control_vars
-        ]
-        if regression_config.constant:
-            exog_vars = exog_vars.assign(constant=1)
 
-        entity_effects, time_effects, other_effects = fixed_effects(
-            regression_config.effects, group_df
+def heterogeneity_regression(
+    df: pd.DataFrame,
+    regression_config: RegressionConfig,
+    cache: DemeanCache | None = None,
+    workers: int = 1,
+    panel: PanelFrame | None = None,
+) -> tuple[list[PanelEffectsResults | AbsorbingResults], pd.Index, WaldTest | None]:
+    """
+    Fit the regression on every level of regression_config.group_var.
+
+    The panel is sorted by the group once (see GroupedPanel) and each level is
+    fitted on a slice of the sorted panel, and on the matching slice of the
+    codes of panel (a PanelFrame of df, built here when not given). With
+    workers > 1 the levels are spread over a process pool that shares the
+    sorted panel.
+
+    With regression_config.group_interacted, the fully interacted pooled
+    model is also fitted: the regressors, their interactions with the dummy
+    of every level but the first, and the level dummies unless the effects
+    absorb them. The Wald test that all interactions are zero is a
+    Chow-style test of equal coefficients across the levels.
+
+    Returns:
+        tuple: the results of each level (then the pooled model), the
+        levels, and the equality test (None without the pooled model).
+    """
+    dependent_var = regression_config.dependent_vars[0]
+    exog_vars = regression_config.independent_vars + regression_config.control_vars
+    effect_vars = [
+        col
+        for col in regression_config.effects
+        + cluster_dims(regression_config.cov_types())
+        if col not in ["entity", "time"]
+    ]
+    if panel is None:
+        panel = PanelFrame(df, effect_vars + [regression_config.group_var])
+    grouped = GroupedPanel(
+        df,
+        regression_config.group_var,
+        columns=[dependent_var] + exog_vars + effect_vars,
+        panel=panel,
+    )
+
+    tasks = [
+        (*grouped.bounds(i), dependent_var, exog_vars, regression_config)
+        for i in range(len(grouped))
+    ]
+    if workers > 1:
+        results = parallel_map(
+            grouped.df,
+            fit_group_slice,
+            tasks,
+            workers=workers,
+            shared={"panel": grouped.panel},
         )
+    else:
+        results = [
+            fit_group_slice(grouped.df, *task, cache=cache, panel=grouped.panel)
+            for task in tasks
+        ]
 
-        model = PanelOLS(
-            dependent=dep_var,
-            exog=exog_vars,
-            entity_effects=entity_effects,
-            time_effects=time_effects,
-            other_effects=other_effects,
+    equality_test = None
+    if regression_config.group_interacted:
+        dummies = not grouped.nested_in(regression_config.effects)
+        pooled_df, interactions = grouped.interacted(exog_vars, dummies)
+        added = [col for col in pooled_df.columns if col not in grouped.df.columns]
+        pooled = fit_regression(
+            pooled_df,
+            dependent_var,
+            exog_vars + added,
+            regression_config,
+            cache=cache,
+            panel=grouped.valid_panel(),
         )
-        results.append(model.fit(cov_type="clustered", cluster_entity=True))
+        results.append(pooled)
+        equality_test = wald_test(pooled, interactions)
+
+    return results, grouped.levels, equality_test
+
+
+def group_regression(
+    df: pd.DataFrame,
+    regression_config: RegressionConfig,
+    cache: DemeanCache | None = None,
+    panel: PanelFrame | None = None,
+) -> list[PanelEffectsResults | AbsorbingResults]:
+    """
+    Group regression.
 
-    return results
+    One regression per level of the group variable, in sorted level order:
+    for a dummy, the first regression is the one with dummy variable == 0 and
+    the second the one with dummy variable == 1. See heterogeneity_regression.
+    """
+    return heterogeneity_regression(df, regression_config, cache=cache, panel=panel)[0]
 
 
 def get_function_name(func) -> str:
@@ -206,8 +829,421 @@ def get_function_name(func) -> str:
     return func.__name__
 
 
-def run_regressions(
+def run_regression(
+    df: pd.DataFrame,
+    regression_description: str,
+    reg_config: RegressionConfig,
+    cache: DemeanCache | None = None,
+    results: list[PanelEffectsResults | AbsorbingResults] | None = None,
+    panel: PanelFrame | None = None,
+    short_panel: PanelFrame | None = None,
+    workers: int = 1,
+) -> RegressionResult:
+    """
+    Run one regression config and wrap it in a RegressionResult.
+
+    For a basic panel or 2SLS regression, results already fitted by
+    panel_regression_batch() or two_stage_regression_batch() can be passed
+    in instead of fitting again. panel is a PanelFrame of df that encodes
+    the effect, cluster and group columns of the config, and short_panel
+    the sample of the regression without controls (see group_panels()).
+    With workers > 1, the levels of a heterogeneity regression are fitted
+    on a process pool (see heterogeneity_regression()).
+    """
+    if reg_config.instrument_var or reg_config.instrument_vars:
+        endogenous, _, _ = iv_variables(reg_config)
+        if len(endogenous) == 1:
+            modify_description = f"{regression_description}\n The first regression result is the one with instrumental variable, i.e. stage 1 of 2SLS\n The second regression result is the one use predicted values from the first stage, i.e. stage 2 of 2SLS\n"
+        else:
+            modify_description = f"{regression_description}\n The first {len(endogenous)} regression results are the stage 1 of 2SLS for {', '.join(endogenous)}\n The last regression result is the stage 2 of 2SLS\n"
+        if results is None:
+            results = two_stage_regression(df, reg_config, cache=cache, panel=panel)
+        return RegressionResult(
+            description=modify_description,
+            results=results,
+            regression_type=get_function_name(two_stage_regression),
+            regression_config=reg_config,
+        )
+
+    elif reg_config.group_var:
+        results, levels, equality_test = heterogeneity_regression(
+            df, reg_config, cache=cache, workers=workers, panel=panel
+        )
+        modify_description = regression_description
+        for i, level in enumerate(levels):
+            modify_description += f"\n Regression result {i + 1} is the one with {reg_config.group_var} == {level}"
+        if equality_test is not None:
+            modify_description += f"\n The last regression result is the pooled model interacted with the {reg_config.group_var} levels\n {equality_test}"
+        return RegressionResult(
+            description=modify_description,
+            results=results,
+            regression_type=get_function_name(group_regression),
+            regression_config=reg_config,
+            equality_test=equality_test,
+        )
+    elif reg_config.mediating_var:
+        results, test = mediating_regression(df, reg_config, cache=cache, panel=panel)
+        modify_description = f"{regression_description}\n The first regression result is the mediator equation, {reg_config.mediating_var} on {reg_config.independent_vars[0]} and the controls\n The second regression result is the outcome equation, {reg_config.dependent_vars[0]} on {reg_config.independent_vars[0]}, {reg_config.mediating_var} and the controls\n {test}"
+        return RegressionResult(
+            description=modify_description,
+            results=results,
+            regression_type=get_function_name(mediating_regression),
+            regression_config=reg_config,
+            mediation_test=test,
+        )
+    elif reg_config.moderating_var:
+        terms = ", ".join(moderation_terms(reg_config))
+        modify_description = f"{regression_description}\n The regressors include the moderating variable {reg_config.moderating_var} and the interactions {terms}"
+        if reg_config.moderation_centered:
+            modify_description += ", products of the variables centered at their means"
+        if reg_config.run_another_regression_without_controls:
+            modify_description += "\n The first regression result is the one without controls\n The second regression result is the one with controls"
+        if results is None:
+            results = moderating_regression(
+                df, reg_config, cache=cache, panel=panel, short_panel=short_panel
+            )
+        return RegressionResult(
+            description=modify_description,
+            results=results,
+            regression_type=get_function_name(moderating_regression),
+            regression_config=reg_config,
+        )
+    else:
+        if reg_config.run_another_regression_without_controls:
+            regression_description = f"{regression_description}\n The first regression result is the one without controls\n The second regression result is the one with controls"
+
+        if results is None:
+            results = panel_regression(
+                df, reg_config, cache=cache, panel=panel, short_panel=short_panel
+            )
+
+        return RegressionResult(
+            description=regression_description,
+            results=results,
+            regression_type=get_function_name(panel_regression),
+            regression_config=reg_config,
+        )
+
+
+def group_columns(
+    df: pd.DataFrame, items: list[tuple[str, RegressionConfig]]
+) -> list[str]:
+    """
+    The columns of df a group from outcome_groups() uses, without the
+    outcomes of a batched group: the backend drops their missing rows per
+    outcome.
+    """
+    columns = config_columns(df, dict(items))
+    if len(items) > 1:
+        outcomes = {config.dependent_vars[0] for _, config in items}
+        columns = [col for col in columns if col not in outcomes]
+    return columns
+
+
+def clean_group(
+    df: pd.DataFrame,
+    items: list[tuple[str, RegressionConfig]],
+    panel: PanelFrame,
+    prepass: DesignPrepass,
+    cache: DemeanCache | None = None,
+) -> tuple[PanelFrame, list[tuple[str, RegressionConfig]], DesignReport]:
+    """
+    Clean the design of a group from outcome_groups() (see prepass.py).
+
+    The sample is the rows where the group's columns, effects and clusters
+    are present, within the sample of panel. The independent variables and
+    controls of the group, which its specs share, are checked in that order.
+
+    Returns:
+        tuple[PanelFrame, list, DesignReport]: panel restricted to the
+        sample without singletons, the items without their absorbed or
+        collinear controls, and the report.
+
+    Raises:
+        ValueError: the specs of the group have different regressors.
+    """
+    first = items[0][1]
+    regressors = first.independent_vars + first.control_vars
+    if any(
+        config.independent_vars + config.control_vars != regressors
+        for _, config in items
+    ):
+        descriptions = [description for description, _ in items]
+        raise ValueError(f"The specs of a group must share regressors: {descriptions}")
+    encoded = effect_columns(dict(items))
+    variables = [col for col in group_columns(df, items) if col not in encoded]
+    sample = spec_sample(df, variables, first, panel)
+    keep, report = prepass.clean(
+        df,
+        regressors,
+        first.effects,
+        first.constant,
+        panel,
+        sample,
+        cache,
+    )
+    dropped = [col for col in report.dropped_columns if col in first.control_vars]
+    if dropped:
+        items = [
+            (
+                description,
+                config.model_copy(
+                    update={
+                        "control_vars": [
+                            col for col in config.control_vars if col not in dropped
+                        ]
+                    }
+                ),
+            )
+            for description, config in items
+        ]
+    return panel.with_sample(keep), items, report
+
+
+def short_model_items(
+    items: list[tuple[str, RegressionConfig]],
+) -> list[tuple[str, RegressionConfig]]:
+    """
+    The items of a group from outcome_groups() without their controls, the
+    specs of their regressions without controls; empty when no spec of the
+    group runs one (2SLS, heterogeneity and mediating specs do not).
+    """
+    if not any(
+        config.run_another_regression_without_controls
+        and not (
+            config.instrument_var
+            or config.instrument_vars
+            or config.group_var
+            or config.mediating_var
+        )
+        for _, config in items
+    ):
+        return []
+    return [
+        (description, config.model_copy(update={"control_vars": []}))
+        for description, config in items
+    ]
+
+
+def group_panels(
+    df: pd.DataFrame,
+    items: list[tuple[str, RegressionConfig]],
+    panel: PanelFrame,
+    validity: ValidityIndex | None = None,
+    prepass: DesignPrepass | None = None,
+    cache: DemeanCache | None = None,
+) -> tuple[
+    PanelFrame,
+    PanelFrame | None,
+    list[tuple[str, RegressionConfig]],
+    DesignReport | None,
+]:
+    """
+    The samples of a group from outcome_groups(), one per fitted model.
+
+    With a ValidityIndex of df, the models with controls use the rows where
+    none of the group's columns is missing (see group_columns()), and the
+    regressions without controls the rows where none of the columns but the
+    controls is missing, so they keep the rows only the controls miss. With
+    a DesignPrepass, both samples are cleaned (see clean_group()).
+
+    Returns:
+        tuple: panel with the sample of the models with controls, panel with
+        the sample of the regressions without controls (None when the group
+        has none), the items without their dropped controls, and the report
+        of the design with controls (None without a prepass).
+    """
+    short_items = short_model_items(items)
+    short_panel = panel if short_items else None
+    if validity is not None:
+        if short_items:
+            short_panel = panel.with_sample(
+                validity.sample(group_columns(df, short_items))
+            )
+        panel = panel.with_sample(validity.sample(group_columns(df, items)))
+    report = None
+    if prepass is not None:
+        if short_items:
+            short_panel = clean_group(df, short_items, short_panel, prepass, cache)[0]
+        panel, items, report = clean_group(df, items, panel, prepass, cache)
+    return panel, short_panel, items, report
+
+
+def run_regression_group(
+    df: pd.DataFrame,
+    items: list[tuple[str, RegressionConfig]],
+    cache: DemeanCache | None = None,
+    compact: bool = False,
+    panel: PanelFrame | None = None,
+    validity: ValidityIndex | None = None,
+    prepass: DesignPrepass | None = None,
+    workers: int = 1,
+) -> list[RegressionResult]:
+    """
+    Run a group from outcome_groups(), solving the outcomes together when
+    the group has more than one spec.
+
+    workers is passed to run_regression() for the levels of a heterogeneity
+    spec.
+
+    With a ValidityIndex of df, each model is fitted on the rows where none
+    of the columns it uses is missing (see group_panels()).
+
+    With a DesignPrepass, the group is fitted on its cleaned designs (see
+    clean_group()) and its results carry the report of the design with
+    controls.
+
+    With compact, the results are reduced by compact_result() before they
+    are returned (in the worker, when run on a process pool).
+    """
+    if panel is None:
+        panel = PanelFrame(df, effect_columns(dict(items)))
+    panel, short_panel, items, report = group_panels(
+        df, items, panel, validity, prepass, cache
+    )
+    if len(items) == 1:
+        regression_results = [
+            run_regression(
+                df,
+                *items[0],
+                cache=cache,
+                panel=panel,
+                short_panel=short_panel,
+                workers=workers,
+            )
+        ]
+    else:
+        configs = [config for _, config in items]
+        if configs[0].instrument_var or configs[0].instrument_vars:
+            batched = two_stage_regression_batch(df, configs, cache=cache, panel=panel)
+        else:
+            batched = panel_regression_batch(
+                df, configs, cache=cache, panel=panel, short_panel=short_panel
+            )
+        regression_results = [
+            run_regression(
+                df, description, config, cache=cache, results=results, panel=panel
+            )
+            for (description, config), results in zip(items, batched)
+        ]
+    if report is not None:
+        regression_results = [
+            regression_result.model_copy(update={"design": report})
+            for regression_result in regression_results
+        ]
+    if compact:
+        regression_results = [
+            compact_regression_result(regression_result, df, panel)
+            for regression_result in regression_results
+        ]
+    return regression_results
+
+
+def compact_regression_result(
+    regression_result: RegressionResult,
+    df: pd.DataFrame,
+    panel: PanelFrame | None = None,
+) -> RegressionResult:
+    """A copy of regression_result whose results went through compact_result()."""
+    config = regression_result.regression_config
+    results = [
+        compact_result(result, df, config, panel)
+        for result in regression_result.results
+    ]
+    return regression_result.model_copy(update={"results": results})
+
+
+def outcome_groups(regression_configs: dict[str, RegressionConfig]) -> list[list[str]]:
+    """
+    Group the descriptions of specs that differ only in the dependent variable.
+
+    Basic panel specs with the "absorb" estimator that share regressors,
+    controls, effects, constant and covariances can be solved together, e.g.
+    the basic spec with its replacement_y_vars specs. 2SLS specs that share
+    the regressors, instruments and effects share their first stage. Every
+    other spec is a group of its own. Groups keep the order of first
+    appearance.
+    """
+    groups: dict[tuple, list[str]] = {}
+    for description, config in regression_configs.items():
+        if config.instrument_var or config.instrument_vars:
+            endogenous, exog, instruments = iv_variables(config)
+            key = (
+                "2sls",
+                tuple(endogenous),
+                tuple(exog),
+                tuple(instruments),
+                tuple(config.effects),
+                config.constant,
+                tuple(config.cov_types()),
+            )
+        elif (
+            config.estimator == "absorb"
+            and not config.group_var
+            and not config.moderating_var
+            and not config.mediating_var
+        ):
+            key = (
+                tuple(config.independent_vars),
+                tuple(config.control_vars),
+                tuple(config.effects),
+                config.constant,
+                tuple(config.cov_types()),
+            )
+        else:
+            key = (description,)
+        groups.setdefault(key, []).append(description)
+    return list(groups.values())
+
+
+def config_columns(
     df: pd.DataFrame, regression_configs: dict[str, RegressionConfig]
+) -> list[str]:
+    """
+    Return the columns of df used by any of the regression configs.
+    """
+    used = set()
+    for reg_config in regression_configs.values():
+        used.update(reg_config.dependent_vars)
+        used.update(reg_config.independent_vars)
+        used.update(reg_config.control_vars)
+        used.update(reg_config.effects)
+        used.update(
+            [
+                reg_config.instrument_var,
+                reg_config.group_var,
+                reg_config.moderating_var,
+                reg_config.mediating_var,
+            ]
+        )
+        used.update(reg_config.instrument_vars)
+        used.update(reg_config.endogenous_vars)
+        used.update(cluster_dims(reg_config.cov_types()))
+    return [col for col in df.columns if col in used]
+
+
+def effect_columns(regression_configs: dict[str, RegressionConfig]) -> list[str]:
+    """
+    Return the effect, cluster and group columns of the regression configs,
+    the columns a PanelFrame encodes for them.
+    """
+    columns = []
+    for reg_config in regression_configs.values():
+        columns += reg_config.effects + cluster_dims(reg_config.cov_types())
+        if reg_config.group_var:
+            columns.append(reg_config.group_var)
+    return [col for col in dict.fromkeys(columns) if col not in ["entity", "time"]]
+
+
+def run_regressions(
+    df: pd.DataFrame,
+    regression_configs: dict[str, RegressionConfig],
+    cache: DemeanCache | None = None,
+    workers: int = 1,
+    result_cache: ResultCache | None = None,
+    compact: bool = False,
+    prepass: DesignPrepass | None = None,
+    level_workers: int = 1,
 ) -> list[RegressionResult]:
     """
     Run regressions based on the regression config
@@ -215,8 +1251,51 @@ def run_regressions(
     Requirement: Double Indexed DataFrame
         With the first index being the entity and the second index being the time.
 
+    All regressions share one DemeanCache, so a column is demeaned once per
+    (sample, effects) no matter how many specs use it. Pass a cache to inspect
+    its hit/miss counts afterwards.
+
+    Specs that differ only in the dependent variable (see outcome_groups) are
+    solved together with one factorization when they use the "absorb" estimator
+    or instrumental variables.
+
+    With workers > 1 the specs are spread over a process pool. The columns the
+    configs use are published once through shared memory, each worker keeps
+    its own DemeanCache (the cache argument is not used) and BLAS threads are
+    split between the workers. The calling script must guard its entry point
+    with `if __name__ == "__main__":`, as workers are spawned.
+
+    With level_workers > 1 and workers == 1, the levels of each
+    heterogeneity spec are fitted on a process pool instead (see
+    heterogeneity_regression()); with workers > 1 each spec's levels are
+    fitted serially by its worker.
+
+    With a result_cache, specs whose config and used columns are unchanged
+    since a previous run are read from disk instead of refitted. Results read
+    from the cache are compact (see result_cache.py); fitted ones are returned
+    whole and stored compacted.
+
+    With compact, every result is reduced to its coefficients, covariance and
+    fit statistics (see compact_result()) as soon as its group is fitted, so
+    the linearmodels models and their data are not kept alive. ResultStore
+    packs such results into flat arrays.
+
+    The effect, cluster and group columns are encoded once, in a PanelFrame
+    shared by every fit (and sent to the workers).
+
+    With a prepass, singleton groups, absorbed and collinear regressors are
+    found once per (sample, effects) before fitting, and every spec on that
+    design is fitted on the cleaned one (see prepass.py); prepass.reports()
+    and the design of each result tell what was dropped. With workers > 1
+    the designs are cleaned here, before the specs are sent to the pool.
+
+    df does not need to be free of missing values: each spec is fitted on the
+    rows where none of the columns it uses is missing, taken from one
+    validity bitset per column (see validity.py), so a row missing only a
+    column of some specs is kept by the others and df is not copied.
+
     Return:
-    A list of RegressionResult, each contains:
+    A list of RegressionResult, in the order of regression_configs, each contains:
     1. the regression description
     2. the regression result
     3. the regression type
@@ -227,42 +1306,81 @@ def run_regressions(
     if not isinstance(df.index, pd.MultiIndex):
         raise ValueError("DataFrame must be double indexed")
 
-    regression_results: list[RegressionResult] = []
+    panel = PanelFrame(df, effect_columns(regression_configs))
+    validity = ValidityIndex(df, config_columns(df, regression_configs), panel)
 
-    for regression_description, reg_config in regression_configs.items():
-        if reg_config.instrument_var:
-            modify_description = f"{regression_description}\n The first regression result is the one with instrumental variable, i.e. stage 1 of 2SLS\n The second regression result is the one use predicted values from the first stage, i.e. stage 2 of 2SLS\n"
-            regression_results.append(
-                RegressionResult(
-                    description=modify_description,
-                    results=two_stage_regression(df, reg_config),
-                    regression_type=get_function_name(two_stage_regression),
-                    regression_config=reg_config,
-                )
+    by_description: dict[str, RegressionResult] = {}
+    keys: dict[str, str] = {}
+    if result_cache is not None:
+        digests = column_digests(df, config_columns(df, regression_configs), panel)
+        index = index_digest(df, panel)
+        for description, reg_config in regression_configs.items():
+            columns = config_columns(df, {description: reg_config})
+            keys[description] = result_cache.key(
+                description,
+                reg_config,
+                index,
+                {col: digests[col] for col in columns},
+                options={} if prepass is None else {"prepass": prepass.settings()},
             )
+            cached = result_cache.get(keys[description])
+            if cached is not None:
+                by_description[description] = cached
+    to_fit = {
+        description: reg_config
+        for description, reg_config in regression_configs.items()
+        if description not in by_description
+    }
 
-        elif reg_config.group_var:
-            modify_description = f"{regression_description}\n The first regression result is the one with dummy variable == 0\n The second regression result is the one with dummy variable == 1"
-            regression_results.append(
-                RegressionResult(
-                    description=modify_description,
-                    results=group_regression(df, reg_config),
-                    regression_type=get_function_name(group_regression),
-                    regression_config=reg_config,
-                )
+    groups = [
+        [(description, to_fit[description]) for description in group]
+        for group in outcome_groups(to_fit)
+    ]
+
+    if workers > 1 and groups:
+        if prepass is not None:
+            # the workers read the cleaned designs from their copy
+            for items in groups:
+                group_panels(df, items, panel, validity, prepass)
+        grouped = parallel_map(
+            df,
+            partial(run_regression_group, compact=compact),
+            [(items,) for items in groups],
+            workers=workers,
+            columns=config_columns(df, to_fit),
+            shared={"panel": panel, "validity": validity, "prepass": prepass},
+        )
+    else:
+        if cache is None:
+            cache = DemeanCache()
+        grouped = [
+            run_regression_group(
+                df,
+                items,
+                cache=cache,
+                compact=compact,
+                panel=panel,
+                validity=validity,
+                prepass=prepass,
+                workers=level_workers,
             )
-        else:
-            if reg_config.run_another_regression_without_controls:
-                regression_description = f"{regression_description}\n The first regression result is the one without controls\n The second regression result is the one with controls"
-
-            regression_results.append(
-                RegressionResult(
-                    description=regression_description,
-                    results=panel_regression(df, reg_config),
-                    regression_type=get_function_name(panel_regression),
-                    regression_config=reg_config,
+            for items in groups
+        ]
+
+    # back to the order of regression_configs
+    for items, results in zip(groups, grouped):
+        for (description, _), result in zip(items, results):
+            by_description[description] = result
+            if result_cache is not None:
+                result_cache.put(
+                    keys[description], compact_regression_result(result, df, panel)
                 )
-            )
+    if result_cache is not None:
+        result_cache.evict()
+
+    regression_results: list[RegressionResult] = [
+        by_description[description] for description in regression_configs
+    ]
 
     return regression_results
 
@@ -0,0 +1,147 @@
+"""
+Integer codes of the grouping columns of a panel, computed once.
+
+Every fit needs the effects and clusters as integer codes: the "absorb" and
+2SLS backends sweep and cluster with np.bincount on them, PanelOLS takes
+them as other_effects and clusters, and the heterogeneity fits sort by them.
+Factorizing the labels (strings, categoricals) is the costly part, so
+run_regressions() builds one PanelFrame for the panel and every fit reads
+its codes; row subsets (samples, group slices) take the codes instead of
+factorizing again. Building a PanelFrame is the only place labels are
+hashed.
+
+- entity and time come from the codes of the MultiIndex
+- every other column is factorized with its levels sorted
+- the rows sorted by (entity, time), with offsets, give the rows of an entity
+  in O(1)
+- an optional sample, a boolean mask of the rows a spec may use (see
+  validity.py), restricts every fit that reads the frame
+"""
+
+import copy
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+
+INDEX_EFFECTS = ("entity", "time")
+
+
+class PanelFrame:
+    """
+    Codes, levels and counts of the grouping columns of a panel.
+
+    Args:
+        df (pd.DataFrame): panel indexed by (entity, time).
+        columns (list[str]): effect, cluster and group columns to encode.
+            "entity" and "time" are always encoded and may be listed.
+
+    Attributes:
+        codes (dict[str, np.ndarray]): int32 code of every row, -1 where the
+            label is missing, by column ("entity" and "time" for the index).
+        levels (dict[str, pd.Index]): labels of the codes.
+        counts (dict[str, np.ndarray]): rows of each level.
+        sample (np.ndarray | None): rows the fits may use, all when None.
+    """
+
+    def __init__(self, df: pd.DataFrame, columns: list[str] | None = None):
+        self.nrows = len(df)
+        self.sample: np.ndarray | None = None
+        self.codes: dict[str, np.ndarray] = {}
+        self.levels: dict[str, pd.Index] = {}
+        index = df.index
+        if not isinstance(index, pd.MultiIndex):
+            index = pd.MultiIndex.from_arrays([index, np.zeros(len(df), dtype=int)])
+        for effect, level_codes, levels in zip(
+            INDEX_EFFECTS, index.codes, index.levels
+        ):
+            # the index is already coded, only unused levels are dropped
+            self.codes[effect], used = _compress(np.asarray(level_codes), len(levels))
+            self.levels[effect] = levels[used]
+        for col in dict.fromkeys(columns or []):
+            if col in INDEX_EFFECTS:
+                continue
+            codes, levels = pd.factorize(df[col], sort=True)
+            self.codes[col] = codes.astype(np.int32)
+            self.levels[col] = pd.Index(levels)
+        self.counts = {
+            name: _count(codes, len(self.levels[name]))
+            for name, codes in self.codes.items()
+        }
+
+    def __len__(self) -> int:
+        return self.nrows
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.codes
+
+    @property
+    def nbytes(self) -> int:
+        arrays = [*self.codes.values(), *self.counts.values()]
+        if "order" in self.__dict__:
+            arrays += [self.order, self.offsets]
+        return int(sum(array.nbytes for array in arrays))
+
+    def effect_codes(self, effects: list[str]) -> dict[str, np.ndarray]:
+        """
+        The codes of every effect, as absorb.effect_codes().
+
+        Raises:
+            KeyError: an effect was not encoded when the frame was built.
+        """
+        missing = [effect for effect in effects if effect not in self.codes]
+        if missing:
+            raise KeyError(f"Columns not encoded in the PanelFrame: {missing}")
+        return {effect: self.codes[effect] for effect in effects}
+
+    def frame(self, names: list[str], index: pd.Index) -> pd.DataFrame:
+        """The codes of names as int32 columns, e.g. for PanelOLS."""
+        return pd.DataFrame(self.effect_codes(names), index=index, copy=False)
+
+    def take(self, rows: np.ndarray | slice) -> "PanelFrame":
+        """
+        The frame of a subset of the rows (positions, a boolean mask or a
+        slice), in that order. The levels are kept, so some may have no rows.
+        """
+        panel = object.__new__(PanelFrame)
+        panel.codes = {name: codes[rows] for name, codes in self.codes.items()}
+        panel.levels = dict(self.levels)
+        panel.nrows = len(panel.codes["entity"])
+        panel.sample = None if self.sample is None else self.sample[rows]
+        panel.counts = {
+            name: _count(codes, len(panel.levels[name]))
+            for name, codes in panel.codes.items()
+        }
+        return panel
+
+    def with_sample(self, sample: np.ndarray | None) -> "PanelFrame":
+        """The same codes (not copied), restricted to the rows of sample."""
+        panel = copy.copy(self)
+        panel.sample = sample
+        return panel
+
+    @cached_property
+    def order(self) -> np.ndarray:
+        """Rows sorted by entity, then time; rows without an entity first."""
+        return np.lexsort((self.codes["time"], self.codes["entity"])).astype(np.int64)
+
+    @cached_property
+    def offsets(self) -> np.ndarray:
+        """Entity i is order[offsets[i]:offsets[i + 1]]."""
+        entities = self.codes["entity"][self.order]
+        return np.searchsorted(entities, np.arange(len(self.levels["entity"]) + 1))
+
+    def entity_rows(self, i: int) -> np.ndarray:
+        """Positions of the rows of entity i, in time order."""
+        return self.order[self.offsets[i] : self.offsets[i + 1]]
+
+
+def _compress(codes: np.ndarray, nlevels: int) -> tuple[np.ndarray, np.ndarray]:
+    """Renumber codes over the levels that occur; -1 stays -1."""
+    used = _count(codes, nlevels) > 0
+    remap = np.append(np.cumsum(used) - 1, -1).astype(np.int32)
+    return remap[codes], used
+
+
+def _count(codes: np.ndarray, nlevels: int) -> np.ndarray:
+    return np.bincount(codes[codes >= 0], minlength=nlevels)
@@ -0,0 +1,260 @@
+"""
+Process-pool execution of regressions over a panel in shared memory.
+
+The panel is published once: every column is copied into a
+multiprocessing.shared_memory block (one block per dtype, one contiguous row
+per column) and the index is published as integer codes. Workers attach to
+the blocks when they start and rebuild the DataFrame from views of the shared
+buffers, so tasks only carry the regression config. Shared keyword
+arguments of the tasks (the PanelFrame of the panel, its ValidityIndex) are
+sent to every worker once, with the pool's initializer.
+"""
+
+import os
+from collections.abc import Iterator
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+import multiprocessing
+from multiprocessing import shared_memory
+import numpy as np
+import pandas as pd
+
+from .demean_cache import DemeanCache
+from .panel_frame import PanelFrame
+
+# Environment variables read by the BLAS/OpenMP runtimes when numpy is imported
+BLAS_THREAD_VARS = (
+    "OMP_NUM_THREADS",
+    "OPENBLAS_NUM_THREADS",
+    "MKL_NUM_THREADS",
+    "VECLIB_MAXIMUM_THREADS",
+    "NUMEXPR_NUM_THREADS",
+)
+
+
+class SharedPanel:
+    """
+    A panel DataFrame published through multiprocessing.shared_memory.
+
+    Numeric and boolean columns are stored as they are. Other columns
+    (strings, categoricals) are stored as integer codes and rebuilt as
+    categoricals; the codes are taken from panel, a PanelFrame of df, for the
+    columns it encodes. Use as a context manager; the blocks are released on
+    exit.
+    """
+
+    def __init__(
+        self,
+        df: pd.DataFrame,
+        columns: list[str] | None = None,
+        panel: PanelFrame | None = None,
+    ):
+        if columns is None:
+            columns = list(df.columns)
+        self._blocks: list[shared_memory.SharedMemory] = []
+        self.spec: dict = {"nrows": len(df), "columns": list(columns), "blocks": []}
+
+        by_dtype: dict[np.dtype, list[str]] = {}
+        categories: dict[str, pd.Index] = {}
+        category_codes: dict[str, np.ndarray] = {}
+        for col in columns:
+            series = df[col]
+            if pd.api.types.is_numeric_dtype(series) or pd.api.types.is_bool_dtype(
+                series
+            ):
+                by_dtype.setdefault(series.to_numpy().dtype, []).append(col)
+            else:
+                if panel is None or col not in panel:
+                    category_codes[col], categories[col] = pd.factorize(series)
+                else:
+                    category_codes[col] = panel.codes[col]
+                    categories[col] = panel.levels[col]
+                by_dtype.setdefault(np.dtype(np.int64), []).append(col)
+
+        for dtype, block_columns in by_dtype.items():
+            values = self._publish((len(block_columns), len(df)), dtype)
+            for i, col in enumerate(block_columns):
+                if col in categories:
+                    values[i] = category_codes[col]
+                else:
+                    values[i] = df[col].to_numpy()
+            self.spec["blocks"].append(
+                (self._blocks[-1].name, dtype.str, block_columns)
+            )
+        self.spec["categories"] = categories
+
+        # Index levels as codes, plus the (small) level values
+        index = df.index
+        if not isinstance(index, pd.MultiIndex):
+            index = pd.MultiIndex.from_arrays([index])
+        codes = self._publish((index.nlevels, len(df)), np.dtype(np.int64))
+        for i, level_codes in enumerate(index.codes):
+            codes[i] = level_codes
+        self.spec["index"] = (
+            self._blocks[-1].name,
+            list(index.levels),
+            list(index.names),
+        )
+
+    def _publish(self, shape: tuple[int, int], dtype: np.dtype) -> np.ndarray:
+        nbytes = max(int(np.prod(shape)) * dtype.itemsize, 1)
+        block = shared_memory.SharedMemory(create=True, size=nbytes)
+        self._blocks.append(block)
+        return np.ndarray(shape, dtype=dtype, buffer=block.buf)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(block.size for block in self._blocks)
+
+    def close(self) -> None:
+        """Release and unlink every shared block."""
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks = []
+
+    def __enter__(self) -> "SharedPanel":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def attach_panel(spec: dict) -> tuple[pd.DataFrame, list[shared_memory.SharedMemory]]:
+    """
+    Rebuild the DataFrame published by a SharedPanel.
+
+    The columns are views of the shared buffers. The returned blocks must be
+    kept alive as long as the DataFrame is used.
+    """
+    nrows = spec["nrows"]
+    blocks = []
+    data = {}
+    for name, dtype, block_columns in spec["blocks"]:
+        block = shared_memory.SharedMemory(name=name)
+        blocks.append(block)
+        values = np.ndarray(
+            (len(block_columns), nrows), dtype=np.dtype(dtype), buffer=block.buf
+        )
+        for i, col in enumerate(block_columns):
+            if col in spec["categories"]:
+                data[col] = pd.Categorical.from_codes(
+                    values[i], categories=spec["categories"][col]
+                )
+            else:
+                data[col] = values[i]
+
+    name, levels, names = spec["index"]
+    block = shared_memory.SharedMemory(name=name)
+    blocks.append(block)
+    codes = np.ndarray((len(levels), nrows), dtype=np.int64, buffer=block.buf)
+    index = pd.MultiIndex(levels=levels, codes=list(codes), names=names)
+
+    df = pd.DataFrame(data, index=index, columns=spec["columns"], copy=False)
+    return df, blocks
+
+
+@contextmanager
+def capped_blas_threads(threads: int):
+    """
+    Set the BLAS/OpenMP thread limits inherited by processes started inside.
+
+    The variables are read when a worker imports numpy, so the pool has to
+    start its processes (with the spawn method) while this is active.
+    """
+    saved = {var: os.environ.get(var) for var in BLAS_THREAD_VARS}
+    os.environ.update({var: str(threads) for var in BLAS_THREAD_VARS})
+    try:
+        yield
+    finally:
+        for var, value in saved.items():
+            if value is None:
+                os.environ.pop(var, None)
+            else:
+                os.environ[var] = value
+
+
+# Per-worker state, set by _init_worker
+_worker_df: pd.DataFrame | None = None
+_worker_blocks: list[shared_memory.SharedMemory] = []
+_worker_cache: DemeanCache | None = None
+_worker_kwargs: dict = {}
+
+
+def _init_worker(spec: dict, kwargs: dict) -> None:
+    global _worker_df, _worker_blocks, _worker_cache, _worker_kwargs
+    _worker_df, _worker_blocks = attach_panel(spec)
+    _worker_cache = DemeanCache()
+    _worker_kwargs = kwargs
+
+
+def _call(func, args: tuple):
+    return func(_worker_df, *args, cache=_worker_cache, **_worker_kwargs)
+
+
+def parallel_map(
+    df: pd.DataFrame,
+    func,
+    tasks: list[tuple],
+    workers: int,
+    columns: list[str] | None = None,
+    blas_threads: int | None = None,
+    shared: dict | None = None,
+) -> list:
+    """
+    Run func(df, *task, cache=cache, **shared) for every task on a process
+    pool.
+
+    df is published once through shared memory; each worker keeps its own
+    DemeanCache for the tasks it runs. Results come back in task order.
+
+    Args:
+        df (pd.DataFrame): double indexed panel.
+        func (Callable): module-level function, so it can be sent to workers.
+        tasks (list[tuple]): positional arguments after df for each call.
+        workers (int): number of worker processes.
+        columns (list[str] | None): columns to publish, all when None.
+        blas_threads (int | None): BLAS threads per worker, by default the
+            cores divided evenly between the workers.
+        shared (dict | None): keyword arguments of every call, sent to each
+            worker once. A PanelFrame of df under "panel" also provides the
+            codes of the published columns.
+    """
+    return list(parallel_imap(df, func, tasks, workers, columns, blas_threads, shared))
+
+
+def parallel_imap(
+    df: pd.DataFrame,
+    func,
+    tasks: list[tuple],
+    workers: int,
+    columns: list[str] | None = None,
+    blas_threads: int | None = None,
+    shared: dict | None = None,
+) -> Iterator:
+    """
+    parallel_map() as a generator: every task is submitted at once and each
+    result is yielded as soon as it and the ones before it are done, so the
+    caller can write them out while the pool works on the rest.
+
+    The pool and the shared panel live until the generator is exhausted or
+    closed.
+    """
+    if blas_threads is None:
+        blas_threads = max(1, (os.cpu_count() or 1) // workers)
+    if shared is None:
+        shared = {}
+
+    panel = SharedPanel(df, columns, shared.get("panel"))
+    with panel, ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(panel.spec, shared),
+    ) as executor:
+        # the workers start on submission, the limits are not kept set
+        # between the yields
+        with capped_blas_threads(blas_threads):
+            futures = [executor.submit(_call, func, task) for task in tasks]
+        for future in futures:
+            yield future.result()
@@ -0,0 +1,447 @@
+"""
+Permutation (placebo) tests of the treatment coefficient of a regression.
+
+The treatment column is reshuffled within strata (across entities within
+each period, across periods within each entity, whole entity paths between
+entities observed in the same periods, or within the levels of a column)
+and the regression is refitted on each placebo treatment. The p-value is
+the share of placebo coefficients at least as large in absolute value as
+the actual one.
+
+No placebo is refitted. With D the absorbed effects and W the other
+regressors demeaned by D, Frisch-Waugh gives the coefficient of a placebo
+treatment x* as
+
+    b* = x*' r / (|M_D x*|^2 - q' (W'W)^-1 q),   q = W' x*
+
+where r = M_W M_D y is the outcome residualized once on the effects and the
+controls (r and W are orthogonal to D, so neither needs x* demeaned). Only
+|M_D x*|^2 depends on the effects: it comes from the level sums of x* with
+a single effect or a balanced entity by time grid, from alternating
+projections otherwise. Permutations are drawn as
+index arrays, in batches, and every placebo of a batch comes out of the same
+few matrix products.
+"""
+
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from pydantic import BaseModel, ConfigDict
+from scipy import sparse
+from scipy.linalg import cho_factor, cho_solve
+
+from .absorb import compress_codes, demean_columns, effect_codes
+from .demean_cache import DemeanCache
+from .parallel import capped_blas_threads
+
+# strata with a meaning of their own, any other name is a column
+PLACEBO_STRATA = ("time", "entity", "entity_blocks")
+
+
+class PlaceboResult(BaseModel):
+    """Permutation test of the treatment coefficient of one regression."""
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+    dependent: str
+    treatment: str
+    estimate: float  # coefficient of the actual treatment
+    placebo: np.ndarray  # coefficient of the treatment in each permutation
+    pvalue: float  # share of |placebo| >= |estimate|, the actual included
+    draws: int
+    strata: str
+    nstrata: int
+
+    def __str__(self) -> str:
+        low, high = np.quantile(self.placebo, [0.025, 0.975])
+        lines = [
+            "Placebo (Permutation) Test",
+            "=" * 80,
+            f"{'Dep. Variable:':<22}{self.dependent}",
+            f"{'Treatment:':<22}{self.treatment}",
+            f"{'Permutations:':<22}{self.draws}",
+            f"{'Strata:':<22}{self.strata} ({self.nstrata})",
+            "",
+            f"{'Estimate:':<22}{self.estimate:.4f}",
+            f"{'Placebo mean:':<22}{self.placebo.mean():.4f}",
+            f"{'Placebo std:':<22}{self.placebo.std():.4f}",
+            f"{'Placebo 95% range:':<22}[{low:.4f}, {high:.4f}]",
+            f"{'Permutation P-value:':<22}{self.pvalue:.4f}",
+        ]
+        return "\n".join(lines)
+
+    def __repr__(self) -> str:
+        return str(self)
+
+
+def _segments(codes: np.ndarray, sort: np.ndarray | None = None) -> list:
+    """
+    Rows of each level of codes, stacked by level size.
+
+    Returns:
+        list[np.ndarray]: one m by L array per level size L, whose rows are
+        the rows of the m levels of that size (ordered by sort within a
+        level, e.g. by period).
+    """
+    order = np.lexsort((codes,) if sort is None else (sort, codes))
+    starts = np.flatnonzero(np.diff(codes[order], prepend=-1))
+    sizes = np.diff(np.append(starts, len(order)))
+    segments = []
+    for size in np.unique(sizes):
+        first = starts[sizes == size]
+        segments.append(order[first[:, None] + np.arange(size)])
+    return segments
+
+
+def within_indices(
+    rng: np.random.Generator, draws: int, strata: np.ndarray
+) -> np.ndarray:
+    """
+    Permutations of the rows within each stratum.
+
+    Args:
+        strata (np.ndarray): n stratum codes.
+
+    Returns:
+        np.ndarray: draws by n row indices; row i of a placebo takes the
+        treatment of row indices[d, i], from the same stratum.
+    """
+    segments = _segments(strata)
+    shuffled = []
+    for rows in segments:
+        # strata of one size are shuffled together, each independently
+        m, size = rows.shape
+        perm = rng.permuted(np.broadcast_to(np.arange(size), (draws, m, size)), axis=2)
+        perm += (np.arange(m) * size)[:, None]
+        shuffled.append(rows.ravel()[perm].reshape(draws, -1))
+    # gathering is cheaper than scattering each row in place
+    target = np.concatenate([rows.ravel() for rows in segments])
+    inverse = np.empty_like(target)
+    inverse[target] = np.arange(len(target))
+    shuffled = shuffled[0] if len(shuffled) == 1 else np.hstack(shuffled)
+    return shuffled[:, inverse]
+
+
+def block_indices(
+    rng: np.random.Generator, draws: int, entity: np.ndarray, time: np.ndarray
+) -> np.ndarray:
+    """
+    Permutations of whole entity paths.
+
+    Each entity takes the treatment path of another entity observed in the
+    same periods (all entities in a balanced panel), period by period.
+
+    Returns:
+        np.ndarray: draws by n row indices, see within_indices().
+    """
+    paths: dict[bytes, list[np.ndarray]] = {}
+    for segment in _segments(entity, sort=time):
+        for rows in segment:
+            paths.setdefault(time[rows].tobytes(), []).append(rows)
+
+    indices = np.empty((draws, len(entity)), dtype=np.int64)
+    for blocks in paths.values():
+        rows = np.stack(blocks)
+        perm = rng.permuted(np.tile(np.arange(len(rows)), (draws, 1)), axis=1)
+        indices[:, rows.ravel()] = rows[perm].reshape(draws, -1)
+    return indices
+
+
+def _indicators(groups: list[tuple[np.ndarray, np.ndarray]]) -> list:
+    """Sparse n by G dummies of each effect, and the inverse level counts."""
+    return [
+        (
+            sparse.csr_matrix(
+                (np.ones(len(codes)), (np.arange(len(codes)), codes)),
+                shape=(len(codes), len(counts)),
+            ),
+            1.0 / counts,
+        )
+        for codes, counts in groups
+    ]
+
+
+def is_grid(groups: list[tuple[np.ndarray, np.ndarray]]) -> bool:
+    """Whether two effects cross completely, one row per pair of levels."""
+    if len(groups) != 2:
+        return False
+    (first, first_counts), (second, second_counts) = groups
+    if len(first) != len(first_counts) * len(second_counts):
+        return False
+    pairs = first.astype(np.int64) * len(second_counts) + second
+    return len(np.unique(pairs)) == len(first)
+
+
+def within_squares(
+    x: np.ndarray,
+    indicators: list,
+    grid: bool = False,
+    tol: float = 1e-10,
+    max_iter: int = 1000,
+) -> np.ndarray:
+    """
+    Sum of squares of each column of x once the effects are swept out.
+
+    One effect, or two crossing as a grid (a balanced entity by time panel),
+    are swept out exactly from the level sums. Otherwise these are the sweeps
+    of map_demean(), on all columns at once: one sparse product per effect.
+    """
+    squares = (x**2).sum(axis=0)
+    if len(indicators) == 1 or grid:
+        for dummies, inverse in indicators:
+            sums = dummies.T @ x
+            squares -= (sums**2 * inverse[:, None]).sum(axis=0)
+        if grid:
+            squares += x.sum(axis=0) ** 2 / len(x)
+        return squares
+    if not indicators:
+        return squares
+
+    x = x.copy()
+    scale = np.maximum(np.sqrt(np.mean(x**2, axis=0)), np.finfo(np.float64).tiny)
+    for _ in range(max_iter):
+        largest = np.zeros(x.shape[1])
+        for dummies, inverse in indicators:
+            means = (dummies.T @ x) * inverse[:, None]
+            x -= dummies @ means
+            largest = np.maximum(largest, np.abs(means).max(axis=0))
+        if (largest < tol * scale).all():
+            break
+    return (x**2).sum(axis=0)
+
+
+def placebo_coefficients(
+    indices: np.ndarray,
+    x: np.ndarray,
+    resid: np.ndarray,
+    w: np.ndarray,
+    factor,
+    indicators: list,
+    grid: bool = False,
+) -> np.ndarray:
+    """
+    Coefficient of the treatment in each placebo of a batch.
+
+    Args:
+        indices (np.ndarray): B by n row indices of the placebo treatments.
+        x (np.ndarray): n treatment values (not demeaned).
+        resid (np.ndarray): n outcomes residualized on the effects and w.
+        w (np.ndarray): n by k other regressors, demeaned.
+        factor: Cholesky factor of w'w (None without other regressors).
+        indicators (list): sparse dummies of the effects, see _indicators().
+        grid (bool): the two effects form a grid, see is_grid().
+    """
+    placebo = x[indices.T]  # n by B
+    numerator = resid @ placebo
+    denominator = within_squares(placebo, indicators, grid)
+    if factor is not None:
+        q = w.T @ placebo
+        denominator -= (q * cho_solve(factor, q)).sum(axis=0)
+    return numerator / denominator
+
+
+def _placebo_draws(
+    seed: np.random.SeedSequence,
+    draws: int,
+    scheme: tuple[str, np.ndarray, np.ndarray | None],
+    terms: tuple,
+    batch_size: int,
+) -> np.ndarray:
+    """Placebo coefficients of draws permutations, made in batches."""
+    rng = np.random.default_rng(seed)
+    strata, codes, time = scheme
+    x, resid, w, factor, groups = terms
+    indicators = _indicators(groups)
+    grid = is_grid(groups)
+    placebo = np.empty(draws)
+    for start in range(0, draws, batch_size):
+        size = min(batch_size, draws - start)
+        if strata == "entity_blocks":
+            indices = block_indices(rng, size, codes, time)
+        else:
+            indices = within_indices(rng, size, codes)
+        placebo[start : start + size] = placebo_coefficients(
+            indices, x, resid, w, factor, indicators, grid
+        )
+    return placebo
+
+
+def permutation_test(
+    y: np.ndarray,
+    x: np.ndarray,
+    w: np.ndarray,
+    groups: list[tuple[np.ndarray, np.ndarray]],
+    scheme: tuple[str, np.ndarray, np.ndarray | None],
+    draws: int = 999,
+    seed: int | None = None,
+    workers: int = 1,
+    batch_size: int = 100,
+) -> tuple[float, np.ndarray, float]:
+    """
+    Permutation test of the coefficient of x.
+
+    Args:
+        y (np.ndarray): n outcomes, demeaned.
+        x (np.ndarray): n treatment values, not demeaned (they are permuted).
+        w (np.ndarray): n by k other regressors, demeaned.
+        groups (list[tuple[np.ndarray, np.ndarray]]): (codes, counts) of the
+            absorbed effects, with the constant as a one-level effect.
+        scheme (tuple): (strata, codes, time): the strata name, the stratum
+            code of each row (the entity for "entity_blocks") and, for
+            "entity_blocks", the period of each row.
+        draws (int): permutations.
+        seed (int | None): seed of the permutations.
+        workers (int): processes to split the permutations across.
+        batch_size (int): permutations per matrix product.
+
+    Returns:
+        tuple[float, np.ndarray, float]: the estimate, the placebo
+        coefficients and the permutation p-value.
+    """
+    factor = None
+    resid = y
+    if w.shape[1]:
+        factor = cho_factor(w.T @ w)
+        resid = y - w @ cho_solve(factor, w.T @ y)
+    terms = (x, resid, w, factor, groups)
+    identity = np.arange(len(x))[None, :]
+    estimate = placebo_coefficients(
+        identity, *terms[:4], _indicators(groups), is_grid(groups)
+    )[0]
+
+    seeds = np.random.SeedSequence(seed).spawn(max(workers, 1))
+    shares = [len(chunk) for chunk in np.array_split(np.arange(draws), len(seeds))]
+    if workers > 1:
+        blas_threads = max(1, (os.cpu_count() or 1) // workers)
+        with capped_blas_threads(blas_threads), ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+        ) as executor:
+            futures = [
+                executor.submit(_placebo_draws, seed, share, scheme, terms, batch_size)
+                for seed, share in zip(seeds, shares)
+            ]
+            placebo = np.concatenate([future.result() for future in futures])
+    else:
+        placebo = _placebo_draws(seeds[0], draws, scheme, terms, batch_size)
+
+    # ties up to rounding count as exceedances (e.g. the identity permutation)
+    exceed = (np.abs(placebo) >= abs(estimate) * (1 - 1e-12)).sum()
+    return float(estimate), placebo, float((exceed + 1) / (draws + 1))
+
+
+def placebo_regression(
+    df: pd.DataFrame,
+    regression_result,
+    result_index: int = -1,
+    treatment: str | None = None,
+    strata: str | None = "time",
+    draws: int = 999,
+    seed: int | None = None,
+    workers: int = 1,
+    batch_size: int = 100,
+    cache: DemeanCache | None = None,
+) -> PlaceboResult:
+    """
+    Permutation test of the treatment in one fitted result of a
+    RegressionResult.
+
+    The sample is the fitted result's, and the effects and constant come from
+    the regression config, as in bootstrap_regression().
+
+    Args:
+        df (pd.DataFrame): the panel the result was fitted on.
+        regression_result (RegressionResult): output of run_regression(s).
+        result_index (int): which of its results, the last by default.
+        treatment (str | None): the permuted regressor, by default the first
+            independent variable.
+        strata (str | None): "time" reshuffles across entities within each
+            period, "entity" across periods within each entity,
+            "entity_blocks" swaps whole entity paths, a column reshuffles
+            within its levels and None across all rows.
+        draws, seed, workers, batch_size: see permutation_test().
+        cache (DemeanCache | None): reuse demeaned columns.
+
+    Raises:
+        ValueError: for 2SLS results, or regressors not in df (e.g. the
+        interactions of a pooled heterogeneity model).
+    """
+    config = regression_result.regression_config
+    result = regression_result.results[result_index]
+    if hasattr(result, "instruments"):
+        raise ValueError("The placebo test of 2SLS results is not supported")
+
+    names = list(result.params.index)
+    exog_vars = [name for name in names if name != "constant"]
+    missing = [name for name in exog_vars if name not in df.columns]
+    if missing:
+        raise ValueError(f"Regressors not in the data: {missing}")
+    if hasattr(result, "dependent") and isinstance(result.dependent, str):
+        dependent_var = result.dependent
+    else:
+        dependent_var = result.model.dependent.vars[0]
+    if treatment is None:
+        treatment = config.independent_vars[0]
+    if treatment not in exog_vars:
+        raise ValueError(f"{treatment!r} is not a regressor of the result")
+    controls = [name for name in exog_vars if name != treatment]
+
+    # used columns, on the rows of the fitted sample
+    columns = [dependent_var] + exog_vars
+    columns += [
+        col for col in config.effects + [strata] if col not in [None, *PLACEBO_STRATA]
+    ]
+    rows = df.index.get_indexer(result.fitted_values.index)
+    sample = df[list(dict.fromkeys(columns))].iloc[rows]
+    y = sample[dependent_var].to_numpy(dtype=np.float64)
+    x = sample[treatment].to_numpy(dtype=np.float64)
+    w = sample[controls].to_numpy(dtype=np.float64)
+    codes = effect_codes(config.effects, sample)
+    groups = [compress_codes(effect_code) for effect_code in codes.values()]
+
+    effects = list(codes)
+    y_dm = demean_columns(y[:, None], [dependent_var], groups, effects, cache)[0]
+    w_dm = demean_columns(w, controls, groups, effects, cache)[0]
+    if "constant" in names and not groups:
+        # the constant is partialled out like a one-level effect
+        groups = [(np.zeros(len(y), dtype=np.intp), np.array([len(y)]))]
+        y_dm = y_dm - y_dm.mean(0)
+        w_dm = w_dm - w_dm.mean(0)
+
+    if strata == "entity_blocks":
+        index_codes = effect_codes(["entity", "time"], sample)
+        scheme = (strata, index_codes["entity"], index_codes["time"])
+        nstrata = len(np.unique(scheme[1]))
+    else:
+        if strata is None:
+            stratum = np.zeros(len(y), dtype=np.intp)
+        else:
+            stratum = effect_codes([strata], sample)[strata]
+            if (stratum < 0).any():
+                raise ValueError(f"Missing values in the strata column {strata!r}")
+            stratum = compress_codes(stratum)[0]
+        scheme = (str(strata), stratum, None)
+        nstrata = int(stratum.max()) + 1
+
+    estimate, placebo, pvalue = permutation_test(
+        y_dm[:, 0],
+        x,
+        w_dm,
+        groups,
+        scheme,
+        draws=draws,
+        seed=seed,
+        workers=workers,
+        batch_size=batch_size,
+    )
+    return PlaceboResult(
+        dependent=dependent_var,
+        treatment=treatment,
+        estimate=estimate,
+        placebo=placebo,
+        pvalue=pvalue,
+        draws=draws,
+        strata=str(strata),
+        nstrata=nstrata,
+    )
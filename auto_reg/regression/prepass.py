@@ -0,0 +1,236 @@
+"""
+Pre-pass over the encoded panel before fitting: singletons, absorbed and
+collinear regressors.
+
+Without it every fit meets the same problems on its own: PanelOLS and the
+absorb backend keep singleton groups (levels of an effect with one row,
+whose residual is zero), and a regressor the effects absorb (a
+time-invariant control under entity effects) or a control collinear with
+the others only shows up when X'X is factorized, as a failure. The pre-pass
+finds them once per (sample, effects) and every spec that fits on that
+sample reuses the cleaned design:
+
+1. singletons: rows whose level of any effect has a single row in the
+   sample are dropped, repeatedly, since dropping a row can leave another
+   level with one row; each sweep is one np.bincount per effect
+2. absorbed columns: the regressors are demeaned on the cleaned sample (as
+   in absorb.py, through the DemeanCache) and a column is absorbed when
+   almost nothing of it is left, relative to its variation about its mean
+   (about zero without a constant)
+3. collinear columns: the demeaned columns are taken in order and a column
+   is collinear when its residual on the columns kept before it is almost
+   zero, from the Cholesky-style pivots of their cross products, so the
+   independent variables, which come first, are kept over the controls
+
+Dropping singletons changes no slope, it only removes levels that use up
+their own rows (and moves the constant, a grand mean); the number of
+observations and the absorbed levels fall together. Absorbed or collinear
+controls are removed from the specs; independent variables are reported but
+kept, so such a spec still fails as it would without the pre-pass.
+"""
+
+import numpy as np
+import pandas as pd
+from pydantic import BaseModel
+
+from .absorb import compress_codes, demean_columns
+from .demean_cache import DemeanCache, fingerprint
+from .panel_frame import PanelFrame
+
+
+class DesignReport(BaseModel):
+    """What the pre-pass dropped from one (sample, effects, regressors)."""
+
+    effects: list[str]
+    columns: list[str]  # regressors checked, in order
+    nobs: int  # rows of the sample before the pre-pass
+    singletons: dict[str, int]  # rows dropped as singletons of each effect
+    sweeps: int  # passes until no singleton was left
+    absorbed: list[str]  # regressors absorbed by the effects (or the constant)
+    collinear: list[str]  # regressors collinear with those before them
+
+    @property
+    def dropped_rows(self) -> int:
+        return sum(self.singletons.values())
+
+    @property
+    def dropped_columns(self) -> list[str]:
+        return self.absorbed + self.collinear
+
+    def __str__(self) -> str:
+        singletons = ", ".join(f"{name}: {n}" for name, n in self.singletons.items())
+        return (
+            f"Pre-pass on {self.nobs} rows with effects {self.effects}: "
+            f"{self.dropped_rows} singleton rows dropped ({singletons or 'none'}), "
+            f"absorbed {self.absorbed or 'none'}, collinear {self.collinear or 'none'}"
+        )
+
+
+def drop_singletons(
+    codes: list[np.ndarray], keep: np.ndarray
+) -> tuple[np.ndarray, list[int], int]:
+    """
+    Drop the rows of singleton levels until none is left.
+
+    Args:
+        codes (list[np.ndarray]): codes of each effect (0..G-1 on the rows
+            of keep).
+        keep (np.ndarray): boolean mask of the sample, it is not modified.
+
+    Returns:
+        tuple[np.ndarray, list[int], int]: the mask without singletons, the
+        rows dropped as singletons of each effect, and the number of sweeps.
+    """
+    keep = keep.copy()
+    dropped = [0] * len(codes)
+    sweeps = 0
+    changed = len(codes) > 0
+    while changed:
+        sweeps += 1
+        changed = False
+        for j, code in enumerate(codes):
+            rows = np.flatnonzero(keep)
+            counts = np.bincount(code[rows])
+            singleton = rows[counts[code[rows]] == 1]
+            if len(singleton):
+                keep[singleton] = False
+                dropped[j] += len(singleton)
+                changed = True
+    return keep, dropped, sweeps
+
+
+def absorbed_columns(
+    x: np.ndarray, x_dm: np.ndarray, constant: bool, tol: float = 1e-8
+) -> np.ndarray:
+    """
+    Columns of x the effects absorb: their demeaned sum of squares x_dm is
+    below tol times their sum of squares about the mean (about zero without
+    a constant). Columns without variation are absorbed by the constant.
+    """
+    center = x.mean(0) if constant else 0.0
+    total = ((x - center) ** 2).sum(0)
+    left = (x_dm**2).sum(0)
+    return left <= tol * np.maximum(total, np.finfo(np.float64).tiny)
+
+
+def collinear_columns(z: np.ndarray, tol: float = 1e-9) -> np.ndarray:
+    """
+    Columns of z that are (almost) linear combinations of the columns before
+    them that are kept: the squared residual of the column on them is below
+    tol times its own sum of squares.
+    """
+    zpz = z.T @ z
+    kept: list[int] = []
+    collinear = np.zeros(z.shape[1], dtype=bool)
+    for j in range(z.shape[1]):
+        residual = zpz[j, j]
+        if kept:
+            cross = zpz[kept, j]
+            residual -= cross @ np.linalg.solve(zpz[np.ix_(kept, kept)], cross)
+        if residual <= tol * zpz[j, j] or zpz[j, j] == 0:
+            collinear[j] = True
+        else:
+            kept.append(j)
+    return collinear
+
+
+class DesignPrepass:
+    """
+    Cleaned designs, computed once per (sample, effects) and reused by every
+    spec that fits on them.
+
+    Pass one to run_regressions(); afterwards reports() lists what was
+    dropped. The singleton pass is keyed by the sample and the effects, the
+    column checks also by the regressors and the constant.
+
+    Args:
+        singletons (bool): drop singleton groups.
+        tol (float): relative tolerance of the absorbed and collinear checks.
+    """
+
+    def __init__(self, singletons: bool = True, tol: float = 1e-8):
+        self.singletons = singletons
+        self.tol = tol
+        self._samples: dict[tuple, tuple[np.ndarray, dict[str, int], int]] = {}
+        self._designs: dict[tuple, DesignReport] = {}
+
+    def __len__(self) -> int:
+        return len(self._designs)
+
+    def settings(self) -> dict:
+        """The options that change the results, e.g. for cache keys."""
+        return {"singletons": self.singletons, "tol": self.tol}
+
+    def reports(self) -> list[DesignReport]:
+        """The report of every design cleaned so far."""
+        return list(self._designs.values())
+
+    def sample(
+        self, sample: np.ndarray, effects: list[str], panel: PanelFrame
+    ) -> tuple[np.ndarray, dict[str, int], int]:
+        """
+        The sample without singleton groups of the effects, the rows dropped
+        for each effect and the sweeps (see drop_singletons()).
+        """
+        key = (fingerprint(sample), tuple(effects))
+        if key not in self._samples:
+            codes = panel.effect_codes(effects)
+            if self.singletons and effects:
+                keep, dropped, sweeps = drop_singletons(list(codes.values()), sample)
+            else:
+                keep, dropped, sweeps = sample.copy(), [0] * len(effects), 0
+            keep.flags.writeable = False
+            self._samples[key] = (keep, dict(zip(effects, dropped)), sweeps)
+        return self._samples[key]
+
+    def clean(
+        self,
+        df: pd.DataFrame,
+        columns: list[str],
+        effects: list[str],
+        constant: bool,
+        panel: PanelFrame,
+        sample: np.ndarray,
+        cache: DemeanCache | None = None,
+    ) -> tuple[np.ndarray, DesignReport]:
+        """
+        Clean the design of the regressors columns on the rows of sample.
+
+        Args:
+            df (pd.DataFrame): the panel.
+            columns (list[str]): regressors, in order of priority.
+            effects (list[str]): absorbed effects.
+            constant (bool): whether the specs have a constant.
+            panel (PanelFrame): codes of df, with the effects.
+            sample (np.ndarray): rows where the columns, effects and
+                clusters are present.
+            cache (DemeanCache | None): reuse demeaned columns.
+
+        Returns:
+            tuple[np.ndarray, DesignReport]: the cleaned sample, shared by
+            every design on the same (sample, effects), and the report.
+        """
+        keep, dropped, sweeps = self.sample(sample, effects, panel)
+        key = (fingerprint(keep), tuple(effects), constant, tuple(columns))
+        if key not in self._designs:
+            rows = np.flatnonzero(keep)
+            x = df[columns].iloc[rows].to_numpy(dtype=np.float64)
+            codes = panel.effect_codes(effects)
+            groups = [compress_codes(code[rows]) for code in codes.values()]
+            if groups:
+                x_dm = demean_columns(x, columns, groups, effects, cache)[0]
+            else:
+                x_dm = x - x.mean(0) if constant else x
+            absorbed = absorbed_columns(x, x_dm, constant, self.tol)
+            collinear = np.zeros(len(columns), dtype=bool)
+            collinear[~absorbed] = collinear_columns(x_dm[:, ~absorbed], self.tol)
+            self._designs[key] = DesignReport(
+                effects=effects,
+                columns=columns,
+                nobs=int(sample.sum()),
+                singletons=dropped,
+                sweeps=sweeps,
+                absorbed=[name for name, flag in zip(columns, absorbed) if flag],
+                collinear=[name for name, flag in zip(columns, collinear) if flag],
+            )
+        return keep, self._designs[key]
@@ -1,10 +1,11 @@
 # data pipeline:
 # dataframe and research config -> regression config
 
-from pydantic import Field, BaseModel
+from pydantic import Field, BaseModel, field_validator, model_validator
+from typing import Literal
+from .covariance import parse_cov_type
 import pandas as pd
 
-
 # TODO: this is not used
 regression_models: dict[str, str] = {
     "basic_regression": "panel data regression model",
@@ -26,6 +27,42 @@ class BaseRegressionConfig(BaseModel):
     control_vars: list[str] = []
     control_vars_description: list[str] = []
     constant: bool = True
+    # "panelols": linearmodels PanelOLS, at most two effects
+    # "absorb": alternating projections, any number of effects (see absorb.py)
+    estimator: Literal["panelols", "absorb"] = "panelols"
+    # covariance of the results: "unadjusted", "robust", "clustered" (by
+    # entity) or "clustered:<a>[,<b>]" with "entity", "time" or columns
+    cov_type: str = "clustered"
+    # more covariances from the same residuals, "absorb" estimator only
+    extra_cov_types: list[str] = []
+
+    @field_validator("cov_type")
+    @classmethod
+    def _check_cov_type(cls, cov_type: str) -> str:
+        parse_cov_type(cov_type)
+        return cov_type
+
+    @field_validator("extra_cov_types")
+    @classmethod
+    def _check_extra_cov_types(cls, cov_types: list[str]) -> list[str]:
+        for cov_type in cov_types:
+            parse_cov_type(cov_type)
+        return cov_types
+
+    @model_validator(mode="after")
+    def _check_estimator_cov_types(self):
+        if self.extra_cov_types and self.estimator != "absorb":
+            raise ValueError(
+                "extra_cov_types needs the absorb estimator, PanelOLS computes "
+                "one covariance per fit"
+            )
+        return self
+
+    def cov_types(self) -> list[str]:
+        """The covariance of the results followed by the extra ones."""
+        return [self.cov_type] + [
+            cov_type for cov_type in self.extra_cov_types if cov_type != self.cov_type
+        ]
 
 
 class RegressionConfig(BaseRegressionConfig):
@@ -42,8 +79,26 @@ class RegressionConfig(BaseRegressionConfig):
     # extra variables
     instrument_var: str = ""
     instrument_var_description: str = ""
+    # several instruments and endogenous regressors; by default the
+    # instrument is instrument_var and the endogenous regressor is the first
+    # independent variable
+    instrument_vars: list[str] = []
+    endogenous_vars: list[str] = []
     group_var: str = ""
     group_var_description: str = ""
+    # also fit the fully interacted pooled model and test equal coefficients
+    group_interacted: bool = False
+    # moderating effect: the moderator and its interactions with the
+    # independent variables are added to the regressors
+    moderating_var: str = ""
+    moderating_var_description: str = ""
+    # the interactions are products of the variables centered at their means
+    moderation_centered: bool = False
+    # mediating effect: fit the mediator and outcome equations and test the
+    # indirect effect through the mediator, with this many bootstrap draws
+    mediating_var: str = ""
+    mediating_var_description: str = ""
+    mediation_draws: int = 5000
 
     @classmethod
     def create_with_base(
@@ -58,6 +113,9 @@ class RegressionConfig(BaseRegressionConfig):
             control_vars=base_config.control_vars,
             control_vars_description=base_config.control_vars_description,
             constant=base_config.constant,
+            estimator=base_config.estimator,
+            cov_type=base_config.cov_type,
+            extra_cov_types=base_config.extra_cov_types,
             **kwargs,
         )
 
@@ -83,6 +141,12 @@ class ResearchConfig(BaseModel):
     extra_effects at most 2 effects. When use extra_effects, the basic regression effects are ommited.
     effect must use "entity" and "time" when denote index vars.
 
+    estimator: "panelols" or "absorb". With "absorb", effects and extra_effects
+    may list any number of effects.
+
+    cov_type and extra_cov_types: covariances of every regression, see
+    BaseRegressionConfig and covariance.py.
+
     """
 
     # research topic
@@ -110,6 +174,10 @@ class ResearchConfig(BaseModel):
     mediating_vars: list[str] = []
     mediating_vars_description: list[str] = []
 
+    # moderating variables, interacted with the independent variables
+    moderating_vars: list[str] = []
+    moderating_vars_description: list[str] = []
+
     # supplementary variables for robustness test
     extra_control_vars: list[str] = []
     extra_control_vars_description: list[str] = []
@@ -128,6 +196,15 @@ class ResearchConfig(BaseModel):
 
     constant: bool = True
     run_another_regression_without_controls: bool = True
+    # heterogeneity: also fit the fully interacted pooled model (Chow-style test)
+    group_interacted: bool = False
+    # moderating effect: center the variables before interacting them
+    center_moderating_vars: bool = False
+    # mediating effect: cluster bootstrap draws of the indirect effect
+    mediation_draws: int = 5000
+    estimator: Literal["panelols", "absorb"] = "panelols"
+    cov_type: str = "clustered"
+    extra_cov_types: list[str] = []
 
     def _all_vars(self) -> list[str]:
         """Return all variables in the research config"""
@@ -138,6 +215,7 @@ class ResearchConfig(BaseModel):
             + self.instrument_vars
             + self.group_vars
             + self.mediating_vars
+            + self.moderating_vars
             + self.extra_control_vars
             + self.replacement_x_vars
             + self.replacement_y_vars
@@ -187,6 +265,9 @@ class ResearchConfig(BaseModel):
             control_vars=self.control_vars,
             control_vars_description=self.control_vars_description,
             constant=self.constant,
+            estimator=self.estimator,
+            cov_type=self.cov_type,
+            extra_cov_types=self.extra_cov_types,
         )
 
         # Basic regression config
@@ -280,17 +361,27 @@ class ResearchConfig(BaseModel):
                     base_config,
                     regression_type="mediating_effect",
                     effects=self.effects,
+                    mediating_var=mediating_var,
+                    mediating_var_description=self.mediating_vars_description[i],
+                    mediation_draws=self.mediation_draws,
                 )
-                temp_config.dependent_vars = [mediating_var]
-                temp_config.dependent_var_description = [
-                    self.mediating_vars_description[i]
-                ]
-                regression_description = f"mediating effect test by test the correlation between independent variables and mediating variables. The mediating variable is: {mediating_var}. The independent variable is: {self.independent_vars[0]}."
+                regression_description = f"mediating effect test by regressing the mediating variable on the independent variable and the dependent variable on both. The mediating variable is: {mediating_var}. The independent variable is: {self.independent_vars[0]}."
                 configs[regression_description] = temp_config
 
         # Moderating effect config
-        # TODO: Add configs for:
-        # - Interaction terms
+        # - Interaction terms of the independent variables with each moderator
+        if self.moderating_vars is not None:
+            for i, moderating_var in enumerate(self.moderating_vars):
+                temp_config = RegressionConfig.create_with_base(
+                    base_config,
+                    regression_type="moderating_effect",
+                    effects=self.effects,
+                    moderating_var=moderating_var,
+                    moderating_var_description=self.moderating_vars_description[i],
+                    moderation_centered=self.center_moderating_vars,
+                )
+                regression_description = f"moderating effect test by interacting the independent variables with the moderating variable: {moderating_var}. The independent variable is: {self.independent_vars[0]}."
+                configs[regression_description] = temp_config
 
         # Heterogeneity analysis config
         if self.group_vars is not None:
@@ -301,6 +392,7 @@ class ResearchConfig(BaseModel):
                     effects=self.effects,
                     group_var=group_var,
                     group_var_description=self.group_vars_description[i],
+                    group_interacted=self.group_interacted,
                 )
                 configs[f"heterogeneity test by group variable: {group_var}"] = (
                     temp_config
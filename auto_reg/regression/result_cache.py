@@ -0,0 +1,271 @@
+"""
+Persistent cache of fitted regressions, keyed by content.
+
+The key of a spec is a digest of:
+- its description and canonical RegressionConfig (JSON with sorted keys)
+- the panel index and the values of every column the spec uses
+A rerun on unchanged data therefore refits only the specs whose config
+changed, and editing a column invalidates exactly the specs that read it.
+
+Entries hold compact results: coefficients, covariance and fit statistics,
+without the model and data that linearmodels results keep. Each entry is a
+pickle in the cache directory. A hit refreshes the file's modification time
+and, once the directory grows past max_bytes, the least recently used
+entries are deleted.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from linearmodels.panel.results import PanelEffectsResults
+
+from .absorb import AbsorbingResults, effect_codes
+from .covariance import parse_cov_type
+from .demean_cache import fingerprint
+from .panel_frame import PanelFrame
+from .regression_config import RegressionConfig
+
+# bump when the stored results change shape
+CACHE_VERSION = 2
+
+
+class CompactResults(AbsorbingResults):
+    """Fit statistics of a fitted result, without its model and data."""
+
+    estimator: str = "PanelOLS"  # title of the original result
+    cov_estimator: str = ""  # cov label of the original result, cov_type if empty
+    rsquared_within: float = np.nan  # PanelOLS only
+    rsquared_between: float = np.nan  # PanelOLS only
+    rsquared_overall: float = np.nan  # PanelOLS only
+
+    @property
+    def title(self) -> str:
+        return self.estimator
+
+    @property
+    def summary(self) -> str:
+        """
+        Summary with the labels of the original result.
+
+        PanelOLS reports its model R-squared (rsquared, on the data net of the
+        included effects) next to the between, within and overall ones; array
+        results only have the first, which is their within R-squared.
+        """
+        effects = ", ".join(f"{name} ({n})" for name, n in self.effects.items())
+        header = [
+            ("Dep. Variable:", self.dependent),
+            ("Estimator:", self.estimator),
+            ("No. Observations:", str(self.nobs)),
+            ("Cov. Estimator:", self.cov_estimator or self.cov_type),
+            ("No. Clusters:", str(self.nclusters)),
+        ]
+        if np.isnan(self.rsquared_within):
+            header.append(("R-squared (Within):", f"{self.rsquared:.4f}"))
+        else:
+            header += [
+                ("R-squared:", f"{self.rsquared:.4f}"),
+                ("R-squared (Between):", f"{self.rsquared_between:.4f}"),
+                ("R-squared (Within):", f"{self.rsquared_within:.4f}"),
+                ("R-squared (Overall):", f"{self.rsquared_overall:.4f}"),
+            ]
+        header.append(("Effects:", effects or "None"))
+        return self._format_summary(header)
+
+
+def compact_result(
+    result: PanelEffectsResults | AbsorbingResults,
+    df: pd.DataFrame,
+    regression_config: RegressionConfig,
+    panel: PanelFrame | None = None,
+) -> AbsorbingResults:
+    """
+    Drop the per-row data of a fitted result.
+
+    Array-backend results lose their fitted values. PanelOLS results become
+    CompactResults; their effect levels and clusters are counted on the
+    fitted rows of df, with the codes of panel (a PanelFrame of df) if given.
+    """
+    if isinstance(result, AbsorbingResults):
+        return result.model_copy(update={"fitted_values": None})
+
+    rows = df.index.get_indexer(result.fitted_values.index)
+    sample = df.iloc[rows]
+    if panel is not None:
+        panel = panel.take(rows)
+    codes = effect_codes(regression_config.effects, sample, panel)
+    _, dims = parse_cov_type(regression_config.cov_type)
+    nclusters = 0
+    if dims:
+        nclusters = len(np.unique(effect_codes(dims[:1], sample, panel)[dims[0]]))
+    return CompactResults(
+        dependent=result.model.dependent.vars[0],
+        estimator=result.name,
+        params=result.params,
+        cov=result.cov,
+        nobs=result.nobs,
+        df_model=result.df_model,
+        df_resid=result.df_resid,
+        resid_ss=result.resid_ss,
+        total_ss=result.total_ss,
+        effects={name: len(np.unique(code)) for name, code in codes.items()},
+        cov_type=regression_config.cov_type,
+        nclusters=nclusters,
+        # the label PanelOLS prints, e.g. "Clustered"; linearmodels keeps it private
+        cov_estimator=result._cov_type,
+        rsquared_within=result.rsquared_within,
+        rsquared_between=result.rsquared_between,
+        rsquared_overall=result.rsquared_overall,
+    )
+
+
+def column_digests(
+    df: pd.DataFrame, columns: list[str], panel: PanelFrame | None = None
+) -> dict[str, str]:
+    """
+    Fingerprint the values of each column.
+
+    Numeric columns are hashed from their buffers, other columns (strings,
+    categoricals) from pandas' row hashes, or from their codes and levels
+    when panel, a PanelFrame of df, encodes them.
+    """
+    digests = {}
+    for col in columns:
+        values = df[col].to_numpy()
+        if values.dtype.kind in "biufcmM":
+            digests[col] = fingerprint(values)
+        elif panel is not None and col in panel:
+            digests[col] = _codes_digest(panel, col)
+        else:
+            values = pd.util.hash_pandas_object(df[col], index=False).to_numpy()
+            digests[col] = fingerprint(values)
+    return digests
+
+
+def index_digest(df: pd.DataFrame, panel: PanelFrame | None = None) -> str:
+    """Fingerprint the panel index (the rows and their order)."""
+    if panel is not None:
+        return _codes_digest(panel, "entity", "time")
+    return fingerprint(pd.util.hash_pandas_object(df.index).to_numpy())
+
+
+def _codes_digest(panel: PanelFrame, *names: str) -> str:
+    arrays = []
+    for name in names:
+        levels = pd.util.hash_pandas_object(panel.levels[name], index=False)
+        arrays += [panel.codes[name], levels.to_numpy()]
+    return fingerprint(*arrays)
+
+
+class ResultCache:
+    """
+    On-disk cache of RegressionResults.
+
+    Args:
+        path (str | Path): cache directory, created if missing.
+        max_bytes (int): size above which the least recently used entries
+            are evicted.
+    """
+
+    def __init__(self, path: str | Path, max_bytes: int = 1 << 30):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(
+        description: str,
+        regression_config: RegressionConfig,
+        index: str,
+        columns: dict[str, str],
+        options: dict | None = None,
+    ) -> str:
+        """
+        Key of a spec.
+
+        Args:
+            description (str): description of the spec.
+            regression_config (RegressionConfig): the spec.
+            index (str): index_digest() of the panel.
+            columns (dict[str, str]): column_digests() of the used columns.
+            options (dict | None): run options that change the results
+                (e.g. the pre-pass settings), JSON-serializable.
+        """
+        content = {
+            "version": CACHE_VERSION,
+            "description": description,
+            "config": regression_config.model_dump(mode="json"),
+            "index": index,
+            "columns": columns,
+        }
+        if options:
+            content["options"] = options
+        payload = json.dumps(content, sort_keys=True)
+        return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+    def _file(self, key: str) -> Path:
+        return self.path / f"{key}.pkl"
+
+    def get(self, key: str):
+        """Return the stored RegressionResult, or None on a miss."""
+        file = self._file(key)
+        try:
+            with open(file, "rb") as f:
+                entry = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+            # missing, or written by an incompatible version
+            self.misses += 1
+            return None
+        os.utime(file)
+        self.hits += 1
+        return entry
+
+    def put(self, key: str, regression_result) -> None:
+        """Store a RegressionResult whose results were compacted."""
+        fd, tmp = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(regression_result, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, self._file(key))
+
+    def evict(self) -> int:
+        """Delete the least recently used entries down to max_bytes."""
+        entries = sorted(
+            (file.stat().st_mtime, file.stat().st_size, file)
+            for file in self.path.glob("*.pkl")
+        )
+        size = sum(nbytes for _, nbytes, _ in entries)
+        removed = 0
+        for _, nbytes, file in entries:
+            if size <= self.max_bytes:
+                break
+            file.unlink(missing_ok=True)
+            size -= nbytes
+            removed += 1
+        return removed
+
+    def clear(self) -> None:
+        """Delete every entry and reset the counters."""
+        for file in self.path.glob("*.pkl"):
+            file.unlink(missing_ok=True)
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self) -> dict[str, int]:
+        """Return the hit/miss counts, the number of entries and their size."""
+        files = list(self.path.glob("*.pkl"))
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(files),
+            "nbytes": sum(file.stat().st_size for file in files),
+        }
+
+    def __len__(self) -> int:
+        return len(list(self.path.glob("*.pkl")))
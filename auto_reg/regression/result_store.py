@@ -0,0 +1,273 @@
+"""
+Columnar storage of the results of many specs.
+
+A linearmodels result keeps its model, and through it the panel, alive, so
+holding the results of hundreds of specs costs specs times rows. The store
+keeps what the tables and analyses read - coefficients, covariance, number
+of observations, R-squared variants and effect metadata - in a few flat
+arrays whose size does not depend on the number of rows:
+
+- rows: one per fitted result (a spec has one or more), with the scalar
+  statistics as columns
+- params and term_codes: the coefficients of every row, back to back; row r
+  owns offsets[r]:offsets[r + 1], named by terms[term_codes]
+- cov: the k by k covariance of every row, flattened, row r starting at
+  cov_offsets[r]
+- effects: one row per (result, absorbed effect) with its number of levels
+
+Results are rebuilt from the arrays on access (CompactResults), and the full
+objects can be refitted on demand with materialize().
+"""
+
+import numpy as np
+import pandas as pd
+
+from .absorb import AbsorbingResults
+from .demean_cache import DemeanCache
+from .panel_data import (
+    RegressionResult,
+    config_columns,
+    effect_columns,
+    outcome_groups,
+    run_regression_group,
+    run_regressions,
+)
+from .panel_frame import PanelFrame
+from .prepass import DesignPrepass
+from .regression_config import RegressionConfig
+from .result_cache import CompactResults, ResultCache, compact_result
+from .validity import ValidityIndex
+
+
+class ResultStore:
+    """
+    The results of run_regressions() packed into flat arrays.
+
+    Args:
+        regression_configs (dict[str, RegressionConfig]): the specs, by
+            description, in the order of regression_results.
+        regression_results (list[RegressionResult]): their results. Full
+            PanelOLS results are compacted, which needs df.
+        df (pd.DataFrame | None): the panel they were fitted on.
+        prepass (DesignPrepass | None): the pre-pass they were fitted with,
+            reused by materialize().
+    """
+
+    def __init__(
+        self,
+        regression_configs: dict[str, RegressionConfig],
+        regression_results: list[RegressionResult],
+        df: pd.DataFrame | None = None,
+        prepass: DesignPrepass | None = None,
+    ):
+        self.regression_configs = dict(regression_configs)
+        self.prepass = prepass
+        self.descriptions: dict[str, str] = {}  # as modified by run_regression
+        self.regression_types: dict[str, str] = {}
+        self.equality_tests = {}
+        self.mediation_tests = {}
+        self.designs = {}
+        self.spec_rows: dict[str, range] = {}  # rows of each spec
+
+        terms: dict[str, int] = {}
+        term_codes, params, covs, rows, effects = [], [], [], [], []
+        for key, regression_result in zip(regression_configs, regression_results):
+            self.descriptions[key] = regression_result.description
+            self.regression_types[key] = regression_result.regression_type
+            self.equality_tests[key] = regression_result.equality_test
+            self.mediation_tests[key] = regression_result.mediation_test
+            self.designs[key] = regression_result.design
+            first = len(rows)
+            for position, result in enumerate(regression_result.results):
+                if df is None and not isinstance(result, AbsorbingResults):
+                    raise ValueError("Full PanelOLS results need df to be compacted")
+                result = compact_result(result, df, regression_result.regression_config)
+                names = list(result.params.index)
+                for name in names:
+                    terms.setdefault(name, len(terms))
+                term_codes.append(np.array([terms[name] for name in names]))
+                params.append(result.params.to_numpy(dtype=np.float64))
+                covs.append(result.cov.loc[names, names].to_numpy().ravel())
+                for effect, levels in result.effects.items():
+                    effects.append((len(rows), effect, levels))
+                rows.append(
+                    {
+                        "spec": key,
+                        "position": position,
+                        "dependent": result.dependent,
+                        "estimator": result.title,
+                        "nobs": result.nobs,
+                        "df_model": result.df_model,
+                        "df_resid": result.df_resid,
+                        "resid_ss": result.resid_ss,
+                        "total_ss": result.total_ss,
+                        "rsquared": result.rsquared,
+                        "rsquared_within": getattr(result, "rsquared_within", np.nan),
+                        "rsquared_between": getattr(result, "rsquared_between", np.nan),
+                        "rsquared_overall": getattr(result, "rsquared_overall", np.nan),
+                        "cov_type": result.cov_type,
+                        "cov_estimator": getattr(result, "cov_estimator", ""),
+                        "nclusters": result.nclusters,
+                    }
+                )
+            self.spec_rows[key] = range(first, len(rows))
+
+        self.terms = pd.Index(list(terms))
+        self.rows = pd.DataFrame(rows)
+        for col in ["spec", "dependent", "estimator", "cov_type", "cov_estimator"]:
+            if col in self.rows:
+                self.rows[col] = self.rows[col].astype("category")
+        self.effects = pd.DataFrame(effects, columns=["row", "effect", "levels"])
+        self.effects["effect"] = self.effects["effect"].astype("category")
+        sizes = np.array([len(codes) for codes in term_codes], dtype=np.int64)
+        self.offsets = np.concatenate([[0], np.cumsum(sizes)])
+        self.cov_offsets = np.concatenate([[0], np.cumsum(sizes**2)])
+        self.term_codes = _concat(term_codes, np.int32)
+        self.params = _concat(params, np.float64)
+        self.cov = _concat(covs, np.float64)
+
+    def __len__(self) -> int:
+        return len(self.regression_configs)
+
+    @property
+    def nbytes(self) -> int:
+        """Memory used by the arrays and the row tables."""
+        arrays = [
+            self.offsets,
+            self.cov_offsets,
+            self.term_codes,
+            self.params,
+            self.cov,
+        ]
+        return int(
+            sum(array.nbytes for array in arrays)
+            + self.rows.memory_usage(deep=True).sum()
+            + self.effects.memory_usage(deep=True).sum()
+        )
+
+    def _wide(self, values: np.ndarray) -> pd.DataFrame:
+        """One row per result and one column per term, NaN where absent."""
+        wide = np.full((len(self.rows), len(self.terms)), np.nan)
+        row = np.repeat(np.arange(len(self.rows)), np.diff(self.offsets))
+        wide[row, self.term_codes] = values
+        index = pd.MultiIndex.from_frame(self.rows[["spec", "position"]])
+        return pd.DataFrame(wide, index=index, columns=self.terms)
+
+    def _variances(self) -> np.ndarray:
+        """Diagonal of every covariance, aligned with params."""
+        sizes = np.diff(self.offsets)
+        k = np.repeat(sizes, sizes)
+        j = np.arange(len(self.params)) - np.repeat(self.offsets[:-1], sizes)
+        return self.cov[np.repeat(self.cov_offsets[:-1], sizes) + j * (k + 1)]
+
+    def params_table(self) -> pd.DataFrame:
+        """Coefficients of every result, by (spec, position) and term."""
+        return self._wide(self.params)
+
+    def std_errors_table(self) -> pd.DataFrame:
+        """Standard errors of every result, by (spec, position) and term."""
+        return self._wide(np.sqrt(self._variances()))
+
+    def result(self, row: int) -> CompactResults:
+        """Rebuild the result of a row of the store."""
+        start, stop = self.offsets[row], self.offsets[row + 1]
+        names = self.terms[self.term_codes[start:stop]]
+        k = len(names)
+        cov = self.cov[self.cov_offsets[row] : self.cov_offsets[row] + k * k]
+        info = self.rows.iloc[row]
+        effects = self.effects[self.effects["row"] == row]
+        return CompactResults(
+            dependent=info["dependent"],
+            estimator=info["estimator"],
+            params=pd.Series(self.params[start:stop], index=names, name="parameter"),
+            cov=pd.DataFrame(cov.reshape(k, k), index=names, columns=names),
+            nobs=int(info["nobs"]),
+            df_model=int(info["df_model"]),
+            df_resid=int(info["df_resid"]),
+            resid_ss=float(info["resid_ss"]),
+            total_ss=float(info["total_ss"]),
+            effects=dict(zip(effects["effect"].astype(str), effects["levels"])),
+            cov_type=info["cov_type"],
+            nclusters=int(info["nclusters"]),
+            cov_estimator=info["cov_estimator"],
+            rsquared_within=float(info["rsquared_within"]),
+            rsquared_between=float(info["rsquared_between"]),
+            rsquared_overall=float(info["rsquared_overall"]),
+        )
+
+    def regression_result(self, key: str) -> RegressionResult:
+        """The RegressionResult of a spec, with results rebuilt from the store."""
+        return RegressionResult(
+            description=self.descriptions[key],
+            results=[self.result(row) for row in self.spec_rows[key]],
+            regression_type=self.regression_types[key],
+            regression_config=self.regression_configs[key],
+            equality_test=self.equality_tests[key],
+            mediation_test=self.mediation_tests[key],
+            design=self.designs[key],
+        )
+
+    def to_regression_results(self) -> list[RegressionResult]:
+        """Every spec as a RegressionResult, in order, e.g. for the tables."""
+        return [self.regression_result(key) for key in self.regression_configs]
+
+    def materialize(
+        self, key: str, df: pd.DataFrame, cache: DemeanCache | None = None
+    ) -> RegressionResult:
+        """
+        Refit a spec on df and return its full results.
+
+        The spec is refitted as run_regressions() fitted it: with the other
+        specs of its group from outcome_groups(), on the samples of
+        group_panels() and through the store's prepass, so the full results
+        match the stored ones.
+        """
+        (group,) = [
+            group for group in outcome_groups(self.regression_configs) if key in group
+        ]
+        items = {
+            description: self.regression_configs[description] for description in group
+        }
+        panel = PanelFrame(df, effect_columns(items))
+        validity = ValidityIndex(df, config_columns(df, items), panel)
+        regression_results = run_regression_group(
+            df,
+            list(items.items()),
+            cache=cache,
+            panel=panel,
+            validity=validity,
+            prepass=self.prepass,
+        )
+        return regression_results[group.index(key)]
+
+
+def _concat(arrays: list[np.ndarray], dtype) -> np.ndarray:
+    if not arrays:
+        return np.zeros(0, dtype=dtype)
+    return np.concatenate(arrays).astype(dtype, copy=False)
+
+
+def store_regressions(
+    df: pd.DataFrame,
+    regression_configs: dict[str, RegressionConfig],
+    cache: DemeanCache | None = None,
+    workers: int = 1,
+    result_cache: ResultCache | None = None,
+    prepass: DesignPrepass | None = None,
+) -> ResultStore:
+    """
+    run_regressions() into a ResultStore.
+
+    Every group of specs is compacted as soon as it is fitted, so only one
+    group's full results are alive at a time.
+    """
+    regression_results = run_regressions(
+        df,
+        regression_configs,
+        cache=cache,
+        workers=workers,
+        result_cache=result_cache,
+        compact=True,
+        prepass=prepass,
+    )
+    return ResultStore(regression_configs, regression_results, df, prepass)
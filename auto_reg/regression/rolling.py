@@ -0,0 +1,410 @@
+"""
+Rolling and expanding window regressions over the periods of a panel.
+
+A window is a run of consecutive periods (levels of the time index). The
+fits are the "absorb" estimator's on the rows of each window, but no window
+is sliced from the data. As in incremental.py, the fits only need, for each
+level i of the absorbed effect, the count n_i, the sums s_i and the products
+S_i of z = [y, x] over the window's rows:
+
+- every period is one block of (level, count, sums, products) terms, formed
+  once from its rows; moving a window adds the block of the period that
+  enters and subtracts the block of the period that leaves
+- the within products of a level are S_i - s_i m_i' - m_i s_i' + n_i m_i m_i'
+  with m_i its mean in the window; their total gives the coefficients and
+  their sums within each cluster give the clustered scores
+- period effects enter as the dummies of the window's periods, whose within
+  products only need the counts and sums of each (level, period) cell
+
+So a window costs the levels times p^2 (p the regressors plus the window's
+period dummies), and the rows are read twice in all, whatever the number of
+windows.
+
+The absorbed levels are the entities with entity effects, else the clusters
+(or all rows), demeaned by the window's grand mean. Effects: "entity" and
+"time". Covariances: "unadjusted" and one-way "clustered", where entity
+effects must be nested in the clusters (entity or industry clusters).
+"""
+
+import numpy as np
+import pandas as pd
+from pydantic import BaseModel, ConfigDict
+from scipy import stats
+from scipy.linalg import cho_factor, cho_solve
+
+from .absorb import compress_codes
+from .covariance import ClusterSegments, is_nested, parse_cov_type
+from .panel_frame import INDEX_EFFECTS, PanelFrame
+from .regression_config import RegressionConfig
+
+
+class RollingResult(BaseModel):
+    """Coefficient and standard error paths of a rolling regression."""
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+    dependent: str
+    window: int | None  # periods per window, None for expanding windows
+    starts: pd.Index  # first period of each window
+    params: pd.DataFrame  # one row per window, indexed by its last period
+    std_errors: pd.DataFrame
+    nobs: np.ndarray
+    df_resid: np.ndarray
+    nclusters: np.ndarray  # clusters in each window, 0 when unadjusted
+    cov_type: str
+
+    @property
+    def tstats(self) -> pd.DataFrame:
+        return self.params / self.std_errors
+
+    @property
+    def pvalues(self) -> pd.DataFrame:
+        df_resid = np.maximum(self.df_resid, 1)[:, None]
+        pvalues = 2 * stats.t.sf(np.abs(self.tstats.to_numpy()), df_resid)
+        return pd.DataFrame(
+            pvalues, index=self.params.index, columns=self.params.columns
+        )
+
+    def __str__(self) -> str:
+        name = self.params.columns[0]
+        table = pd.DataFrame(
+            {
+                "Start": self.starts,
+                "Parameter": self.params[name].to_numpy(),
+                "Std. Err.": self.std_errors[name].to_numpy(),
+                "P-value": self.pvalues[name].to_numpy(),
+                "No. Obs.": self.nobs,
+            },
+            index=self.params.index,
+        )
+        window = "expanding" if self.window is None else f"{self.window} periods"
+        lines = [
+            "Rolling AbsorbingOLS",
+            "=" * 80,
+            f"{'Dep. Variable:':<22}{self.dependent}",
+            f"{'Variable:':<22}{name}",
+            f"{'Window:':<22}{window}",
+            f"{'Cov. Estimator:':<22}{self.cov_type}",
+            "",
+            table.to_string(float_format=lambda v: f"{v:.4f}"),
+        ]
+        return "\n".join(lines)
+
+    def __repr__(self) -> str:
+        return str(self)
+
+
+def period_blocks(
+    z: np.ndarray, level: np.ndarray, time: np.ndarray, nperiods: int
+) -> list[tuple | None]:
+    """
+    The count, sums and products of z of each level, period by period.
+
+    Returns:
+        list: per period, None without rows, else (levels, counts, sums,
+        products) of the levels with rows in the period.
+    """
+    order = np.lexsort((level, time))
+    bounds = np.searchsorted(time[order], np.arange(nperiods + 1))
+    blocks = []
+    for t in range(nperiods):
+        rows = order[bounds[t] : bounds[t + 1]]
+        if not len(rows):
+            blocks.append(None)
+            continue
+        starts = np.flatnonzero(np.diff(level[rows], prepend=-1))
+        block = z[rows]
+        blocks.append(
+            (
+                level[rows][starts],
+                np.diff(np.append(starts, len(rows))),
+                np.add.reduceat(block, starts),
+                np.add.reduceat(block[:, :, None] * block[:, None, :], starts),
+            )
+        )
+    return blocks
+
+
+def level_within(
+    counts: np.ndarray,
+    sums: np.ndarray,
+    products: np.ndarray,
+    means: np.ndarray,
+    cell_counts: np.ndarray | None = None,
+    cell_sums: np.ndarray | None = None,
+    dummy_means: np.ndarray | None = None,
+) -> np.ndarray:
+    """
+    Within products of each absorbed level, over [z, period dummies].
+
+    Args:
+        counts, sums, products: n_i, s_i and S_i of each level.
+        means (np.ndarray): the mean m_i subtracted from z in each level.
+        cell_counts, cell_sums: counts and sums of z in each (level, period)
+            cell of the dummy periods, None without period effects.
+        dummy_means (np.ndarray): the mean subtracted from each dummy.
+
+    Returns:
+        np.ndarray: levels by p by p.
+    """
+    n = counts[:, None, None]
+    outer = sums[:, :, None] * means[:, None, :]
+    within = products - outer - outer.transpose(0, 2, 1)
+    within += n * means[:, :, None] * means[:, None, :]
+    if cell_counts is None or not cell_counts.shape[1]:
+        return within
+
+    mu = dummy_means
+    dz = cell_sums - cell_counts[:, :, None] * means[:, None, :]
+    dz += mu[:, :, None] * (n * means[:, None, :] - sums[:, None, :])
+    cross = mu[:, :, None] * cell_counts[:, None, :]
+    dd = n * mu[:, :, None] * mu[:, None, :] - cross - cross.transpose(0, 2, 1)
+    ndummies = cell_counts.shape[1]
+    dd[:, np.arange(ndummies), np.arange(ndummies)] += cell_counts
+    return np.concatenate(
+        [
+            np.concatenate([within, dz.transpose(0, 2, 1)], axis=2),
+            np.concatenate([dz, dd], axis=2),
+        ],
+        axis=1,
+    )
+
+
+def rolling_regression(
+    df: pd.DataFrame,
+    reg_config: RegressionConfig,
+    window: int | None = 5,
+    min_periods: int | None = None,
+    panel: PanelFrame | None = None,
+) -> RollingResult:
+    """
+    Fit the full model of a basic spec on rolling or expanding windows.
+
+    Args:
+        df (pd.DataFrame): panel indexed by (entity, time).
+        reg_config (RegressionConfig): the spec; its first dependent variable
+            is regressed on the independent and control variables.
+        window (int | None): periods per window, or None for expanding
+            windows from the first period.
+        min_periods (int | None): first window length fitted, by default
+            window (rolling) or 1 (expanding).
+        panel (PanelFrame | None): codes of df, with the cluster column.
+
+    Returns:
+        RollingResult: one row per window; windows that cannot be fitted
+        (too few rows, collinear regressors) are NaN.
+
+    Raises:
+        ValueError: for 2SLS, group, moderating or mediating specs, effects
+        other than entity and time, robust or two-way clustered covariances,
+        and entity effects not nested in the clusters.
+    """
+    if (
+        reg_config.instrument_var
+        or reg_config.instrument_vars
+        or reg_config.group_var
+        or reg_config.moderating_var
+        or reg_config.mediating_var
+    ):
+        raise ValueError("Only basic panel specs can be fitted on rolling windows")
+    effects = list(reg_config.effects)
+    if any(effect not in INDEX_EFFECTS for effect in effects):
+        raise ValueError(f"Rolling windows absorb entity and time effects: {effects}")
+    kind, dims = parse_cov_type(reg_config.cov_type)
+    if kind == "robust" or len(dims) > 1:
+        raise ValueError(f"{reg_config.cov_type!r} cannot be fitted on rolling windows")
+    cluster = dims[0] if dims else None
+    if panel is None:
+        panel = PanelFrame(df, [cluster] if cluster else [])
+    if window is not None and window < 1:
+        raise ValueError(f"window must be positive, got {window}")
+    if min_periods is None:
+        min_periods = window or 1
+
+    dependent_var = reg_config.dependent_vars[0]
+    exog_vars = reg_config.independent_vars + reg_config.control_vars
+    values = df[[dependent_var] + exog_vars].to_numpy(dtype=np.float64)
+    valid = ~np.isnan(values).any(axis=1)
+    if cluster:
+        valid &= panel.codes[cluster] >= 0
+    if panel.sample is not None:
+        valid &= panel.sample
+    rows = np.flatnonzero(valid)
+    # shifted by the sample means for accuracy
+    z = values[rows] - values[rows].mean(0)
+    time = panel.codes["time"][rows]
+    nperiods = len(panel.levels["time"])
+
+    absorb_entity = "entity" in effects
+    period_dummies = "time" in effects
+    demean = bool(effects) or reg_config.constant
+    extra_df = None
+    if cluster:
+        clusters = panel.codes[cluster][rows]
+        if absorb_entity and not is_nested(panel.codes["entity"][rows], clusters):
+            raise ValueError(
+                f"entity effects are not nested in the clusters {cluster!r}, the "
+                f"clustered covariance cannot be accumulated over windows"
+            )
+        if len(effects) == 1 and is_nested(panel.codes[effects[0]][rows], clusters):
+            extra_df = 0
+    if absorb_entity:
+        level = panel.codes["entity"][rows]
+    elif cluster:
+        level = clusters
+    else:
+        level = np.zeros(len(rows), dtype=np.int64)
+    level, _ = compress_codes(level)
+    nlevels = int(level.max()) + 1 if len(level) else 0
+    if cluster:
+        cluster_of = np.zeros(nlevels, dtype=np.int64)
+        cluster_of[level] = compress_codes(clusters)[0]
+        segments = ClusterSegments(cluster_of)
+
+    width = z.shape[1]
+    if period_dummies:
+        cells = level * nperiods + time
+        size = nlevels * nperiods
+        cell_counts = np.bincount(cells, minlength=size).reshape(nlevels, nperiods)
+        cell_sums = np.column_stack(
+            [np.bincount(cells, weights=z[:, j], minlength=size) for j in range(width)]
+        ).reshape(nlevels, nperiods, width)
+
+    blocks = period_blocks(z, level, time, nperiods)
+    counts = np.zeros(nlevels, dtype=np.int64)
+    sums = np.zeros((nlevels, width))
+    products = np.zeros((nlevels, width, width))
+
+    def move(block, sign):
+        if block is not None:
+            levels, block_counts, block_sums, block_products = block
+            counts[levels] += sign * block_counts
+            sums[levels] += sign * block_sums
+            products[levels] += sign * block_products
+
+    k = len(exog_vars)
+    nvar = k + reg_config.constant
+    ends, starts, params, std_errors = [], [], [], []
+    nobs, df_resid, nclusters = [], [], []
+    first = 0
+    for end in range(nperiods):
+        move(blocks[end], 1)
+        if window is not None and end - first + 1 > window:
+            move(blocks[first], -1)
+            first += 1
+            # levels that left the window are reset, not left at rounding error
+            empty = counts == 0
+            sums[empty] = 0.0
+            products[empty] = 0.0
+        if end - first + 1 < min_periods:
+            continue
+
+        n = int(counts.sum())
+        present = counts > 0
+        scale = np.maximum(counts, 1)
+        if absorb_entity:
+            means = sums / scale[:, None]
+        elif demean:
+            means = np.broadcast_to(sums.sum(0) / max(n, 1), sums.shape)
+        else:
+            means = np.zeros_like(sums)
+        periods = [t for t in range(first, end + 1) if blocks[t] is not None]
+        levels = {"entity": int(present.sum()), "time": len(periods)}
+        if period_dummies:
+            dummies = periods[1:]
+            dummy_counts = cell_counts[:, dummies]
+            if absorb_entity:
+                dummy_means = dummy_counts / scale[:, None]
+            else:
+                dummy_means = np.broadcast_to(
+                    dummy_counts.sum(0) / max(n, 1), dummy_counts.shape
+                )
+            within = level_within(
+                counts,
+                sums,
+                products,
+                means,
+                dummy_counts,
+                cell_sums[:, dummies],
+                dummy_means,
+            )
+        else:
+            within = level_within(counts, sums, products, means)
+
+        neffects = 0
+        if effects:
+            neffects = sum(levels[e] for e in effects) - len(effects)
+            neffects += not reg_config.constant
+        fit = _window_fit(
+            within,
+            k,
+            n,
+            nvar,
+            neffects,
+            segments if cluster else None,
+            neffects if extra_df is None else extra_df,
+        )
+        ends.append(end)
+        starts.append(first)
+        params.append(fit[0])
+        std_errors.append(fit[1])
+        nobs.append(n)
+        df_resid.append(n - nvar - neffects)
+        nclusters.append(len(np.unique(cluster_of[present])) if cluster else 0)
+
+    labels = panel.levels["time"]
+    index = pd.Index(labels[ends], name=labels.name)
+    return RollingResult(
+        dependent=dependent_var,
+        window=window,
+        starts=pd.Index(labels[starts], name=labels.name),
+        params=pd.DataFrame(
+            np.reshape(params, (-1, k)), index=index, columns=exog_vars
+        ),
+        std_errors=pd.DataFrame(
+            np.reshape(std_errors, (-1, k)), index=index, columns=exog_vars
+        ),
+        nobs=np.array(nobs, dtype=np.int64),
+        df_resid=np.array(df_resid, dtype=np.int64),
+        nclusters=np.array(nclusters, dtype=np.int64),
+        cov_type=reg_config.cov_type,
+    )
+
+
+def _window_fit(
+    within: np.ndarray,
+    k: int,
+    nobs: int,
+    nvar: int,
+    neffects: int,
+    segments: ClusterSegments | None,
+    extra_df: int,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Coefficients and standard errors of x from the within products of the
+    levels, as IncrementalFit.result(). NaN when the window cannot be fitted.
+    """
+    missing = np.full(k, np.nan)
+    if nobs - nvar - neffects <= 0:
+        return missing, missing
+    x, d = slice(1, 1 + k), slice(1 + k, None)
+    w = within.sum(0)
+    # y and x net of the dummies
+    gamma = np.linalg.pinv(w[d, d]) @ w[d, : 1 + k]
+    resid = w[: 1 + k, : 1 + k] - w[: 1 + k, d] @ gamma
+    try:
+        factor = cho_factor(resid[x, x])
+    except np.linalg.LinAlgError:
+        return missing, missing
+    xpx_inv = cho_solve(factor, np.eye(k))
+    params = cho_solve(factor, resid[x, 0])
+    if segments is None:
+        resid_ss = float(resid[0, 0] - resid[x, 0] @ params)
+        cov = resid_ss / (nobs - neffects - nvar) * xpx_inv
+    else:
+        # residual e = z . coef within each absorbed level
+        coef = np.concatenate([[1.0], -params, -(gamma[:, 0] - gamma[:, 1:] @ params)])
+        scores = segments.sums(within @ coef)
+        scores = scores[:, x] - scores[:, d] @ gamma[:, 1:]
+        scale = nobs / (nobs - extra_df - nvar)
+        cov = scale * xpx_inv @ (scores.T @ scores) @ xpx_inv
+    return params, np.sqrt(np.diag(cov))
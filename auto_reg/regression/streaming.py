@@ -0,0 +1,405 @@
+"""
+Out-of-core regressions from chunked CSV or Parquet files.
+
+The panel is never loaded: every pass reads the used columns chunk by chunk
+and keeps only per-level and per-cluster accumulators.
+
+1. The first pass counts the levels of every effect and sums the columns by
+   the levels of the first effect. Further passes sweep the other effects
+   (alternating projections, as in absorb.py); a single effect needs none.
+   Only the accumulated group means of each effect are kept, a row is
+   demeaned as x - sum of its groups' means.
+2. The last pass accumulates the demeaned cross products X'X and X'y, and
+   the same cross products within each cluster. The clustered scores are
+   then X_g'y_g - X_g'X_g b, without another pass for the residuals.
+
+Peak memory is the chunk plus the levels of the effects and the clusters
+(times k^2 for the per-cluster cross products). The results match the
+in-memory "absorb" backend. Covariances: "unadjusted" and one-way
+"clustered"; robust and two-way clustered need per-row or per-intersection
+terms and are not available out of core.
+"""
+
+from collections.abc import Iterator
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from scipy.linalg import cho_factor, cho_solve
+
+from .absorb import AbsorbingResults, count_absorbed_levels
+from .covariance import parse_cov_type
+from .panel_data import RegressionResult, run_regression
+from .regression_config import RegressionConfig
+
+PARQUET_SUFFIXES = (".parquet", ".pq")
+
+
+def iter_chunks(
+    path: str | Path, columns: list[str], chunksize: int
+) -> Iterator[pd.DataFrame]:
+    """Read the columns of a CSV or Parquet file, chunksize rows at a time."""
+    if Path(path).suffix in PARQUET_SUFFIXES:
+        import pyarrow.parquet as pq
+
+        parquet_file = pq.ParquetFile(path)
+        for batch in parquet_file.iter_batches(batch_size=chunksize, columns=columns):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, usecols=columns, chunksize=chunksize)
+
+
+class LevelCodes:
+    """Integer codes of labels, consistent across chunks and passes."""
+
+    def __init__(self):
+        self.levels = pd.Index([])
+
+    def __len__(self) -> int:
+        return len(self.levels)
+
+    def codes(self, labels: pd.Series) -> np.ndarray:
+        codes = self.levels.get_indexer(labels)
+        unseen = codes < 0
+        if unseen.any():
+            self.levels = self.levels.append(pd.Index(pd.unique(labels[unseen])))
+            codes[unseen] = self.levels.get_indexer(labels[unseen])
+        return codes
+
+
+def _add(total: np.ndarray, codes: np.ndarray, values: np.ndarray, size: int):
+    """Add the per-code sums of the n by m values to total, growing it to size."""
+    sums = np.column_stack(
+        [
+            np.bincount(codes, weights=values[:, j], minlength=size)
+            for j in range(values.shape[1])
+        ]
+    )
+    if total.shape[0] < size:
+        total = np.vstack([total, np.zeros((size - total.shape[0], total.shape[1]))])
+    return total + sums
+
+
+def _labels(chunk: pd.DataFrame, name: str, index: list[str]) -> pd.Series:
+    if name == "entity":
+        return chunk[index[0]]
+    if name == "time":
+        return chunk[index[1]]
+    return chunk[name]
+
+
+def streaming_regression(
+    path: str | Path,
+    dependent_var: str,
+    exog_vars: list[str],
+    effects: list[str],
+    index: list[str],
+    constant: bool = True,
+    cov_type: str = "clustered",
+    chunksize: int = 1_000_000,
+    short_vars: list[str] | None = None,
+    tol: float = 1e-10,
+    max_iter: int = 1000,
+) -> list[AbsorbingResults]:
+    """
+    Fit dependent_var on exog_vars from a file, absorbing the effects.
+
+    Args:
+        path (str | Path): CSV or Parquet (.parquet, .pq) file.
+        dependent_var (str): dependent variable.
+        exog_vars (list[str]): regressors.
+        effects (list[str]): "entity", "time" or columns, as in RegressionConfig.
+        index (list[str]): the entity and time columns of the file.
+        constant (bool): include a constant.
+        cov_type (str): "unadjusted" or one-way "clustered[:<cluster>]".
+        chunksize (int): rows per chunk.
+        short_vars (list[str] | None): also fit the model without controls on
+            these regressors, from the same cross products when the controls
+            drop no rows.
+        tol, max_iter: convergence of the alternating projections.
+
+    Returns:
+        list[AbsorbingResults]: the fit, preceded by the fit on short_vars
+        when given (as panel_regression orders them).
+    """
+    kind, dims = parse_cov_type(cov_type)
+    if kind == "robust" or len(dims) > 1:
+        raise ValueError(f"{cov_type!r} is not available out of core")
+    cluster = dims[0] if dims else None
+
+    variables = [dependent_var] + list(exog_vars)
+    keys = list(dict.fromkeys(effects + ([cluster] if cluster else [])))
+    columns = list(
+        dict.fromkeys(
+            index + variables + [key for key in keys if key not in ["entity", "time"]]
+        )
+    )
+    codes = {key: LevelCodes() for key in keys}
+    short_only = 0
+    if short_vars is not None:
+        short_index = [0] + [variables.index(name) for name in short_vars]
+
+    def chunks() -> Iterator[tuple[np.ndarray, dict[str, np.ndarray]]]:
+        """Valid rows of each chunk: values and codes of every effect/cluster."""
+        nonlocal short_only
+        for chunk in iter_chunks(path, columns, chunksize):
+            values = chunk[variables].to_numpy(dtype=np.float64)
+            missing = np.isnan(values)
+            labels = {key: _labels(chunk, key, index) for key in keys}
+            valid = ~missing.any(axis=1)
+            for key in keys:
+                valid &= labels[key].notna().to_numpy()
+            if short_vars is not None and scanning:
+                # rows the model without controls would keep
+                short_only += int((~valid & ~missing[:, short_index].any(axis=1)).sum())
+            yield values[valid], {
+                key: codes[key].codes(labels[key][valid]) for key in keys
+            }
+
+    # First pass: levels, counts, and the sums by the first effect
+    scanning = True
+    nvar = len(variables)
+    counts = {key: np.zeros((0, 1)) for key in effects}
+    alpha = [np.zeros((0, nvar)) for _ in effects]
+    nobs, totals, squares = 0, np.zeros(nvar), np.zeros(nvar)
+    nested = len(effects) == 1 and cluster is not None
+    first_cluster = np.zeros(0, dtype=np.int64)
+    for values, chunk_codes in chunks():
+        nobs += len(values)
+        totals += values.sum(0)
+        squares += (values**2).sum(0)
+        for key in effects:
+            counts[key] = _add(
+                counts[key],
+                chunk_codes[key],
+                np.ones((len(values), 1)),
+                len(codes[key]),
+            )
+        if effects:
+            alpha[0] = _add(
+                alpha[0], chunk_codes[effects[0]], values, len(codes[effects[0]])
+            )
+        if nested:
+            # does every level of the effect fall in a single cluster?
+            level, clusters = chunk_codes[effects[0]], chunk_codes[cluster]
+            size = len(codes[effects[0]])
+            first_cluster = np.concatenate(
+                [first_cluster, np.full(size - len(first_cluster), -1)]
+            )
+            new = first_cluster[level] < 0
+            first_cluster[level[new]] = clusters[new]
+            nested = bool((first_cluster[level] == clusters).all())
+    scanning = False
+    counts = {key: count[:, 0] for key, count in counts.items()}
+    if nobs == 0:
+        raise ValueError("No complete rows in the data")
+    if effects:
+        alpha[0] = alpha[0] / counts[effects[0]][:, None]
+        alpha[1:] = [np.zeros((len(codes[key]), nvar)) for key in effects[1:]]
+
+    # Further passes: sweep the effects until the group means vanish
+    scale = np.maximum(np.sqrt(squares / nobs), np.finfo(np.float64).tiny)
+    iterations = 0
+    if effects:
+        largest = np.abs(alpha[0]).max(0)
+        start = 1
+        for iterations in range(1, max_iter + 1):
+            for e in range(start, len(effects)):
+                sums = np.zeros((len(codes[effects[e]]), nvar))
+                for values, chunk_codes in chunks():
+                    resid = _demean(values, chunk_codes, effects, alpha)
+                    sums = _add(sums, chunk_codes[effects[e]], resid, len(sums))
+                means = sums / counts[effects[e]][:, None]
+                alpha[e] += means
+                largest = np.maximum(largest, np.abs(means).max(0))
+            if len(effects) == 1 or (largest < tol * scale).all():
+                break
+            start, largest = 0, np.zeros(nvar)
+
+    # Last pass: cross products, overall and within each cluster
+    grand_mean = totals / nobs
+    ncol = nvar - 1 + constant
+    xpx, xpy, yty = np.zeros((ncol, ncol)), np.zeros(ncol), 0.0
+    y_sum, y_squares = 0.0, 0.0
+    pairs = [(i, j) for i in range(ncol + 1) for j in range(i, ncol + 1)]
+    cluster_products = np.zeros((0, len(pairs)))
+    for values, chunk_codes in chunks():
+        resid = _demean(values, chunk_codes, effects, alpha)
+        y_sum += resid[:, 0].sum()
+        y_squares += (resid[:, 0] ** 2).sum()
+        design = resid + grand_mean if effects else resid
+        if constant:
+            design = np.column_stack([design, np.ones(len(design))])
+        x, y = design[:, 1:], design[:, 0]
+        xpx += x.T @ x
+        xpy += x.T @ y
+        yty += y @ y
+        if cluster is not None:
+            # upper triangle of [y, x]'[y, x] within each cluster
+            products = np.column_stack([design[:, i] * design[:, j] for i, j in pairs])
+            cluster_products = _add(
+                cluster_products,
+                chunk_codes[cluster],
+                products,
+                len(codes[cluster]),
+            )
+
+    names = list(exog_vars) + (["constant"] if constant else [])
+    groups = [(None, counts[key]) for key in effects]
+    neffects = count_absorbed_levels(groups, constant)
+    fit = dict(
+        nobs=nobs,
+        xpx=xpx,
+        xpy=xpy,
+        yty=yty,
+        total_ss=y_squares - (y_sum**2 / nobs if constant else 0.0),
+        cluster_products=cluster_products,
+        pairs=pairs,
+        cov_type=cov_type,
+        neffects=neffects,
+        extra_df=0 if nested else neffects,
+        effects={key: len(counts[key]) for key in effects},
+        iterations=iterations,
+        dependent=dependent_var,
+    )
+    results = [_solve(fit, list(range(ncol)), names)]
+    if short_vars is not None:
+        if short_only:
+            # the controls drop rows, the short model has its own sample
+            results = (
+                streaming_regression(
+                    path,
+                    dependent_var,
+                    short_vars,
+                    effects,
+                    index,
+                    constant=constant,
+                    cov_type=cov_type,
+                    chunksize=chunksize,
+                    tol=tol,
+                    max_iter=max_iter,
+                )
+                + results
+            )
+        else:
+            columns = [names.index(name) for name in short_vars]
+            if constant:
+                columns.append(ncol - 1)
+            results = [_solve(fit, columns, [names[j] for j in columns])] + results
+    return results
+
+
+def _demean(
+    values: np.ndarray,
+    chunk_codes: dict[str, np.ndarray],
+    effects: list[str],
+    alpha: list[np.ndarray],
+) -> np.ndarray:
+    resid = values.copy()
+    for key, means in zip(effects, alpha):
+        resid -= means[chunk_codes[key]]
+    return resid
+
+
+def _solve(fit: dict, columns: list[int], names: list[str]) -> AbsorbingResults:
+    """Solve the regression on the given columns of the accumulated design."""
+    nobs = fit["nobs"]
+    nvar = len(columns)
+    xpx = fit["xpx"][np.ix_(columns, columns)]
+    xpy = fit["xpy"][columns]
+    factor = cho_factor(xpx)
+    xpx_inv = cho_solve(factor, np.eye(nvar))
+    params = cho_solve(factor, xpy)
+
+    resid_ss = float(fit["yty"] - 2 * params @ xpy + params @ xpx @ params)
+
+    kind, _ = parse_cov_type(fit["cov_type"])
+    nclusters = 0
+    if kind == "unadjusted":
+        s2 = resid_ss / (nobs - fit["neffects"] - nvar)
+        cov = s2 * xpx_inv
+    else:
+        # per-cluster [y, x]'[y, x], restricted to y and the used columns
+        products = fit["cluster_products"]
+        size = len(fit["xpx"]) + 1
+        full = np.zeros((products.shape[0], size, size))
+        for p, (i, j) in enumerate(fit["pairs"]):
+            full[:, i, j] = products[:, p]
+            full[:, j, i] = products[:, p]
+        used = [j + 1 for j in columns]
+        scores = (
+            full[:, used, 0] - full[np.ix_(np.arange(len(full)), used, used)] @ params
+        )
+        nclusters = len(scores)
+        scale = nobs / (nobs - fit["extra_df"] - nvar)
+        cov = scale * xpx_inv @ (scores.T @ scores) @ xpx_inv
+    cov = (cov + cov.T) / 2
+
+    return AbsorbingResults(
+        dependent=fit["dependent"],
+        params=pd.Series(params, index=names, name="parameter"),
+        cov=pd.DataFrame(cov, index=names, columns=names),
+        nobs=nobs,
+        df_model=nvar + fit["neffects"],
+        df_resid=nobs - nvar - fit["neffects"],
+        resid_ss=resid_ss,
+        total_ss=float(fit["total_ss"]),
+        effects=fit["effects"],
+        cov_type=fit["cov_type"],
+        nclusters=nclusters,
+        iterations=fit["iterations"],
+    )
+
+
+def run_regressions_streaming(
+    path: str | Path,
+    regression_configs: dict[str, RegressionConfig],
+    index: list[str],
+    chunksize: int = 1_000_000,
+) -> list[RegressionResult]:
+    """
+    run_regressions() for a file larger than memory.
+
+    Every spec is fitted with streaming_regression(), so the results match
+    those of the "absorb" estimator. Only basic panel specs can be run out of
+    core; 2SLS, group, moderating and mediating specs raise a ValueError.
+
+    Args:
+        path (str | Path): CSV or Parquet file.
+        regression_configs (dict[str, RegressionConfig]): specs by description.
+        index (list[str]): the entity and time columns of the file.
+        chunksize (int): rows per chunk.
+    """
+    unsupported = [
+        description
+        for description, config in regression_configs.items()
+        if config.instrument_var
+        or config.instrument_vars
+        or config.group_var
+        or config.moderating_var
+        or config.mediating_var
+    ]
+    if unsupported:
+        raise ValueError(f"Only basic panel specs run out of core: {unsupported}")
+
+    regression_results = []
+    for description, config in regression_configs.items():
+        short_vars = None
+        if config.run_another_regression_without_controls:
+            short_vars = config.independent_vars
+        results = streaming_regression(
+            path,
+            config.dependent_vars[0],
+            config.independent_vars + config.control_vars,
+            config.effects,
+            index,
+            constant=config.constant,
+            cov_type=config.cov_type,
+            chunksize=chunksize,
+            short_vars=short_vars,
+        )
+        # the results are given, run_regression does not read the data
+        regression_results.append(
+            run_regression(None, description, config, results=results)
+        )
+    return regression_results
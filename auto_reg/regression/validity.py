@@ -0,0 +1,90 @@
+"""
+Per-column missing-value bitsets and the estimation sample of each spec.
+
+A global df.dropna() copies the frame and drops every row missing any
+column, including columns a spec never reads (e.g. an extra control used by
+one robustness spec). ValidityIndex stores instead one bitset per column,
+np.packbits of its non-missing rows, i.e. one bit per row. The sample of a
+spec is the AND of the bitsets of the columns it uses, computed on the packed
+words and unpacked once; the frame is neither copied nor modified.
+
+Samples are cached by their set of columns and deduplicated by content, so
+specs with identical masks share one array, and with it the DemeanCache
+entries keyed by the sample.
+"""
+
+import numpy as np
+import pandas as pd
+
+from .demean_cache import fingerprint
+from .panel_frame import PanelFrame
+
+
+class ValidityIndex:
+    """
+    One validity bitset per column of a panel.
+
+    Args:
+        df (pd.DataFrame): the panel.
+        columns (list[str] | None): columns to index, all by default.
+        panel (PanelFrame | None): codes of df; encoded columns are valid
+            where their code is not -1.
+    """
+
+    def __init__(
+        self,
+        df: pd.DataFrame,
+        columns: list[str] | None = None,
+        panel: PanelFrame | None = None,
+    ):
+        if columns is None:
+            columns = list(df.columns)
+        self.nrows = len(df)
+        self.bits: dict[str, np.ndarray] = {}
+        for col in dict.fromkeys(columns):
+            if panel is not None and col in panel:
+                valid = panel.codes[col] >= 0
+            else:
+                values = df[col].to_numpy()
+                if values.dtype.kind == "f":
+                    valid = ~np.isnan(values)
+                else:
+                    valid = pd.notna(values)
+            self.bits[col] = np.packbits(valid)
+        self._samples: dict[frozenset, np.ndarray] = {}
+        self._by_digest: dict[str, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return self.nrows
+
+    @property
+    def nbytes(self) -> int:
+        """Memory used by the bitsets (not the unpacked samples)."""
+        return int(sum(bits.nbytes for bits in self.bits.values()))
+
+    def count(self, col: str) -> int:
+        """Number of non-missing rows of a column."""
+        return int(np.unpackbits(self.bits[col], count=self.nrows).sum())
+
+    def sample(self, columns: list[str]) -> np.ndarray:
+        """
+        Rows where none of the columns is missing, as a boolean mask.
+
+        Columns that are not indexed ("entity", "time", or columns without
+        missing values left out at construction) are ignored. Equal masks are
+        returned as the same (read-only) array.
+        """
+        key = frozenset(col for col in columns if col in self.bits)
+        if key not in self._samples:
+            words = np.full((self.nrows + 7) // 8, 0xFF, dtype=np.uint8)
+            for col in key:
+                words &= self.bits[col]
+            mask = np.unpackbits(words, count=self.nrows).view(bool)
+            mask = self._by_digest.setdefault(fingerprint(mask), mask)
+            mask.flags.writeable = False
+            self._samples[key] = mask
+        return self._samples[key]
+
+    def shared_samples(self) -> int:
+        """Number of distinct masks among the samples built so far."""
+        return len(self._by_digest)
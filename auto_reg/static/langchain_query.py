@@ -162,6 +162,12 @@ For your reference:
     with open(os.path.join(latex_folder, "group.tex"), "r") as file:
         GROUP_TABLE = file.read()
 
+    with open(os.path.join(latex_folder, "moderation.tex"), "r") as file:
+        MODERATION_TABLE = file.read()
+
+    with open(os.path.join(latex_folder, "mediation.tex"), "r") as file:
+        MEDIATION_TABLE = file.read()
+
     @staticmethod
     def format_query(query: str, **kwargs) -> str:
         return query.format_map(DefaultDict(kwargs))
@@ -171,3 +177,5 @@ if __name__ == "__main__":
     print(LangchainQueries.BASIC_TABLE, end="\n\n\n\n\n\n")
     print(LangchainQueries.IV_TABLE, end="\n\n\n\n\n\n")
     print(LangchainQueries.GROUP_TABLE, end="\n\n\n\n\n\n")
+    print(LangchainQueries.MODERATION_TABLE, end="\n\n\n\n\n\n")
+    print(LangchainQueries.MEDIATION_TABLE, end="\n\n\n\n\n\n")
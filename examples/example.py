@@ -5,11 +5,12 @@ import dotenv
 import os
 from langchain_openai import ChatOpenAI
 from langchain_deepseek import ChatDeepSeek
-import pandas as pd
 import json
 
 from auto_reg.regression.regression_config import ResearchConfig
 from auto_reg.regression.panel_data import *
+from auto_reg.regression.loader import load_panel
+from auto_reg.regression.result_cache import ResultCache
 from auto_reg.analysis.generate_table import *
 from auto_reg.analysis.design import *
 
@@ -45,12 +46,6 @@ model: dict[str, ChatOpenAI] = {
 # ==============================================
 # setup data
 # ==============================================
-# User need to: add a data file in the data directory
-file_path = "./test_data/example_data.csv"
-df = pd.read_csv(file_path)
-df = df.set_index(["company_id", "year"])
-# Remove rows with missing values
-df = df.dropna()
 
 
 def load_research_config(config_path: str) -> ResearchConfig:
@@ -60,6 +55,18 @@ def load_research_config(config_path: str) -> ResearchConfig:
 
 
 research_config = load_research_config("examples/research_config.json")
+
+# User need to: add a data file in the data directory
+file_path = "./test_data/example_data.csv"
+# Read only the columns used by the research config, indexed by its entity
+# and time columns. For large panels, convert the CSV once with
+# convert_csv(file_path, "./test_data/example_data.arrow") and load the
+# .arrow file instead: it is memory-mapped, not parsed.
+df, load_report = load_panel(file_path, research_config, downcast=True)
+print(load_report)
+# No dropna: run_regressions fits each spec on the rows where the columns it
+# uses are present, so a row missing an extra control is kept by the others
+
 research_config.validate_research_config(df)
 research_topic: str = research_config.research_topic
 
@@ -68,9 +75,11 @@ research_topic: str = research_config.research_topic
 # main program
 # ==============================================
 async def main() -> tuple[list[RegressionResult], ResultTables]:
-    # run regressions
+    # run regressions, unchanged specs are read from the cache of the last run
     regression_results = run_regressions(
-        df, research_config.generate_regression_configs()
+        df,
+        research_config.generate_regression_configs(),
+        result_cache=ResultCache(".cache/regressions"),
     )
 
     # Design regression tables
@@ -0,0 +1,58 @@
+import json
+import os
+from pathlib import Path
+import unittest
+
+import pandas as pd
+
+from auto_reg.analysis.generate_table import get_table_template
+from auto_reg.regression.panel_data import (
+    get_function_name,
+    group_regression,
+    mediating_regression,
+    moderating_regression,
+    panel_regression,
+    run_regressions,
+    two_stage_regression,
+)
+from auto_reg.regression.regression_config import ResearchConfig
+
+ROOT = Path(__file__).resolve().parents[2]
+EXAMPLE_DATA_FILE = os.path.join(ROOT, "test_data", "example_data.csv")
+RESEARCH_CONFIG_FILE = os.path.join(ROOT, "examples", "research_config.json")
+
+
+class TestTableTemplate(unittest.TestCase):
+    def test_every_regression_type(self):
+        """Every regression_type of run_regression has a table template"""
+        df = pd.read_csv(EXAMPLE_DATA_FILE).set_index(["company_id", "year"])
+        with open(RESEARCH_CONFIG_FILE) as f:
+            research_config = ResearchConfig(
+                **json.load(f),
+                moderating_vars=["windy"],
+                moderating_vars_description=["Average wind speed"],
+                mediation_draws=50,
+            )
+        results = run_regressions(df, research_config.generate_regression_configs())
+        regression_types = {result.regression_type for result in results}
+        expected = {
+            get_function_name(func)
+            for func in [
+                panel_regression,
+                two_stage_regression,
+                group_regression,
+                moderating_regression,
+                mediating_regression,
+            ]
+        }
+        self.assertEqual(regression_types, expected)
+        templates = {get_table_template(name) for name in regression_types}
+        self.assertEqual(len(templates), len(regression_types))
+        self.assertIn("Sobel", get_table_template("mediating_regression"))
+
+        with self.assertRaises(ValueError):
+            get_table_template("unknown_regression")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,138 @@
+import json
+import os
+from pathlib import Path
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from auto_reg.regression.absorb import absorbing_regression, map_demean
+from auto_reg.regression.demean_cache import DemeanCache
+from auto_reg.regression.panel_data import (
+    outcome_groups,
+    panel_regression,
+    run_regressions,
+)
+from auto_reg.regression.regression_config import RegressionConfig, ResearchConfig
+
+ROOT = Path(__file__).resolve().parents[2]
+EXAMPLE_DATA_FILE = os.path.join(ROOT, "test_data", "example_data.csv")
+RESEARCH_CONFIG_FILE = os.path.join(ROOT, "examples", "research_config.json")
+
+
+class TestAbsorb(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.df = pd.read_csv(EXAMPLE_DATA_FILE).set_index(["company_id", "year"])
+
+    def config(
+        self, effects: list[str], estimator: str, without_controls: bool = False
+    ) -> RegressionConfig:
+        return RegressionConfig(
+            dependent_vars=["stock_revenue"],
+            independent_vars=["extreme_temperature"],
+            control_vars=["company_size", "rain_amount"],
+            effects=effects,
+            estimator=estimator,
+            run_another_regression_without_controls=without_controls,
+        )
+
+    def test_matches_panelols(self):
+        """Same coefficients and clustered errors as PanelOLS"""
+        for effects in (["entity"], ["time"], ["entity", "time"], ["time", "industry"]):
+            expected = panel_regression(
+                self.df, self.config(effects, "panelols", without_controls=True)
+            )
+            results = panel_regression(
+                self.df, self.config(effects, "absorb", without_controls=True)
+            )
+            # the short model is solved from the long model's cross products
+            self.assertEqual(len(results), 2)
+            for exp, res in zip(expected, results):
+                np.testing.assert_allclose(res.params, exp.params, rtol=1e-6)
+                np.testing.assert_allclose(res.std_errors, exp.std_errors, rtol=1e-6)
+                self.assertAlmostEqual(res.rsquared, exp.rsquared, places=8)
+                self.assertEqual(res.nobs, exp.nobs)
+
+    def test_short_model_with_missing_controls(self):
+        """Rows missing only a control stay in the short model's sample"""
+        df = self.df.copy()
+        df.iloc[:50, df.columns.get_loc("rain_amount")] = np.nan
+        expected = panel_regression(
+            df, self.config(["entity", "time"], "panelols", without_controls=True)
+        )
+        results = panel_regression(
+            df, self.config(["entity", "time"], "absorb", without_controls=True)
+        )
+        self.assertEqual([r.nobs for r in results], [950 + 50, 950])
+        for exp, res in zip(expected, results):
+            np.testing.assert_allclose(res.params, exp.params, rtol=1e-6)
+            np.testing.assert_allclose(res.std_errors, exp.std_errors, rtol=1e-6)
+
+    def test_more_than_two_effects(self):
+        """Effects beyond the PanelOLS limit of two are absorbed"""
+        df = self.df.assign(region=self.df["industry"] % 3)
+        result = absorbing_regression(
+            df,
+            "stock_revenue",
+            ["extreme_temperature", "company_size"],
+            ["entity", "time", "industry", "region"],
+        )
+        self.assertEqual(list(result.effects), ["entity", "time", "industry", "region"])
+        self.assertTrue(np.isfinite(result.std_errors).all())
+        self.assertIn("AbsorbingOLS", str(result))
+
+    def test_map_demean_removes_group_means(self):
+        """Demeaned columns have zero mean within every level of every effect"""
+        rng = np.random.default_rng(0)
+        codes_a = rng.integers(0, 20, 500)
+        codes_b = rng.integers(0, 7, 500)
+        groups = [(c, np.bincount(c)) for c in (codes_a, codes_b)]
+        x = rng.normal(size=(500, 2))
+        demeaned, _ = map_demean(x, groups)
+        for codes, counts in groups:
+            for j in range(2):
+                means = np.bincount(codes, weights=demeaned[:, j]) / counts
+                np.testing.assert_allclose(means, 0, atol=1e-8)
+
+    def test_shares_demean_cache(self):
+        """The absorb backend reads shared columns from the DemeanCache"""
+        cache = DemeanCache()
+        panel_regression(
+            self.df, self.config(["entity", "time"], "absorb"), cache=cache
+        )
+        self.assertEqual(cache.misses, 4)
+        self.assertEqual(cache.hits, 0)
+
+        config = self.config(["entity", "time"], "absorb")
+        config.control_vars = ["company_size"]
+        panel_regression(self.df, config, cache=cache)
+        self.assertEqual(cache.misses, 4)
+        self.assertEqual(cache.hits, 3)
+
+    def test_outcomes_solved_together(self):
+        """Specs differing only in the outcome are batched and match single fits"""
+        with open(RESEARCH_CONFIG_FILE) as f:
+            research_config = ResearchConfig(**json.load(f), estimator="absorb")
+        configs = research_config.generate_regression_configs()
+        groups = outcome_groups(configs)
+        # basic and replacement y specs share one group
+        self.assertEqual(max(len(group) for group in groups), 2)
+
+        results = run_regressions(self.df, configs)
+        self.assertEqual(
+            [result.regression_config for result in results], list(configs.values())
+        )
+        for result, config in zip(results, configs.values()):
+            if result.regression_type != "panel_regression":
+                continue
+            expected = panel_regression(self.df, config)
+            self.assertEqual(len(result.results), len(expected))
+            for exp, res in zip(expected, result.results):
+                self.assertEqual(res.dependent, exp.dependent)
+                np.testing.assert_allclose(res.params, exp.params, rtol=1e-8)
+                np.testing.assert_allclose(res.cov, exp.cov, rtol=1e-8, atol=1e-14)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,106 @@
+import json
+import os
+from pathlib import Path
+import tempfile
+import unittest
+
+import pandas as pd
+
+from auto_reg.regression.batch import DataSource, results_table, run_batch
+from auto_reg.regression.loader import estimate_nbytes, load_panel
+from auto_reg.regression.panel_data import run_regressions
+from auto_reg.regression.regression_config import ResearchConfig
+
+ROOT = Path(__file__).resolve().parents[2]
+EXAMPLE_DATA_FILE = os.path.join(ROOT, "test_data", "example_data.csv")
+RESEARCH_CONFIG_FILE = os.path.join(ROOT, "examples", "research_config.json")
+
+
+class TestBatch(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        with open(RESEARCH_CONFIG_FILE) as f:
+            cls.research_config = ResearchConfig(
+                **json.load(f), estimator="absorb", mediation_draws=200
+            )
+        raw = pd.read_csv(EXAMPLE_DATA_FILE)
+        cls.tmp = tempfile.TemporaryDirectory()
+        # the same panel split by period and by industry, in several formats
+        cls.sources = [
+            os.path.join(cls.tmp.name, "early.csv"),
+            os.path.join(cls.tmp.name, "late.parquet"),
+            os.path.join(cls.tmp.name, "industry_1.csv"),
+        ]
+        raw[raw["year"] < 6].to_csv(cls.sources[0], index=False)
+        raw[raw["year"] >= 4].to_parquet(cls.sources[1], index=False)
+        raw[raw["industry"] == raw["industry"].iloc[0]].to_csv(
+            cls.sources[2], index=False
+        )
+        cls.broken = os.path.join(cls.tmp.name, "broken.csv")
+        raw.drop(columns="rain_amount").to_csv(cls.broken, index=False)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp.cleanup()
+
+    def expected(self, path: str) -> pd.DataFrame:
+        df, _ = load_panel(path, self.research_config)
+        configs = self.research_config.generate_regression_configs()
+        results = run_regressions(df, configs, compact=True)
+        return results_table(results, Path(path).stem)
+
+    def test_serial(self):
+        """Every dataset's results are written to one file, with timings"""
+        out = os.path.join(self.tmp.name, "batch.parquet")
+        report = run_batch(self.research_config, self.sources, out)
+        stored = pd.read_parquet(out)
+        self.assertEqual(
+            list(stored["dataset"].unique()), ["early", "late", "industry_1"]
+        )
+        for source in self.sources:
+            expected = self.expected(source)
+            rows = stored[stored["dataset"] == Path(source).stem]
+            pd.testing.assert_frame_equal(
+                rows.reset_index(drop=True), expected, check_dtype=False
+            )
+
+        timings = report.timings()
+        self.assertEqual(list(timings.index), ["early", "late", "industry_1"])
+        self.assertTrue((timings["fit_seconds"] > 0).all())
+        self.assertEqual(timings["results"].sum(), len(stored))
+        self.assertEqual(timings.loc["early", "rows"], 600)
+        self.assertIn("Batch Run", str(report))
+
+        with self.assertRaises(ValueError):
+            run_batch(self.research_config, self.sources[:1] * 2, out)
+
+    def test_pool_and_failures(self):
+        """A pool within a memory limit writes the same rows; failures are reported"""
+        serial = os.path.join(self.tmp.name, "serial.arrow")
+        run_batch(self.research_config, self.sources, serial)
+        estimates = [
+            estimate_nbytes(source, self.research_config) for source in self.sources
+        ]
+        self.assertGreater(min(estimates), 0)
+
+        out = os.path.join(self.tmp.name, "pool.arrow")
+        sources = self.sources + [DataSource(path=self.broken, name="broken")]
+        report = run_batch(
+            self.research_config,
+            sources,
+            out,
+            workers=2,
+            memory_limit=max(estimates),
+        )
+        self.assertEqual([job.dataset for job in report.failed], ["broken"])
+        self.assertIn("rain_amount", report.failed[0].error)
+        self.assertEqual(report.jobs[0].estimated_nbytes, estimates[0])
+
+        order = ["dataset", "spec", "position", "term"]
+        stored = pd.read_feather(out).sort_values(order, ignore_index=True)
+        expected = pd.read_feather(serial).sort_values(order, ignore_index=True)
+        pd.testing.assert_frame_equal(stored, expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+import os
+from pathlib import Path
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from auto_reg.regression.bootstrap import (
+    bootstrap_regression,
+    bootstrap_terms,
+    bootstrap_tstats,
+    bootstrap_weights,
+)
+from auto_reg.regression.panel_data import run_regression
+from auto_reg.regression.regression_config import RegressionConfig
+
+ROOT = Path(__file__).resolve().parents[2]
+EXAMPLE_DATA_FILE = os.path.join(ROOT, "test_data", "example_data.csv")
+
+
+class TestBootstrap(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.df = pd.read_csv(EXAMPLE_DATA_FILE).set_index(["company_id", "year"])
+
+    def config(self, **kwargs) -> RegressionConfig:
+        return RegressionConfig(
+            dependent_vars=["stock_revenue"],
+            independent_vars=["extreme_temperature"],
+            control_vars=["company_size", "rain_amount"],
+            effects=["entity", "time"],
+            **kwargs,
+        )
+
+    def test_matches_refits(self):
+        """Batched bootstrap t-statistics equal those of explicit refits"""
+        rng = np.random.default_rng(0)
+        n, nclusters = 400, 12
+        clusters = rng.integers(0, nclusters, n)
+        x = np.column_stack([rng.normal(size=(n, 2)), np.ones(n)])
+        y = x @ [0.0, 1.0, 0.5] + rng.normal(size=n)
+
+        _, _, d, c = bootstrap_terms(y, x, clusters, 0)
+        v = bootstrap_weights(rng, 50, nclusters, "webb")
+        tstats = bootstrap_tstats(v, d, c)
+
+        # restricted fit, then one refit per draw
+        x_r = x[:, 1:]
+        fitted_r = x_r @ np.linalg.lstsq(x_r, y, rcond=None)[0]
+        resid_r = y - fitted_r
+        xpx_inv = np.linalg.inv(x.T @ x)
+        for b in range(50):
+            y_b = fitted_r + resid_r * v[b, clusters]
+            params = xpx_inv @ x.T @ y_b
+            resid = y_b - x @ params
+            scores = np.array(
+                [
+                    (x[clusters == g] * resid[clusters == g, None]).sum(0)
+                    for g in range(nclusters)
+                ]
+            )
+            cov = nclusters / (nclusters - 1) * xpx_inv @ scores.T @ scores @ xpx_inv
+            self.assertAlmostEqual(tstats[b], params[0] / np.sqrt(cov[0, 0]))
+
+    def test_bootstrap_regression(self):
+        """p-values of a fitted result, reproducible from the seed"""
+        result = run_regression(self.df, "basic", self.config())
+        first = bootstrap_regression(self.df, result, draws=999, seed=1)
+        second = bootstrap_regression(self.df, result, draws=999, seed=1)
+        pd.testing.assert_series_equal(first.pvalues, second.pvalues)
+        self.assertEqual(first.nclusters, 100)
+        self.assertEqual(list(first.pvalues.index), ["extreme_temperature"])
+        # the t-statistic is the clustered one with CR1 scaling, G / (G - 1)
+        fitted = result.results[-1]
+        ratio = np.sqrt((fitted.nobs / fitted.df_resid) / (100 / 99))
+        np.testing.assert_allclose(
+            first.params, fitted.params[["extreme_temperature"]], rtol=1e-8
+        )
+        np.testing.assert_allclose(
+            first.tstats, fitted.tstats[["extreme_temperature"]] * ratio, rtol=1e-6
+        )
+        self.assertIn("Wild Cluster Bootstrap", str(first))
+
+    def test_group_level_and_workers(self):
+        """Bootstraps one level of a group regression across processes"""
+        config = self.config(group_var="is_high_tech", cov_type="clustered:industry")
+        result = run_regression(self.df, "heterogeneity", config)
+        boot = bootstrap_regression(
+            self.df, result, result_index=0, draws=2000, weights="webb", workers=2
+        )
+        self.assertEqual(boot.cluster, "industry")
+        self.assertLessEqual(boot.nclusters, 8)
+        self.assertTrue(0 <= boot.pvalues.iloc[0] <= 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+import os
+from pathlib import Path
+import unittest
+
+import numpy as np
+import pandas as pd
+from pydantic import ValidationError
+
+from auto_reg.regression.covariance import ClusterSegments, parse_cov_type
+from auto_reg.regression.panel_data import fit_regression, panel_regression
+from auto_reg.regression.regression_config import RegressionConfig
+
+ROOT = Path(__file__).resolve().parents[2]
+EXAMPLE_DATA_FILE = os.path.join(ROOT, "test_data", "example_data.csv")
+
+COV_TYPES = [
+    "clustered",
+    "unadjusted",
+    "robust",
+    "clustered:time",
+    "clustered:industry",
+    "clustered:entity,time",
+    "clustered:industry,time",
+]
+
+
+class TestCovariance(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.df = pd.read_csv(EXAMPLE_DATA_FILE).set_index(["company_id", "year"])
+
+    def config(self, effects: list[str], **kwargs) -> RegressionConfig:
+        return RegressionConfig(
+            dependent_vars=["stock_revenue"],
+            independent_vars=["extreme_temperature"],
+            control_vars=["company_size", "rain_amount"],
+            effects=effects,
+            **kwargs,
+        )
+
+    def test_segment_sums(self):
+        """Segmented sums over sorted scores equal per-cluster sums"""
+        rng = np.random.default_rng(0)
+        codes = rng.integers(0, 30, 1000)
+        scores = rng.normal(size=(1000, 3))
+        segments = ClusterSegments(codes)
+        self.assertEqual(len(segments), 30)
+        expected = np.column_stack(
+            [np.bincount(codes, weights=scores[:, j]) for j in range(3)]
+        )
+        np.testing.assert_allclose(segments.sums(scores), expected)
+
+    def test_matches_panelols(self):
+        """One absorb fit gives every covariance PanelOLS computes separately"""
+        for effects in (["entity"], ["entity", "time"]):
+            result = fit_regression(
+                self.df,
+                "stock_revenue",
+                ["extreme_temperature", "company_size", "rain_amount"],
+                self.config(
+                    effects,
+                    estimator="absorb",
+                    extra_cov_types=COV_TYPES[1:],
+                ),
+            )
+            self.assertEqual(list(result.covariances), COV_TYPES[1:])
+            for cov_type in COV_TYPES:
+                expected = panel_regression(
+                    self.df, self.config(effects, cov_type=cov_type)
+                )[0]
+                np.testing.assert_allclose(
+                    result.use_covariance(cov_type).std_errors,
+                    expected.std_errors,
+                    rtol=1e-6,
+                    err_msg=f"{effects} {cov_type}",
+                )
+
+    def test_cov_type_names(self):
+        """Covariance names are checked when the config is built"""
+        self.assertEqual(parse_cov_type("clustered"), ("clustered", ["entity"]))
+        self.assertEqual(
+            parse_cov_type("clustered:industry,time"),
+            ("clustered", ["industry", "time"]),
+        )
+        for cov_type in ["hac", "robust:entity", "clustered:a,b,c"]:
+            with self.assertRaises(ValidationError):
+                self.config(["entity"], cov_type=cov_type)
+        with self.assertRaises(ValidationError):
+            self.config(["entity"], extra_cov_types=["robust"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,131 @@
+import json
+import os
+from pathlib import Path
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from auto_reg.regression.demean_cache import CachedPanelOLS, DemeanCache
+from auto_reg.regression.panel_data import (
+    fit_regression,
+    panel_regression,
+    run_regressions,
+)
+from auto_reg.regression.regression_config import RegressionConfig, ResearchConfig
+
+ROOT = Path(__file__).resolve().parents[2]
+EXAMPLE_DATA_FILE = os.path.join(ROOT, "test_data", "example_data.csv")
+RESEARCH_CONFIG_FILE = os.path.join(ROOT, "examples", "research_config.json")
+
+
+def header_line(summary: str, label: str) -> str:
+    """The summary line that starts with label."""
+    (line,) = [line for line in summary.splitlines() if line.startswith(label)]
+    return line
+
+
+class TestDemeanCache(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.df = pd.read_csv(EXAMPLE_DATA_FILE).set_index(["company_id", "year"])
+        with open(RESEARCH_CONFIG_FILE) as f:
+            cls.research_config = ResearchConfig(**json.load(f))
+
+    def test_cached_fit_matches_panelols(self):
+        """Cached demeaning gives the same estimates as plain PanelOLS"""
+        for effects in (["entity"], ["entity", "time"], ["time", "industry"]):
+            config = RegressionConfig(
+                dependent_vars=["stock_revenue"],
+                independent_vars=["extreme_temperature"],
+                control_vars=["company_size", "rain_amount"],
+                effects=effects,
+                run_another_regression_without_controls=True,
+            )
+            expected = panel_regression(self.df, config)
+            cached = panel_regression(self.df, config, cache=DemeanCache())
+            self.assertIsInstance(cached[-1].model, CachedPanelOLS)
+            for exp, res in zip(expected, cached):
+                np.testing.assert_allclose(res.params, exp.params, rtol=1e-6)
+                np.testing.assert_allclose(res.std_errors, exp.std_errors, rtol=1e-6)
+                self.assertAlmostEqual(res.rsquared, exp.rsquared, places=8)
+                self.assertEqual(
+                    header_line(str(res), "Estimator:"),
+                    header_line(str(exp), "Estimator:"),
+                )
+
+    def test_columns_shared_across_specs(self):
+        """Each column is demeaned once per (sample, effects)"""
+        config = RegressionConfig(
+            dependent_vars=["stock_revenue"],
+            independent_vars=["extreme_temperature"],
+            control_vars=["company_size"],
+            effects=["entity", "time"],
+            run_another_regression_without_controls=True,
+        )
+        cache = DemeanCache()
+        panel_regression(self.df, config, cache=cache)
+        # y, x, company_size; the short model reads them back for its blocks
+        self.assertEqual(cache.misses, 3)
+        self.assertEqual(cache.hits, 3)
+
+        panel_regression(self.df, config, cache=cache)
+        self.assertEqual(cache.misses, 3)
+        self.assertEqual(cache.hits, 9)
+
+    def test_short_model_from_blocks(self):
+        """The regression without controls equals its own PanelOLS fit"""
+        df = self.df.copy()
+        for effects, cov_type in [
+            (["entity", "time"], "clustered"),
+            (["entity"], "robust"),
+            (["time", "industry"], "clustered:industry"),
+            ([], "unadjusted"),
+        ]:
+            config = RegressionConfig(
+                dependent_vars=["stock_revenue"],
+                independent_vars=["extreme_temperature"],
+                control_vars=["company_size", "rain_amount"],
+                effects=effects,
+                cov_type=cov_type,
+                run_another_regression_without_controls=True,
+            )
+            exog_vars = config.independent_vars
+            expected = fit_regression(df, "stock_revenue", exog_vars, config)
+            result, _ = panel_regression(df, config)
+            self.assertEqual(result.nobs, expected.nobs)
+            self.assertEqual(result.df_resid, expected.df_resid)
+            np.testing.assert_allclose(result.params, expected.params, rtol=1e-8)
+            np.testing.assert_allclose(
+                result.std_errors, expected.std_errors, rtol=1e-8
+            )
+            for name in ["", "_within", "_between", "_overall"]:
+                self.assertAlmostEqual(
+                    getattr(result, "rsquared" + name),
+                    getattr(expected, "rsquared" + name),
+                )
+            self.assertEqual(
+                header_line(str(result), "Estimator:").split()[1],
+                header_line(str(expected), "Estimator:").split()[1],
+            )
+
+        # rows missing only a control are refitted on their own sample
+        df.iloc[:50, df.columns.get_loc("rain_amount")] = np.nan
+        result, long = panel_regression(df, config)
+        self.assertEqual([result.nobs, long.nobs], [1000, 950])
+
+    def test_run_regressions_with_cache(self):
+        """run_regressions reports hits for the shared columns"""
+        cache = DemeanCache()
+        results = run_regressions(
+            self.df, self.research_config.generate_regression_configs(), cache=cache
+        )
+        self.assertEqual(
+            len(results), len(self.research_config.generate_regression_configs())
+        )
+        self.assertGreater(cache.hits, 0)
+        self.assertEqual(len(cache), cache.misses)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,115 @@
+import os
+from pathlib import Path
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from auto_reg.regression.heterogeneity import GroupedPanel
+from auto_reg.regression.panel_data import (
+    fit_regression,
+    heterogeneity_regression,
+    parallel_map,
+    run_regression,
+    run_regressions,
+)
+from auto_reg.regression.regression_config import RegressionConfig
+
+ROOT = Path(__file__).resolve().parents[2]
+EXAMPLE_DATA_FILE = os.path.join(ROOT, "test_data", "example_data.csv")
+
+
+class TestHeterogeneity(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.df = pd.read_csv(EXAMPLE_DATA_FILE).set_index(["company_id", "year"])
+
+    def config(self, group_var: str, effects: list[str], **kwargs) -> RegressionConfig:
+        return RegressionConfig(
+            dependent_vars=["stock_revenue"],
+            independent_vars=["extreme_temperature"],
+            control_vars=["company_size", "rain_amount"],
+            effects=effects,
+            group_var=group_var,
+            **kwargs,
+        )
+
+    def test_levels_are_contiguous_slices(self):
+        """Each level is a view of the sorted panel with the level's rows"""
+        grouped = GroupedPanel(self.df, "industry")
+        self.assertEqual(list(grouped.levels), list(range(8)))
+        for i, level in enumerate(grouped.levels):
+            rows = grouped.level(i)
+            self.assertTrue((rows["industry"] == level).all())
+            self.assertEqual(len(rows), (self.df["industry"] == level).sum())
+        self.assertTrue(
+            np.shares_memory(
+                grouped.level(3)["stock_revenue"].to_numpy(),
+                grouped.df["stock_revenue"].to_numpy(),
+            )
+        )
+
+    def test_matches_boolean_split(self):
+        """Every level matches a fit on the boolean-masked sample"""
+        for estimator in ("panelols", "absorb"):
+            config = self.config("industry", ["entity", "time"], estimator=estimator)
+            results, levels, test = heterogeneity_regression(self.df, config)
+            self.assertIsNone(test)
+            self.assertEqual(len(results), 8)
+            for result, level in zip(results, levels):
+                expected = fit_regression(
+                    self.df[self.df["industry"] == level],
+                    "stock_revenue",
+                    ["extreme_temperature", "company_size", "rain_amount"],
+                    config,
+                )
+                np.testing.assert_allclose(result.params, expected.params, rtol=1e-8)
+                np.testing.assert_allclose(
+                    result.std_errors, expected.std_errors, rtol=1e-8
+                )
+
+    def test_interacted_model(self):
+        """Without effects the pooled interactions are the level differences"""
+        config = self.config("is_high_tech", [], group_interacted=True)
+        results, levels, test = heterogeneity_regression(self.df, config)
+        low, high, pooled = results
+        for var in ["extreme_temperature", "company_size", "rain_amount"]:
+            self.assertAlmostEqual(pooled.params[var], low.params[var])
+            self.assertAlmostEqual(
+                pooled.params[var] + pooled.params[f"{var}:is_high_tech=1"],
+                high.params[var],
+            )
+        self.assertEqual(test.df_num, 3)
+        self.assertTrue(0 <= test.pval <= 1)
+
+    def test_absorbed_dummies_are_dropped(self):
+        """Level dummies nested in the entity effect are left out"""
+        config = self.config("industry", ["entity", "time"], group_interacted=True)
+        result = run_regression(self.df, "heterogeneity", config)
+        pooled = result.results[-1]
+        self.assertEqual(len(result.results), 9)
+        self.assertNotIn("industry=1", pooled.params.index)
+        self.assertEqual(result.equality_test.df_num, 3 * 7)
+        self.assertIn("industry == 7", result.description)
+
+    def test_workers_match_serial(self):
+        """Levels fitted on a process pool match the serial fits"""
+        config = self.config("industry", ["entity", "time"])
+        serial = heterogeneity_regression(self.df, config)[0]
+        parallel = heterogeneity_regression(self.df, config, workers=2)[0]
+        for expected, result in zip(serial, parallel):
+            np.testing.assert_allclose(result.params, expected.params)
+
+        # run_regressions forwards level_workers to the levels
+        with mock.patch(
+            "auto_reg.regression.panel_data.parallel_map", wraps=parallel_map
+        ) as pool:
+            (grouped,) = run_regressions(self.df, {"group": config}, level_workers=2)
+        self.assertEqual(pool.call_args.kwargs["workers"], 2)
+        for expected, result in zip(serial, grouped.results):
+            np.testing.assert_allclose(result.params, expected.params)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,117 @@
+import json
+import os
+from pathlib import Path
+import pickle
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from auto_reg.regression.absorb import absorbing_regression
+from auto_reg.regression.incremental import IncrementalFit, IncrementalRegressions
+from auto_reg.regression.panel_data import run_regressions
+from auto_reg.regression.regression_config import ResearchConfig
+
+ROOT = Path(__file__).resolve().parents[2]
+EXAMPLE_DATA_FILE = os.path.join(ROOT, "test_data", "example_data.csv")
+RESEARCH_CONFIG_FILE = os.path.join(ROOT, "examples", "research_config.json")
+EXOG_VARS = ["extreme_temperature", "company_size", "rain_amount"]
+
+
+class TestIncremental(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.df = pd.read_csv(EXAMPLE_DATA_FILE).set_index(["company_id", "year"])
+        years = cls.df.index.get_level_values("year")
+        cls.history = cls.df[years < years.max() - 1]
+        cls.appended = [
+            cls.df[years == years.max() - 1],
+            cls.df[years == years.max()],
+        ]
+
+    def assert_same(self, result, expected):
+        self.assertEqual(result.nobs, expected.nobs)
+        self.assertEqual(result.df_resid, expected.df_resid)
+        self.assertEqual(result.effects, expected.effects)
+        self.assertEqual(result.nclusters, expected.nclusters)
+        np.testing.assert_allclose(
+            result.params, expected.params, rtol=1e-8, atol=1e-12
+        )
+        np.testing.assert_allclose(
+            result.std_errors, expected.std_errors, rtol=1e-8, atol=1e-12
+        )
+        self.assertAlmostEqual(result.rsquared, expected.rsquared, places=10)
+
+    def test_matches_refit(self):
+        """Updating with the appended years equals fitting the whole panel"""
+        for effects in (["entity"], ["entity", "time"]):
+            for cov_type in ("clustered", "clustered:industry", "unadjusted"):
+                for constant in (True, False):
+                    fit = IncrementalFit(
+                        "stock_revenue", EXOG_VARS, effects, cov_type, constant
+                    ).update(self.history)
+                    for rows in self.appended:
+                        fit.update(rows)
+                    expected = absorbing_regression(
+                        self.df,
+                        "stock_revenue",
+                        EXOG_VARS,
+                        effects,
+                        constant=constant,
+                        cov_types=[cov_type],
+                    )
+                    self.assert_same(fit.result(), expected)
+
+    def test_missing_and_pickle(self):
+        """Rows with missing values are skipped and a pickled fit updates"""
+        df = self.df.copy()
+        df.iloc[::9, df.columns.get_loc("rain_amount")] = np.nan
+        years = df.index.get_level_values("year")
+        fit = IncrementalFit("stock_revenue", EXOG_VARS, ["entity", "time"])
+        fit.update(df[years < years.max()])
+        fit = pickle.loads(pickle.dumps(fit))
+        fit.update(df[years == years.max()])
+        expected = absorbing_regression(
+            df, "stock_revenue", EXOG_VARS, ["entity", "time"]
+        )
+        self.assert_same(fit.result(), expected)
+
+    def test_not_nested(self):
+        """Clusters that split a level of the absorbed effect are rejected"""
+        fit = IncrementalFit(
+            "stock_revenue", EXOG_VARS, ["entity"], "clustered:time"
+        ).update(self.appended[0])
+        with self.assertRaises(ValueError):
+            fit.update(self.appended[1])
+        self.assertEqual(fit.nobs, len(self.appended[0]))
+        with self.assertRaises(ValueError):
+            IncrementalFit("stock_revenue", EXOG_VARS, ["entity"], "robust")
+
+    def test_incremental_regressions(self):
+        """Basic specs of a research config match run_regressions"""
+        with open(RESEARCH_CONFIG_FILE) as f:
+            research_config = ResearchConfig(**json.load(f), estimator="absorb")
+        configs = {
+            description: config
+            for description, config in (
+                research_config.generate_regression_configs().items()
+            )
+            if not config.instrument_var
+            and not config.group_var
+            and not config.mediating_var
+            and config.effects[0] == "entity"
+        }
+        regressions = IncrementalRegressions(configs)
+        regressions.update(self.history)
+        for rows in self.appended:
+            results = regressions.update(rows)
+        expected = run_regressions(self.df, configs)
+        self.assertEqual(len(results), len(expected))
+        for res, exp in zip(results, expected):
+            self.assertEqual(res.description, exp.description)
+            for result, expected_result in zip(res.results, exp.results):
+                self.assert_same(result, expected_result)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+import os
+from pathlib import Path
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from auto_reg.regression.influence import influence_regression
+from auto_reg.regression.panel_data import fit_regression, run_regression
+from auto_reg.regression.regression_config import RegressionConfig
+
+ROOT = Path(__file__).resolve().parents[2]
+EXAMPLE_DATA_FILE = os.path.join(ROOT, "test_data", "example_data.csv")
+
+
+class TestInfluence(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.df = pd.read_csv(EXAMPLE_DATA_FILE).set_index(["company_id", "year"])
+
+    def config(self, **kwargs) -> RegressionConfig:
+        return RegressionConfig(
+            dependent_vars=["stock_revenue"],
+            independent_vars=["extreme_temperature"],
+            control_vars=["company_size", "rain_amount"],
+            estimator="absorb",
+            **kwargs,
+        )
+
+    def test_matches_refits(self):
+        """Downdated estimates equal refits without the cluster"""
+        exog_vars = ["extreme_temperature", "company_size", "rain_amount"]
+        for effects, cluster in [
+            (["entity"], "entity"),
+            (["entity"], "industry"),
+            ([], "time"),
+        ]:
+            config = self.config(effects=effects)
+            result = run_regression(self.df, "basic", config)
+            influence = influence_regression(self.df, result, cluster=cluster)
+            self.assertTrue(influence.exact)
+            np.testing.assert_allclose(
+                influence.params[exog_vars], result.results[-1].params[exog_vars]
+            )
+            if cluster == "entity":
+                labels = self.df.index.get_level_values(0)
+            elif cluster == "time":
+                labels = self.df.index.get_level_values(1)
+            else:
+                labels = self.df[cluster]
+            for label in influence.ranked(3).index:
+                refit = fit_regression(
+                    self.df[labels != label], "stock_revenue", exog_vars, config
+                )
+                np.testing.assert_allclose(
+                    influence.loco.loc[label, exog_vars],
+                    refit.params[exog_vars],
+                    rtol=1e-7,
+                )
+                self.assertEqual(influence.nobs[label], len(self.df) - refit.nobs)
+
+    def test_ranked_table(self):
+        """Clusters are ranked by the change of the coefficient"""
+        config = self.config(effects=["entity", "time"])
+        result = run_regression(self.df, "basic", config)
+        influence = influence_regression(self.df, result)
+        self.assertFalse(influence.exact)  # time effects cross the entities
+        self.assertEqual(len(influence.loco), 100)
+        table = influence.ranked()
+        changes = np.abs(table["change"].to_numpy())
+        self.assertTrue((np.diff(changes) <= 0).all())
+        self.assertEqual(len(influence.ranked(5)), 5)
+        # the jackknife standard error is near the clustered one
+        ratio = (
+            influence.jackknife_se["extreme_temperature"]
+            / result.results[-1].std_errors["extreme_temperature"]
+        )
+        self.assertTrue(0.5 < ratio < 2)
+        self.assertIn("Leave-One-Cluster-Out", str(influence))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,120 @@
+import os
+from pathlib import Path
+import unittest
+
+import numpy as np
+import pandas as pd
+from linearmodels.iv import IV2SLS
+
+from auto_reg.regression.iv import iv_regression
+from auto_reg.regression.panel_data import (
+    fit_regression,
+    outcome_groups,
+    panel_regression,
+    run_regressions,
+    two_stage_regression,
+)
+from auto_reg.regression.regression_config import RegressionConfig
+
+ROOT = Path(__file__).resolve().parents[2]
+EXAMPLE_DATA_FILE = os.path.join(ROOT, "test_data", "example_data.csv")
+
+
+class TestIV(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.df = pd.read_csv(EXAMPLE_DATA_FILE).set_index(["company_id", "year"])
+
+    def config(self, effects: list[str], **kwargs) -> RegressionConfig:
+        settings = dict(
+            dependent_vars=["stock_revenue"],
+            independent_vars=["extreme_temperature"],
+            control_vars=["company_size", "rain_amount"],
+        )
+        settings.update(kwargs)
+        return RegressionConfig(effects=effects, **settings)
+
+    def test_matches_iv2sls(self):
+        """Coefficients match linearmodels IV2SLS with two instruments"""
+        first, (second,) = iv_regression(
+            self.df,
+            ["stock_revenue"],
+            ["extreme_temperature"],
+            ["company_size", "rain_amount"],
+            ["company_latitude", "windy"],
+            [],
+        )
+        df = self.df.assign(constant=1.0)
+        expected = IV2SLS(
+            df["stock_revenue"],
+            df[["company_size", "rain_amount", "constant"]],
+            df["extreme_temperature"],
+            df[["company_latitude", "windy"]],
+        ).fit(cov_type="clustered", clusters=pd.Series(df.index.get_level_values(0)))
+        np.testing.assert_allclose(second.params, expected.params[second.params.index])
+        # IV2SLS is not debiased by default, we scale by n / (n - k)
+        n, k = second.nobs, len(second.params)
+        ratio = np.sqrt(n / (n - k))
+        np.testing.assert_allclose(
+            second.std_errors,
+            expected.std_errors[second.params.index] * ratio,
+            rtol=1e-6,
+        )
+        self.assertEqual(list(second.first_stage_f), ["extreme_temperature"])
+        self.assertEqual(second.first_stage_f["extreme_temperature"].df_num, 2)
+        self.assertIn("IV-2SLS", str(second))
+
+    def test_exactly_identified_by_itself_is_ols(self):
+        """Instrumenting a regressor with itself gives the OLS fit"""
+        config = self.config(["entity", "time"], instrument_var="extreme_temperature")
+        first, second = two_stage_regression(self.df, config)
+        expected = panel_regression(self.df, config)[0]
+        np.testing.assert_allclose(second.params, expected.params, rtol=1e-8)
+        np.testing.assert_allclose(second.std_errors, expected.std_errors, rtol=1e-6)
+
+    def test_first_stage_matches_regression(self):
+        """The first stage is the regression of the endogenous variable"""
+        config = self.config(
+            ["entity", "time"],
+            instrument_vars=["company_latitude", "windy"],
+            independent_vars=["extreme_temperature", "local_climate_variability"],
+            endogenous_vars=["extreme_temperature", "local_climate_variability"],
+        )
+        results = two_stage_regression(self.df, config)
+        self.assertEqual(len(results), 3)
+        for result, endogenous in zip(results, config.endogenous_vars):
+            expected = fit_regression(
+                self.df,
+                endogenous,
+                ["company_latitude", "windy", "company_size", "rain_amount"],
+                config,
+            )
+            np.testing.assert_allclose(
+                result.params, expected.params, rtol=1e-6, atol=1e-12
+            )
+            np.testing.assert_allclose(
+                result.std_errors, expected.std_errors, rtol=1e-6, atol=1e-12
+            )
+        self.assertEqual(list(results[-1].params.index[:2]), config.endogenous_vars)
+
+    def test_outcomes_share_first_stage(self):
+        """2SLS specs differing only in the outcome are solved together"""
+        configs = {
+            name: self.config(
+                ["entity", "time"],
+                instrument_var="company_latitude",
+                dependent_vars=[name],
+            )
+            for name in ["stock_revenue", "stock_revenue_another_measure_method"]
+        }
+        self.assertEqual(len(outcome_groups(configs)), 1)
+        results = run_regressions(self.df, configs)
+        for result, config in zip(results, configs.values()):
+            expected = two_stage_regression(self.df, config)
+            for exp, res in zip(expected, result.results):
+                np.testing.assert_allclose(res.params, exp.params, rtol=1e-10)
+                np.testing.assert_allclose(res.cov, exp.cov, rtol=1e-8, atol=1e-14)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+import json
+import os
+from pathlib import Path
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from auto_reg.regression.loader import convert_csv, load_panel
+from auto_reg.regression.panel_data import run_regressions
+from auto_reg.regression.regression_config import ResearchConfig
+
+ROOT = Path(__file__).resolve().parents[2]
+EXAMPLE_DATA_FILE = os.path.join(ROOT, "test_data", "example_data.csv")
+RESEARCH_CONFIG_FILE = os.path.join(ROOT, "examples", "research_config.json")
+INDEX = ["company_id", "year"]
+
+
+class TestLoader(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        with open(RESEARCH_CONFIG_FILE) as f:
+            cls.research_config = ResearchConfig(**json.load(f))
+        cls.raw = pd.read_csv(EXAMPLE_DATA_FILE)
+        # a vendor file: the used columns among many unused ones
+        wide = cls.raw.assign(
+            **{f"unused_{i}": np.arange(len(cls.raw)) * 0.5 for i in range(30)},
+            vendor_name="company " + cls.raw["company_id"].astype(str),
+        )
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.path = os.path.join(cls.tmp.name, "vendor.csv")
+        wide.to_csv(cls.path, index=False)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp.cleanup()
+
+    def test_projection(self):
+        """Only the used columns are read, indexed by entity and time"""
+        df, report = load_panel(self.path, self.research_config)
+        expected = self.raw.set_index(INDEX)
+        self.assertEqual(df.index.names, INDEX)
+        self.assertEqual(set(df.columns), set(expected.columns))
+        pd.testing.assert_frame_equal(df, expected[df.columns])
+        self.assertEqual(report.columns_skipped, 31)
+        self.assertGreater(report.saved, 0)
+        self.assertIn("31 skipped", str(report))
+
+    def test_downcast(self):
+        """Downcast columns are smaller and give nearly the same fits"""
+        df, report = load_panel(self.path, self.research_config, downcast=True)
+        full, full_report = load_panel(self.path, self.research_config)
+        self.assertEqual(df["stock_revenue"].dtype, np.float32)
+        self.assertEqual(df["is_high_tech"].dtype, np.int8)
+        self.assertLess(report.nbytes, full_report.nbytes)
+
+        configs = self.research_config.generate_regression_configs()
+        basic = {key: configs[key] for key in list(configs)[:1]}
+        for res, exp in zip(run_regressions(df, basic), run_regressions(full, basic)):
+            for result, expected in zip(res.results, exp.results):
+                np.testing.assert_allclose(
+                    result.params, expected.params, rtol=1e-4, atol=1e-6
+                )
+
+    def test_arrow_and_parquet(self):
+        """Converted files load the same panel, Arrow without copies"""
+        raw = self.raw.copy()
+        raw.loc[::11, "windy"] = np.nan
+        csv = os.path.join(self.tmp.name, "missing.csv")
+        raw.to_csv(csv, index=False)
+        expected, _ = load_panel(csv, self.research_config)
+        for name in ["panel.arrow", "panel.parquet"]:
+            path = convert_csv(csv, os.path.join(self.tmp.name, name))
+            df, report = load_panel(path, self.research_config)
+            pd.testing.assert_frame_equal(df, expected)
+            self.assertEqual(df["windy"].isna().sum(), raw["windy"].isna().sum())
+
+        df, report = load_panel(
+            os.path.join(self.tmp.name, "panel.arrow"), self.research_config
+        )
+        self.assertGreater(report.mapped_nbytes, 0)
+        # the column is a view of the Arrow buffer, not a NumPy copy
+        base = df["stock_revenue"].to_numpy()
+        while getattr(base, "base", None) is not None:
+            base = base.base
+        self.assertEqual(type(base).__module__, "pyarrow.lib")
+
+    def test_missing_column(self):
+        """A used column missing from the file is reported"""
+        config = self.research_config.model_copy(
+            update={"control_vars": ["not_a_column"]}
+        )
+        with self.assertRaises(ValueError):
+            load_panel(self.path, config)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,162 @@
+import json
+import os
+from pathlib import Path
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from auto_reg.regression.mediation import cluster_draws, sobel_test
+from auto_reg.regression.panel_data import (
+    fit_regression,
+    run_regression,
+    run_regressions,
+)
+from auto_reg.regression.regression_config import RegressionConfig, ResearchConfig
+
+ROOT = Path(__file__).resolve().parents[2]
+EXAMPLE_DATA_FILE = os.path.join(ROOT, "test_data", "example_data.csv")
+RESEARCH_CONFIG_FILE = os.path.join(ROOT, "examples", "research_config.json")
+
+
+class TestMediation(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        df = pd.read_csv(EXAMPLE_DATA_FILE).set_index(["company_id", "year"])
+        df.loc[df.index[::7], "invester_mood"] = np.nan
+        df.loc[df.index[3::11], "stock_revenue"] = np.nan
+        cls.df = df
+        cls.sample = df.dropna(
+            subset=[
+                "stock_revenue",
+                "invester_mood",
+                "extreme_temperature",
+                "company_size",
+                "rain_amount",
+            ]
+        )
+
+    def config(self, **kwargs) -> RegressionConfig:
+        return RegressionConfig(
+            dependent_vars=["stock_revenue"],
+            independent_vars=["extreme_temperature"],
+            control_vars=["company_size", "rain_amount"],
+            mediating_var="invester_mood",
+            **kwargs,
+        )
+
+    def test_equations_and_draws(self):
+        """Both equations use the common sample and draws match refits"""
+        for estimator in ["panelols", "absorb"]:
+            config = self.config(
+                effects=["entity"], estimator=estimator, mediation_draws=20
+            )
+            result = run_regression(self.df, "mediation", config)
+            a_result, b_result = result.results
+            expected = [
+                fit_regression(
+                    self.sample,
+                    "invester_mood",
+                    ["extreme_temperature", "company_size", "rain_amount"],
+                    config,
+                ),
+                fit_regression(
+                    self.sample,
+                    "stock_revenue",
+                    [
+                        "extreme_temperature",
+                        "invester_mood",
+                        "company_size",
+                        "rain_amount",
+                    ],
+                    config,
+                ),
+            ]
+            for res, exp in zip(result.results, expected):
+                self.assertEqual(res.nobs, exp.nobs)
+                np.testing.assert_allclose(res.params, exp.params, rtol=1e-6)
+
+            test = result.mediation_test
+            self.assertTrue(test.exact)
+            self.assertAlmostEqual(test.a, a_result.params["extreme_temperature"])
+            self.assertAlmostEqual(test.b, b_result.params["invester_mood"])
+            se, z, pvalue = sobel_test(test.a, test.se_a, test.b, test.se_b)
+            self.assertAlmostEqual(test.sobel_se, se)
+            self.assertAlmostEqual(
+                test.sobel_se**2,
+                test.b**2 * a_result.std_errors["extreme_temperature"] ** 2
+                + test.a**2 * b_result.std_errors["invester_mood"] ** 2,
+            )
+            self.assertIn(str(test), result.description)
+
+        # resampled clusters are new entities of a refitted panel
+        entities = self.sample.index.get_level_values(0).unique().sort_values()
+        indices = cluster_draws(np.random.default_rng(0), 20, len(entities))
+        for draw in [0, 7]:
+            blocks = [
+                self.sample.loc[[entities[g]]].assign(company_id=j)
+                for j, g in enumerate(indices[draw])
+            ]
+            resampled = (
+                pd.concat(blocks)
+                .reset_index(level=0, drop=True)
+                .set_index("company_id", append=True)
+                .swaplevel()
+            )
+            a = fit_regression(
+                resampled,
+                "invester_mood",
+                ["extreme_temperature", "company_size", "rain_amount"],
+                config,
+            ).params["extreme_temperature"]
+            b = fit_regression(
+                resampled,
+                "stock_revenue",
+                [
+                    "extreme_temperature",
+                    "invester_mood",
+                    "company_size",
+                    "rain_amount",
+                ],
+                config,
+            ).params["invester_mood"]
+            self.assertAlmostEqual(test.bootstrap[draw], a * b)
+
+    def test_generated_configs(self):
+        """The mediating spec fits both equations and reports the test"""
+        with open(RESEARCH_CONFIG_FILE) as f:
+            research_config = ResearchConfig(
+                **json.load(f), estimator="absorb", mediation_draws=500
+            )
+        configs = {
+            description: config
+            for description, config in (
+                research_config.generate_regression_configs().items()
+            )
+            if config.mediating_var
+        }
+        (config,) = configs.values()
+        self.assertEqual(config.dependent_vars, ["stock_revenue"])
+        self.assertEqual(config.mediating_var, "invester_mood")
+
+        (result,) = run_regressions(self.df, configs)
+        self.assertEqual(result.regression_type, "mediating_regression")
+        self.assertEqual(
+            [res.dependent for res in result.results],
+            ["invester_mood", "stock_revenue"],
+        )
+        test = result.mediation_test
+        self.assertFalse(test.exact)  # time effects are not nested in entities
+        self.assertEqual(len(test.bootstrap), 500)
+        self.assertEqual(test.nclusters, self.df.index.get_level_values(0).nunique())
+        self.assertLess(test.ci_lower, test.ci_upper)
+        self.assertGreater(test.bootstrap_se, 0)
+        self.assertIn("Sobel", str(test))
+
+        # reruns give the same interval
+        (again,) = run_regressions(self.df, configs)
+        np.testing.assert_array_equal(again.mediation_test.bootstrap, test.bootstrap)
+
+
+if __name__ == "__main__":
+    unittest.main()
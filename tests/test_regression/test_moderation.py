@@ -0,0 +1,112 @@
+import json
+import os
+from pathlib import Path
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from auto_reg.regression.demean_cache import DemeanCache
+from auto_reg.regression.panel_data import fit_regression, run_regressions
+from auto_reg.regression.regression_config import RegressionConfig, ResearchConfig
+
+ROOT = Path(__file__).resolve().parents[2]
+EXAMPLE_DATA_FILE = os.path.join(ROOT, "test_data", "example_data.csv")
+RESEARCH_CONFIG_FILE = os.path.join(ROOT, "examples", "research_config.json")
+
+
+class TestModeration(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        df = pd.read_csv(EXAMPLE_DATA_FILE).set_index(["company_id", "year"])
+        df.loc[df.index[::9], "company_age"] = np.nan
+        cls.df = df
+        with open(RESEARCH_CONFIG_FILE) as f:
+            cls.config_data = json.load(f)
+
+    def config(self, moderating_var: str, **kwargs) -> RegressionConfig:
+        return RegressionConfig(
+            dependent_vars=["stock_revenue"],
+            independent_vars=["extreme_temperature"],
+            control_vars=["company_size", "rain_amount"],
+            effects=["entity", "time"],
+            moderating_var=moderating_var,
+            **kwargs,
+        )
+
+    def test_generated_configs(self):
+        """One moderating spec per moderator, centered when asked"""
+        research_config = ResearchConfig(
+            **self.config_data,
+            moderating_vars=["company_age", "dry_amount"],
+            moderating_vars_description=["age", "dry days"],
+            center_moderating_vars=True,
+        )
+        configs = [
+            config
+            for config in research_config.generate_regression_configs().values()
+            if config.moderating_var
+        ]
+        self.assertEqual(
+            [config.moderating_var for config in configs], ["company_age", "dry_amount"]
+        )
+        self.assertTrue(all(config.moderation_centered for config in configs))
+        self.assertEqual(configs[0].regression_type, "moderating_effect")
+
+    def test_matches_explicit_interaction(self):
+        """x, m and x:m as if the product were a column; df is unchanged"""
+        columns = list(self.df.columns)
+        sample = self.df.dropna()
+        x = sample["extreme_temperature"]
+        m = sample["company_age"]
+        for estimator in ["panelols", "absorb"]:
+            for centered in [False, True]:
+                config = self.config(
+                    "company_age", estimator=estimator, moderation_centered=centered
+                )
+                result = run_regressions(self.df, {"moderation": config})[0]
+                self.assertEqual(list(self.df.columns), columns)
+                fitted = result.results[-1]
+                self.assertEqual(
+                    list(fitted.params.index[:3]),
+                    [
+                        "extreme_temperature",
+                        "company_age",
+                        "extreme_temperature:company_age",
+                    ],
+                )
+
+                # the fully centered model: x - mean, m - mean and their product
+                xc, mc = (x - x.mean(), m - m.mean()) if centered else (x, m)
+                explicit = sample.assign(x=xc, m=mc, xm=xc * mc)
+                expected = fit_regression(
+                    explicit,
+                    "stock_revenue",
+                    ["x", "m", "xm", "company_size", "rain_amount"],
+                    config.model_copy(update={"moderating_var": ""}),
+                )
+                np.testing.assert_allclose(
+                    fitted.params.iloc[:3], expected.params.iloc[:3], rtol=1e-7
+                )
+                np.testing.assert_allclose(
+                    fitted.std_errors.iloc[:3], expected.std_errors.iloc[:3], rtol=1e-7
+                )
+                self.assertEqual(fitted.nobs, expected.nobs)
+
+    def test_shared_columns_demeaned_once(self):
+        """Moderators on one sample share the demeaned x and controls"""
+        moderators = ["dry_amount", "windy", "company_distance_to_sea"]
+        configs = {
+            m: self.config(m, estimator="absorb", moderation_centered=True)
+            for m in moderators
+        }
+        cache = DemeanCache()
+        results = run_regressions(self.df, configs, cache=cache)
+        self.assertEqual(len(results), 3)
+        # y, x and two controls, then the moderator and x:m of each spec
+        self.assertEqual(cache.stats()["misses"], 4 + 2 * len(moderators))
+        self.assertEqual(cache.stats()["hits"], 4 * (len(moderators) - 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
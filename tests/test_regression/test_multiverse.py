@@ -0,0 +1,130 @@
+import json
+import os
+from pathlib import Path
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from auto_reg.regression.multiverse import (
+    iter_multiverse,
+    multiverse_grid,
+    run_multiverse,
+)
+from auto_reg.regression.panel_data import fit_regression
+from auto_reg.regression.parallel import parallel_imap
+from auto_reg.regression.regression_config import RegressionConfig, ResearchConfig
+
+ROOT = Path(__file__).resolve().parents[2]
+EXAMPLE_DATA_FILE = os.path.join(ROOT, "test_data", "example_data.csv")
+RESEARCH_CONFIG_FILE = os.path.join(ROOT, "examples", "research_config.json")
+
+
+class TestMultiverse(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        df = pd.read_csv(EXAMPLE_DATA_FILE).set_index(["company_id", "year"])
+        df.loc[df.index[::13], "company_age"] = np.nan
+        cls.df = df
+        with open(RESEARCH_CONFIG_FILE) as f:
+            config_data = json.load(f)
+        cls.research_config = ResearchConfig(**config_data)
+
+    def test_grid(self):
+        """Every control subset for every outcome and effects alternative"""
+        grid = multiverse_grid(self.research_config)
+        ncontrols = len(self.research_config.control_vars)
+        outcomes = (
+            self.research_config.dependent_vars
+            + self.research_config.replacement_y_vars
+        )
+        self.assertEqual(len(grid), (1 << ncontrols) * 2 * len(outcomes))
+        self.assertEqual(grid["controls_mask"].nunique(), 1 << ncontrols)
+        self.assertEqual(set(grid["effects"]), {"entity+time", "time+industry"})
+        grid = multiverse_grid(self.research_config, min_controls=ncontrols - 1)
+        self.assertEqual(grid["n_controls"].min(), ncontrols - 1)
+
+    def test_matches_absorb_fits(self):
+        """Sub-block solves match fitting each spec on the common sample"""
+        controls = self.research_config.control_vars
+        sample = self.df.dropna(
+            subset=["stock_revenue", "extreme_temperature"] + controls
+        )
+        for cov_type in ["clustered", "unadjusted"]:
+            research_config = self.research_config.model_copy(
+                update={"cov_type": cov_type}
+            )
+            results = run_multiverse(self.df, research_config)
+            self.assertEqual(len(results), len(multiverse_grid(research_config)))
+            for spec in [0, 5, 31, 32 + 18]:
+                row = results.iloc[spec]
+                config = RegressionConfig(
+                    dependent_vars=[row["outcome"]],
+                    independent_vars=["extreme_temperature"],
+                    control_vars=row["controls"].split("+") if row["controls"] else [],
+                    effects=row["effects"].split("+"),
+                    estimator="absorb",
+                    cov_type=cov_type,
+                )
+                expected = fit_regression(
+                    sample,
+                    row["outcome"],
+                    config.independent_vars + config.control_vars,
+                    config,
+                )
+                self.assertEqual(row["nobs"], expected.nobs)
+                self.assertEqual(row["df_resid"], expected.df_resid)
+                self.assertAlmostEqual(
+                    row["estimate"], expected.params["extreme_temperature"]
+                )
+                self.assertAlmostEqual(
+                    row["std_error"], expected.std_errors["extreme_temperature"]
+                )
+                self.assertAlmostEqual(
+                    row["pvalue"], expected.pvalues["extreme_temperature"]
+                )
+                self.assertAlmostEqual(row["rsquared"], expected.rsquared)
+
+    def test_file_and_workers(self):
+        """Blocks streamed to a file by a process pool equal the serial fits"""
+        grid = multiverse_grid(self.research_config, min_controls=4)
+        serial = run_multiverse(self.df, self.research_config, grid=grid)
+        with tempfile.TemporaryDirectory() as tmp:
+            for name in ["multiverse.parquet", "multiverse.arrow"]:
+                path = run_multiverse(
+                    self.df,
+                    self.research_config,
+                    os.path.join(tmp, name),
+                    grid=grid,
+                    workers=2,
+                )
+                if path.suffix == ".parquet":
+                    stored = pd.read_parquet(path)
+                else:
+                    stored = pd.read_feather(path)
+                pd.testing.assert_frame_equal(stored, serial, check_dtype=False)
+
+    def test_one_block_on_workers(self):
+        """A grid of one block is split into chunks that the pool streams"""
+        grid = multiverse_grid(
+            self.research_config,
+            outcomes=["stock_revenue"],
+            effects_sets=[["entity", "time"]],
+        )
+        serial = run_multiverse(self.df, self.research_config, grid=grid)
+        with mock.patch(
+            "auto_reg.regression.multiverse.parallel_imap", wraps=parallel_imap
+        ) as pool:
+            chunks = list(
+                iter_multiverse(
+                    self.df, self.research_config, grid, workers=2, chunk_size=10
+                )
+            )
+        self.assertEqual(pool.call_count, 1)
+        self.assertEqual(len(chunks), -(-len(grid) // 10))
+        self.assertTrue(all(len(chunk) <= 10 for chunk in chunks))
+        pd.testing.assert_frame_equal(
+            pd.concat(chunks, ignore_index=True), serial, check_dtype=False
+        )
@@ -0,0 +1,143 @@
+import os
+from pathlib import Path
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from auto_reg.regression.panel_data import (
+    fit_regression,
+    group_regression,
+    run_regressions,
+)
+from auto_reg.regression.panel_frame import PanelFrame
+from auto_reg.regression.regression_config import RegressionConfig
+
+ROOT = Path(__file__).resolve().parents[2]
+EXAMPLE_DATA_FILE = os.path.join(ROOT, "test_data", "example_data.csv")
+
+
+class TestPanelFrame(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        df = pd.read_csv(EXAMPLE_DATA_FILE)
+        df["region"] = "r" + ((df["company_id"] + df["year"]) % 5).astype(str)
+        df.loc[df.index[::17], "region"] = None
+        # shuffled rows, so the entity order differs from the row order
+        df = df.sample(frac=1, random_state=0)
+        cls.df = df.set_index(["company_id", "year"])
+
+    def config(self, **kwargs) -> RegressionConfig:
+        return RegressionConfig(
+            dependent_vars=["stock_revenue"],
+            independent_vars=["extreme_temperature"],
+            control_vars=["company_size", "rain_amount"],
+            **kwargs,
+        )
+
+    def test_codes_and_entity_rows(self):
+        """Codes group the rows like the labels; entity slices are its rows"""
+        panel = PanelFrame(self.df, ["industry", "region"])
+        for name, labels in [
+            ("entity", self.df.index.get_level_values(0)),
+            ("time", self.df.index.get_level_values(1)),
+            ("industry", self.df["industry"]),
+            ("region", self.df["region"]),
+        ]:
+            codes = panel.codes[name]
+            self.assertEqual(codes.dtype, np.int32)
+            expected = pd.factorize(labels, sort=True)[0]
+            np.testing.assert_array_equal(codes, expected)
+            np.testing.assert_array_equal(
+                panel.counts[name], np.bincount(expected[expected >= 0])
+            )
+        self.assertEqual((panel.codes["region"] == -1).sum(), len(self.df[::17]))
+
+        entities = panel.levels["entity"]
+        for i in [0, 7, len(entities) - 1]:
+            rows = panel.entity_rows(i)
+            expected = np.flatnonzero(self.df.index.get_level_values(0) == entities[i])
+            self.assertEqual(sorted(rows), sorted(expected))
+            years = self.df.index.get_level_values(1)[rows]
+            self.assertTrue(years.is_monotonic_increasing)
+
+        subset = panel.take(np.arange(0, len(self.df), 3))
+        np.testing.assert_array_equal(
+            subset.codes["industry"], panel.codes["industry"][::3]
+        )
+        self.assertEqual(subset.counts["industry"].sum(), len(subset))
+
+    def test_fits_match_labels(self):
+        """Fits reading the codes match fits encoding the labels"""
+        df = self.df.dropna()
+        panel = PanelFrame(df, ["industry", "region"])
+        configs = [
+            self.config(effects=["entity", "region"], cov_type="clustered:industry"),
+            self.config(effects=["time"], cov_type="clustered:region"),
+            self.config(
+                effects=["entity", "time", "region"],
+                estimator="absorb",
+                cov_type="clustered:entity,industry",
+            ),
+        ]
+        for config in configs:
+            exog_vars = config.independent_vars + config.control_vars
+            expected = fit_regression(df, "stock_revenue", exog_vars, config)
+            result = fit_regression(df, "stock_revenue", exog_vars, config, panel=panel)
+            np.testing.assert_allclose(result.params, expected.params)
+            np.testing.assert_allclose(result.std_errors, expected.std_errors)
+            self.assertEqual(result.nobs, expected.nobs)
+
+    def test_missing_labels(self):
+        """Rows with a missing effect or cluster label are left out of the fit"""
+        panel = PanelFrame(self.df, ["industry", "region", "is_high_tech"])
+        labelled = self.df.dropna(subset=["region"])
+        for config in [
+            self.config(effects=["entity", "region"]),
+            self.config(effects=["time"], cov_type="clustered:region"),
+        ]:
+            exog_vars = config.independent_vars + config.control_vars
+            expected = fit_regression(labelled, "stock_revenue", exog_vars, config)
+            for result in [
+                fit_regression(self.df, "stock_revenue", exog_vars, config),
+                fit_regression(
+                    self.df, "stock_revenue", exog_vars, config, panel=panel
+                ),
+            ]:
+                self.assertEqual(result.nobs, expected.nobs)
+                np.testing.assert_allclose(result.params, expected.params)
+
+            # the group fits read the same codes as run_regressions
+            grouped = config.model_copy(update={"group_var": "is_high_tech"})
+            (result,) = run_regressions(self.df, {"group": grouped})
+            direct = group_regression(self.df, grouped, panel=panel)
+            self.assertEqual(
+                [fit.nobs for fit in direct], [fit.nobs for fit in result.results]
+            )
+            for fit, expected in zip(direct, result.results):
+                np.testing.assert_allclose(fit.params, expected.params)
+
+    def test_labels_hashed_once(self):
+        """run_regressions factorizes each label column once"""
+        configs = {
+            "basic": self.config(
+                effects=["entity", "region"],
+                estimator="absorb",
+                cov_type="clustered:industry",
+            ),
+            "group": self.config(
+                effects=["entity", "time"],
+                estimator="absorb",
+                group_var="is_high_tech",
+                group_interacted=True,
+            ),
+            "iv": self.config(
+                effects=["entity", "region"],
+                instrument_var="company_latitude",
+                cov_type="clustered:industry",
+            ),
+        }
+        with mock.patch("pandas.factorize", wraps=pd.factorize) as factorize:
+            run_regressions(self.df, configs)
+        self.assertEqual(factorize.call_count, 3)  # region, industry, is_high_tech
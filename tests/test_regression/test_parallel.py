@@ -0,0 +1,51 @@
+import json
+import os
+from pathlib import Path
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from auto_reg.regression.panel_data import run_regressions
+from auto_reg.regression.parallel import SharedPanel, attach_panel
+from auto_reg.regression.regression_config import ResearchConfig
+
+ROOT = Path(__file__).resolve().parents[2]
+EXAMPLE_DATA_FILE = os.path.join(ROOT, "test_data", "example_data.csv")
+RESEARCH_CONFIG_FILE = os.path.join(ROOT, "examples", "research_config.json")
+
+
+class TestParallel(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.df = pd.read_csv(EXAMPLE_DATA_FILE).set_index(["company_id", "year"])
+        with open(RESEARCH_CONFIG_FILE) as f:
+            cls.research_config = ResearchConfig(**json.load(f))
+
+    def test_shared_panel_round_trip(self):
+        """Attached frame has the same data and index, backed by shared memory"""
+        with SharedPanel(self.df) as panel:
+            df, blocks = attach_panel(panel.spec)
+            pd.testing.assert_frame_equal(df, self.df)
+            buffer = np.frombuffer(blocks[0].buf, dtype=np.uint8)
+            self.assertTrue(np.shares_memory(df["stock_revenue"].to_numpy(), buffer))
+            del df, buffer
+            for block in blocks:
+                block.close()
+
+    def test_workers_match_serial(self):
+        """Process pool returns the same results in the original order"""
+        configs = self.research_config.generate_regression_configs()
+        serial = run_regressions(self.df, configs)
+        parallel = run_regressions(self.df, configs, workers=2)
+        self.assertEqual(len(serial), len(parallel))
+        for expected, result in zip(serial, parallel):
+            self.assertEqual(expected.description, result.description)
+            self.assertEqual(expected.regression_type, result.regression_type)
+            for exp, res in zip(expected.results, result.results):
+                np.testing.assert_allclose(res.params, exp.params)
+                np.testing.assert_allclose(res.std_errors, exp.std_errors)
+
+
+if __name__ == "__main__":
+    unittest.main()
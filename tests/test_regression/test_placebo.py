@@ -0,0 +1,128 @@
+import os
+from pathlib import Path
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from auto_reg.regression.absorb import effect_codes
+from auto_reg.regression.panel_data import fit_regression, run_regression
+from auto_reg.regression.placebo import (
+    block_indices,
+    placebo_regression,
+    within_indices,
+)
+from auto_reg.regression.regression_config import RegressionConfig
+
+ROOT = Path(__file__).resolve().parents[2]
+EXAMPLE_DATA_FILE = os.path.join(ROOT, "test_data", "example_data.csv")
+
+
+class TestPlacebo(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        df = pd.read_csv(EXAMPLE_DATA_FILE).set_index(["company_id", "year"])
+        # missing values leave an unbalanced panel
+        df["rain_gaps"] = df["rain_amount"]
+        df.loc[df.index[::11], "rain_gaps"] = np.nan
+        cls.df = df
+
+    def config(self, **kwargs) -> RegressionConfig:
+        return RegressionConfig(
+            dependent_vars=["stock_revenue"],
+            independent_vars=["extreme_temperature"],
+            control_vars=["company_size", "rain_amount"],
+            estimator="absorb",
+            **kwargs,
+        )
+
+    def test_indices_stay_in_strata(self):
+        """Row permutations keep strata; block permutations keep periods"""
+        rng = np.random.default_rng(0)
+        codes = effect_codes(["entity", "time"], self.df)
+        entity, time = codes["entity"], codes["time"]
+        indices = within_indices(rng, 30, time)
+        np.testing.assert_array_equal(
+            time[indices], np.broadcast_to(time, (30, len(time)))
+        )
+        np.testing.assert_array_equal(np.sort(indices, axis=1)[0], np.arange(len(time)))
+        self.assertFalse((indices == np.arange(len(time))).all())
+
+        # drop some rows so that entities differ in their periods
+        keep = np.flatnonzero((entity % 7 != 0) | (time > 2))
+        indices = block_indices(rng, 30, entity[keep], time[keep])
+        np.testing.assert_array_equal(
+            time[keep][indices], np.broadcast_to(time[keep], (30, len(keep)))
+        )
+        donors = entity[keep][indices]
+        for e in [0, 7, 13]:
+            rows = entity[keep] == e
+            # every row of an entity takes the path of one donor entity
+            self.assertTrue((donors[:, rows] == donors[:, rows][:, :1]).all())
+
+    def test_matches_refits(self):
+        """Placebo coefficients equal refits on the permuted treatment"""
+        draws = 8
+        for effects, strata, controls in [
+            (["entity", "time"], "time", ["company_size", "rain_amount"]),
+            (["entity", "time"], "entity", ["company_size", "rain_gaps"]),
+            (["entity"], "entity_blocks", ["rain_gaps"]),
+            (["time"], "industry", ["company_size"]),
+            ([], None, ["company_size", "rain_amount"]),
+        ]:
+            config = self.config(effects=effects).model_copy(
+                update={"control_vars": controls}
+            )
+            result = run_regression(self.df, "basic", config)
+            placebo = placebo_regression(
+                self.df, result, strata=strata, seed=3, draws=draws
+            )
+            fitted = result.results[-1]
+            self.assertAlmostEqual(
+                placebo.estimate, fitted.params["extreme_temperature"]
+            )
+            self.assertEqual(placebo.placebo.shape, (draws,))
+            self.assertTrue(1 / (draws + 1) <= placebo.pvalue <= 1)
+
+            # the same permutations, drawn from the same seed
+            rng = np.random.default_rng(np.random.SeedSequence(3).spawn(1)[0])
+            sample = self.df.iloc[self.df.index.get_indexer(fitted.fitted_values.index)]
+            if strata == "entity_blocks":
+                codes = effect_codes(["entity", "time"], sample)
+                indices = block_indices(rng, draws, codes["entity"], codes["time"])
+            elif strata is None:
+                indices = within_indices(rng, draws, np.zeros(len(sample), dtype=int))
+            else:
+                indices = within_indices(
+                    rng, draws, effect_codes([strata], sample)[strata]
+                )
+            x = sample["extreme_temperature"].to_numpy()
+            for d in [0, draws - 1]:
+                permuted = sample.assign(extreme_temperature=x[indices[d]])
+                refit = fit_regression(
+                    permuted,
+                    "stock_revenue",
+                    config.independent_vars + config.control_vars,
+                    config,
+                )
+                self.assertAlmostEqual(
+                    placebo.placebo[d], refit.params["extreme_temperature"]
+                )
+
+    def test_workers_and_summary(self):
+        """Permutations split across processes; the p-value is uniform-ish"""
+        result = run_regression(
+            self.df, "basic", self.config(effects=["entity", "time"])
+        )
+        placebo = placebo_regression(
+            self.df, result, strata="entity", draws=400, seed=1, workers=2
+        )
+        self.assertEqual(len(placebo.placebo), 400)
+        self.assertEqual(placebo.nstrata, 100)
+        expected = (np.sum(np.abs(placebo.placebo) >= abs(placebo.estimate)) + 1) / 401
+        self.assertAlmostEqual(placebo.pvalue, expected)
+        self.assertIn("Placebo", str(placebo))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,139 @@
+import os
+from pathlib import Path
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from auto_reg.regression.panel_data import (
+    clean_group,
+    fit_regression,
+    run_regressions,
+)
+from auto_reg.regression.panel_frame import PanelFrame
+from auto_reg.regression.prepass import DesignPrepass, drop_singletons
+from auto_reg.regression.regression_config import RegressionConfig
+
+ROOT = Path(__file__).resolve().parents[2]
+EXAMPLE_DATA_FILE = os.path.join(ROOT, "test_data", "example_data.csv")
+
+
+class TestPrepass(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        df = pd.read_csv(EXAMPLE_DATA_FILE)
+        # firms 0-4 keep one year; firm 5 keeps years 8 and 9, and is the only
+        # firm in year 9, so dropping that year leaves it a singleton too
+        firm, year = df["company_id"], df["year"]
+        df = df[
+            ((firm < 5) & (year == firm))
+            | ((firm == 5) & (year >= 8))
+            | ((firm > 5) & (year < 9))
+        ]
+        df = df.set_index(["company_id", "year"])
+        df["is_high_tech"] = df["is_high_tech"].astype(float)
+        df["size_and_rain"] = df["company_size"] + 2 * df["rain_amount"]
+        df.loc[df.index[20::17], "rain_amount"] = np.nan
+        cls.df = df
+
+    def config(self, **kwargs) -> RegressionConfig:
+        return RegressionConfig(
+            dependent_vars=["stock_revenue"],
+            independent_vars=["extreme_temperature"],
+            control_vars=[
+                "company_size",
+                "is_high_tech",
+                "rain_amount",
+                "size_and_rain",
+            ],
+            effects=["entity", "time"],
+            run_another_regression_without_controls=False,
+            **kwargs,
+        )
+
+    def test_drop_singletons(self):
+        """Singletons are dropped until none is left"""
+        entity = np.array([0, 0, 1, 1, 2, 2, 3])
+        time = np.array([0, 1, 0, 1, 0, 2, 1])
+        keep, dropped, sweeps = drop_singletons([entity, time], np.ones(7, dtype=bool))
+        # entity 3 and time 2 go first, which leaves entity 2 with one row
+        np.testing.assert_array_equal(keep, [1, 1, 1, 1, 0, 0, 0])
+        self.assertEqual(dropped, [2, 1])
+        self.assertEqual(sweeps, 3)
+        keep, dropped, _ = drop_singletons(
+            [entity], np.array([1, 1, 1, 0, 1, 1, 1], dtype=bool)
+        )
+        np.testing.assert_array_equal(keep, [1, 1, 0, 0, 1, 1, 0])
+        self.assertEqual(dropped, [2])
+
+    def test_inputs_unchanged(self):
+        """The caller's sample stays writeable; a group shares its regressors"""
+        panel = PanelFrame(self.df)
+        sample = np.ones(len(self.df), dtype=bool)
+        for prepass in [DesignPrepass(singletons=False), DesignPrepass()]:
+            keep, _, _ = prepass.sample(sample, ["entity"], panel)
+            self.assertTrue(sample.flags.writeable)
+            self.assertFalse(keep.flags.writeable)
+        DesignPrepass().sample(sample, [], panel)
+        self.assertTrue(sample.flags.writeable)
+
+        config = self.config(estimator="absorb")
+        other = config.model_copy(update={"control_vars": ["company_size"]})
+        with self.assertRaises(ValueError):
+            clean_group(self.df, [("a", config), ("b", other)], panel, DesignPrepass())
+
+    def test_cleaned_design(self):
+        """Specs fit on the cleaned design, computed once and reported"""
+        configs = {
+            "absorb": self.config(estimator="absorb"),
+            "panelols": self.config(),
+            "robust": self.config(estimator="absorb", cov_type="robust"),
+        }
+        prepass = DesignPrepass()
+        results = run_regressions(self.df, configs, prepass=prepass)
+        self.assertEqual(len(prepass), 1)
+        (report,) = prepass.reports()
+        self.assertEqual(report.absorbed, ["is_high_tech"])
+        self.assertEqual(report.collinear, ["size_and_rain"])
+        self.assertEqual(report.singletons, {"entity": 6, "time": 1})
+        self.assertEqual(report.sweeps, 3)
+        self.assertIn("is_high_tech", str(report))
+
+        sample = self.df.dropna(subset=["rain_amount"])
+        rows = sample.index.get_level_values(0) > 5
+        expected_config = configs["absorb"].model_copy(
+            update={"control_vars": ["company_size", "rain_amount"]}
+        )
+        for result in results:
+            self.assertIs(result.design, report)
+            self.assertEqual(
+                result.regression_config.control_vars, ["company_size", "rain_amount"]
+            )
+            (fit,) = result.results
+            self.assertEqual(fit.nobs, rows.sum())
+            config = expected_config.model_copy(
+                update={
+                    "estimator": result.regression_config.estimator,
+                    "cov_type": result.regression_config.cov_type,
+                }
+            )
+            exog = ["extreme_temperature", "company_size", "rain_amount"]
+            cleaned = fit_regression(sample[rows], "stock_revenue", exog, config)
+            np.testing.assert_allclose(fit.params, cleaned.params, rtol=1e-6)
+            np.testing.assert_allclose(fit.std_errors, cleaned.std_errors, rtol=1e-6)
+            # singletons do not move the slopes, only the constant
+            full = fit_regression(sample, "stock_revenue", exog, config)
+            np.testing.assert_allclose(fit.params[exog], full.params[exog], rtol=1e-6)
+
+        # the workers reuse the designs cleaned before the pool starts
+        pooled = DesignPrepass()
+        parallel = run_regressions(self.df, configs, workers=2, prepass=pooled)
+        self.assertEqual(pooled.reports(), prepass.reports())
+        for result, expected in zip(parallel, results):
+            np.testing.assert_allclose(
+                result.results[0].params, expected.results[0].params
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,123 @@
+import json
+import os
+from pathlib import Path
+import re
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from auto_reg.regression.panel_data import run_regressions
+from auto_reg.regression.regression_config import ResearchConfig
+from auto_reg.regression.result_cache import CompactResults, ResultCache
+
+ROOT = Path(__file__).resolve().parents[2]
+EXAMPLE_DATA_FILE = os.path.join(ROOT, "test_data", "example_data.csv")
+RESEARCH_CONFIG_FILE = os.path.join(ROOT, "examples", "research_config.json")
+
+# header fields of a summary, as (label, value)
+SUMMARY_FIELD = re.compile(
+    r"(Cov\. Estimator|Estimator|R-squared(?: \(\w+\))?):\s+(\S+)"
+)
+
+
+def summary_fields(result) -> dict[str, str]:
+    return dict(SUMMARY_FIELD.findall(str(result)))
+
+
+class TestResultCache(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.df = pd.read_csv(EXAMPLE_DATA_FILE).set_index(["company_id", "year"])
+        with open(RESEARCH_CONFIG_FILE) as f:
+            cls.config_data = json.load(f)
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def configs(self, **changes):
+        research_config = ResearchConfig(**{**self.config_data, **changes})
+        return research_config.generate_regression_configs()
+
+    def test_rerun_hits(self):
+        """A rerun reads every spec from disk with the same statistics"""
+        configs = self.configs()
+        cache = ResultCache(self.tmp.name)
+        fitted = run_regressions(self.df, configs, result_cache=cache)
+        self.assertEqual(cache.stats()["misses"], len(configs))
+        self.assertEqual(len(cache), len(configs))
+
+        cache = ResultCache(self.tmp.name)
+        cached = run_regressions(self.df, configs, result_cache=cache)
+        self.assertEqual(cache.stats()["hits"], len(configs))
+        for fresh, stored in zip(fitted, cached):
+            self.assertEqual(fresh.description, stored.description)
+            self.assertEqual(fresh.regression_type, stored.regression_type)
+            for res, compact in zip(fresh.results, stored.results):
+                np.testing.assert_allclose(compact.params, res.params)
+                np.testing.assert_allclose(compact.std_errors, res.std_errors)
+                np.testing.assert_allclose(compact.pvalues, res.pvalues, atol=1e-12)
+                self.assertAlmostEqual(compact.rsquared, res.rsquared)
+                self.assertEqual(compact.nobs, res.nobs)
+            if isinstance(stored.results[0], CompactResults):
+                self.assertEqual(
+                    stored.results[0].rsquared_overall,
+                    fresh.results[0].rsquared_overall,
+                )
+
+    def test_summary_labels(self):
+        """A cached result prints the estimator and R-squared of the fresh one"""
+        configs = self.configs()
+        cache = ResultCache(self.tmp.name)
+        fitted = run_regressions(self.df, configs, result_cache=cache)
+        cached = run_regressions(self.df, configs, result_cache=cache)
+        for fresh, stored in zip(fitted, cached):
+            for res, compact in zip(fresh.results, stored.results):
+                fields = summary_fields(compact)
+                self.assertEqual(fields, summary_fields(res))
+                if isinstance(compact, CompactResults):
+                    self.assertEqual(fields["Cov. Estimator"], "Clustered")
+                    self.assertNotIn("MAP", str(compact))
+
+    def test_changed_specs_and_columns(self):
+        """Only the specs whose config or columns changed are refitted"""
+        cache = ResultCache(self.tmp.name)
+        run_regressions(self.df, self.configs(), result_cache=cache)
+
+        configs = self.configs(extra_control_vars=["windy", "company_latitude"])
+        changed = set(configs) - set(self.configs())
+        cache = ResultCache(self.tmp.name)
+        run_regressions(self.df, configs, result_cache=cache)
+        self.assertGreater(cache.hits, 0)
+        self.assertEqual(cache.misses, len(changed))
+
+        df = self.df.copy()
+        df["windy"] = df["windy"] * 2
+        users = [
+            description
+            for description, config in configs.items()
+            if "windy" in config.control_vars
+        ]
+        cache = ResultCache(self.tmp.name)
+        run_regressions(df, configs, result_cache=cache)
+        self.assertEqual(cache.misses, len(users))
+
+    def test_lru_eviction(self):
+        """The least recently used entries go first"""
+        cache = ResultCache(self.tmp.name)
+        for i, key in enumerate(["a", "b", "c"]):
+            cache.put(key, {"entry": key, "payload": np.zeros(100)})
+            os.utime(cache.path / f"{key}.pkl", (i, i))
+        cache.get("a")  # now the most recently used
+        size = os.path.getsize(cache.path / "a.pkl")
+        cache.max_bytes = 2 * size
+        self.assertEqual(cache.evict(), 1)
+        self.assertIsNone(cache.get("b"))
+        self.assertIsNotNone(cache.get("a"))
+        self.assertIsNotNone(cache.get("c"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,117 @@
+import json
+import os
+from pathlib import Path
+import re
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from auto_reg.regression.panel_data import run_regressions
+from auto_reg.regression.prepass import DesignPrepass
+from auto_reg.regression.regression_config import ResearchConfig
+from auto_reg.regression.result_store import ResultStore, store_regressions
+
+ROOT = Path(__file__).resolve().parents[2]
+EXAMPLE_DATA_FILE = os.path.join(ROOT, "test_data", "example_data.csv")
+RESEARCH_CONFIG_FILE = os.path.join(ROOT, "examples", "research_config.json")
+
+# header fields of a summary, as (label, value)
+SUMMARY_FIELD = re.compile(
+    r"(Cov\. Estimator|Estimator|R-squared(?: \(\w+\))?):\s+(\S+)"
+)
+
+
+class TestResultStore(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        df = pd.read_csv(EXAMPLE_DATA_FILE).set_index(["company_id", "year"])
+        # rows missing only a control stay in the regressions without controls
+        df.loc[df.index[::13], "company_size"] = np.nan
+        cls.df = df
+        with open(RESEARCH_CONFIG_FILE) as f:
+            research_config = ResearchConfig(**json.load(f))
+        cls.configs = research_config.generate_regression_configs()
+        cls.full = run_regressions(cls.df, cls.configs)
+        cls.store = store_regressions(cls.df, cls.configs)
+
+    def test_matches_full_results(self):
+        """Results rebuilt from the store equal the full results"""
+        self.assertEqual(len(self.store), len(self.configs))
+        for key, full in zip(self.configs, self.full):
+            stored = self.store.regression_result(key)
+            self.assertEqual(stored.description, full.description)
+            self.assertEqual(stored.regression_type, full.regression_type)
+            self.assertEqual(len(stored.results), len(full.results))
+            for compact, result in zip(stored.results, full.results):
+                np.testing.assert_allclose(compact.params, result.params)
+                np.testing.assert_allclose(compact.cov, result.cov)
+                np.testing.assert_allclose(compact.std_errors, result.std_errors)
+                self.assertEqual(compact.nobs, result.nobs)
+                self.assertAlmostEqual(compact.rsquared, result.rsquared)
+                if hasattr(result, "rsquared_overall"):
+                    self.assertAlmostEqual(
+                        compact.rsquared_overall, result.rsquared_overall
+                    )
+
+    def test_summary_labels(self):
+        """Compact and stored results print the labels of the full results"""
+        compact = run_regressions(self.df, self.configs, compact=True)
+        for key, full, short in zip(self.configs, self.full, compact):
+            stored = self.store.regression_result(key)
+            for result, *copies in zip(full.results, short.results, stored.results):
+                expected = dict(SUMMARY_FIELD.findall(str(result)))
+                for copy in copies:
+                    self.assertEqual(dict(SUMMARY_FIELD.findall(str(copy))), expected)
+                    if expected["Estimator"] == "PanelOLS":
+                        self.assertNotIn("MAP", str(copy))
+
+    def test_tables(self):
+        """The wide tables hold every term, NaN where a result lacks it"""
+        params = self.store.params_table()
+        std_errors = self.store.std_errors_table()
+        self.assertEqual(params.shape, (len(self.store.rows), len(self.store.terms)))
+        first = self.full[0].results[0]
+        row = params.iloc[0].dropna()
+        self.assertEqual(list(row.index), list(first.params.index))
+        np.testing.assert_allclose(row, first.params)
+        np.testing.assert_allclose(std_errors.iloc[0].dropna(), first.std_errors)
+
+    def test_size_and_materialize(self):
+        """The store does not grow with the rows; full results on demand"""
+        bigger = pd.concat(
+            [
+                self.df,
+                self.df.set_axis(
+                    self.df.index.set_levels(self.df.index.levels[0] + 1000, level=0)
+                ),
+            ]
+        )
+        store = ResultStore(self.configs, run_regressions(bigger, self.configs), bigger)
+        self.assertEqual(store.nbytes, self.store.nbytes)
+        self.assertLess(self.store.nbytes, 100_000)
+
+        key = next(iter(self.configs))
+        full = self.store.materialize(key, self.df)
+        self.assertIsNotNone(full.results[0].model)
+        with self.assertRaises(ValueError):
+            ResultStore(self.configs, self.full)
+
+    def test_materialize_matches_store(self):
+        """Refitted specs reproduce the stored coefficients and samples"""
+        prepass = DesignPrepass()
+        store = store_regressions(self.df, self.configs, prepass=prepass)
+        for stored_store in [self.store, store]:
+            for key in self.configs:
+                stored = stored_store.regression_result(key)
+                full = stored_store.materialize(key, self.df)
+                self.assertEqual(full.design, stored.design)
+                self.assertEqual(len(full.results), len(stored.results))
+                for result, compact in zip(full.results, stored.results):
+                    self.assertEqual(result.nobs, compact.nobs)
+                    np.testing.assert_allclose(result.params, compact.params)
+                    np.testing.assert_allclose(result.std_errors, compact.std_errors)
+
+
+if __name__ == "__main__":
+    unittest.main()
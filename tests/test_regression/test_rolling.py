@@ -0,0 +1,90 @@
+import os
+from pathlib import Path
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from auto_reg.regression.panel_data import fit_regression
+from auto_reg.regression.regression_config import RegressionConfig
+from auto_reg.regression.rolling import rolling_regression
+
+ROOT = Path(__file__).resolve().parents[2]
+EXAMPLE_DATA_FILE = os.path.join(ROOT, "test_data", "example_data.csv")
+
+
+class TestRolling(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        df = pd.read_csv(EXAMPLE_DATA_FILE).set_index(["company_id", "year"])
+        # an unbalanced panel
+        df.loc[df.index[::7], "rain_amount"] = np.nan
+        cls.df = df
+        cls.years = np.sort(df.index.get_level_values(1).unique())
+
+    def config(self, **kwargs) -> RegressionConfig:
+        return RegressionConfig(
+            dependent_vars=["stock_revenue"],
+            independent_vars=["extreme_temperature"],
+            control_vars=["company_size", "rain_amount"],
+            estimator="absorb",
+            **kwargs,
+        )
+
+    def assert_matches_slices(self, rolling, config):
+        exog_vars = config.independent_vars + config.control_vars
+        years = self.df.index.get_level_values(1)
+        for start, end in zip(rolling.starts, rolling.params.index):
+            window = self.df[(years >= start) & (years <= end)].dropna(
+                subset=["stock_revenue"] + exog_vars
+            )
+            expected = fit_regression(window, "stock_revenue", exog_vars, config)
+            np.testing.assert_allclose(
+                rolling.params.loc[end], expected.params[exog_vars], rtol=1e-7
+            )
+            np.testing.assert_allclose(
+                rolling.std_errors.loc[end],
+                expected.std_errors[exog_vars],
+                rtol=1e-7,
+            )
+            self.assertEqual(
+                rolling.nobs[rolling.params.index.get_loc(end)], expected.nobs
+            )
+
+    def test_rolling_matches_slices(self):
+        """Each window equals the fit on the rows of its periods"""
+        for effects, cov_type in [
+            (["entity", "time"], "clustered"),
+            (["entity", "time"], "unadjusted"),
+            (["entity"], "clustered:industry"),
+            (["time"], "clustered:industry"),
+            ([], "clustered"),
+        ]:
+            config = self.config(effects=effects, cov_type=cov_type)
+            rolling = rolling_regression(self.df, config, window=4)
+            self.assertEqual(len(rolling.params), len(self.years) - 3)
+            self.assertEqual(rolling.starts[0], self.years[0])
+            self.assertEqual(rolling.params.index[-1], self.years[-1])
+            self.assert_matches_slices(rolling, config)
+
+    def test_expanding_and_errors(self):
+        """Expanding windows from the first period; unsupported specs raise"""
+        config = self.config(effects=["entity", "time"])
+        expanding = rolling_regression(self.df, config, window=None, min_periods=3)
+        self.assertEqual(len(expanding.params), len(self.years) - 2)
+        self.assertTrue((expanding.starts == self.years[0]).all())
+        self.assertTrue((np.diff(expanding.nobs) > 0).all())
+        self.assert_matches_slices(expanding, config)
+        self.assertIn("Rolling AbsorbingOLS", str(expanding))
+
+        for bad in [
+            self.config(effects=["entity"], cov_type="clustered:time"),
+            self.config(effects=["entity", "industry"]),
+            self.config(effects=["entity"], cov_type="robust"),
+        ]:
+            with self.assertRaises(ValueError):
+                rolling_regression(self.df, bad)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,127 @@
+import json
+import os
+from pathlib import Path
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from auto_reg.regression.panel_data import panel_regression, run_regressions
+from auto_reg.regression.regression_config import RegressionConfig, ResearchConfig
+from auto_reg.regression.streaming import (
+    run_regressions_streaming,
+    streaming_regression,
+)
+
+ROOT = Path(__file__).resolve().parents[2]
+EXAMPLE_DATA_FILE = os.path.join(ROOT, "test_data", "example_data.csv")
+RESEARCH_CONFIG_FILE = os.path.join(ROOT, "examples", "research_config.json")
+INDEX = ["company_id", "year"]
+
+
+class TestStreaming(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.raw = pd.read_csv(EXAMPLE_DATA_FILE)
+        cls.df = cls.raw.set_index(INDEX)
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.csv = os.path.join(cls.tmp.name, "panel.csv")
+        cls.parquet = os.path.join(cls.tmp.name, "panel.parquet")
+        cls.raw.to_csv(cls.csv, index=False)
+        cls.raw.to_parquet(cls.parquet, index=False)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp.cleanup()
+
+    def config(self, effects: list[str], **kwargs) -> RegressionConfig:
+        return RegressionConfig(
+            dependent_vars=["stock_revenue"],
+            independent_vars=["extreme_temperature"],
+            control_vars=["company_size", "rain_amount"],
+            effects=effects,
+            estimator="absorb",
+            run_another_regression_without_controls=True,
+            **kwargs,
+        )
+
+    def assert_same(self, results, expected):
+        self.assertEqual(len(results), len(expected))
+        for res, exp in zip(results, expected):
+            self.assertEqual(res.nobs, exp.nobs)
+            np.testing.assert_allclose(res.params, exp.params, rtol=1e-8, atol=1e-10)
+            np.testing.assert_allclose(
+                res.std_errors, exp.std_errors, rtol=1e-8, atol=1e-10
+            )
+            self.assertAlmostEqual(res.rsquared, exp.rsquared, places=10)
+
+    def test_matches_in_memory(self):
+        """Chunked CSV and Parquet fits equal the in-memory absorb fits"""
+        cases = [
+            (["entity"], "clustered"),
+            (["entity", "time"], "clustered:industry"),
+            (["time", "industry"], "unadjusted"),
+        ]
+        for path in (self.csv, self.parquet):
+            for effects, cov_type in cases:
+                config = self.config(effects, cov_type=cov_type)
+                results = streaming_regression(
+                    path,
+                    "stock_revenue",
+                    ["extreme_temperature", "company_size", "rain_amount"],
+                    effects,
+                    INDEX,
+                    cov_type=cov_type,
+                    chunksize=137,
+                    short_vars=["extreme_temperature"],
+                )
+                self.assert_same(results, panel_regression(self.df, config))
+
+    def test_missing_controls(self):
+        """The model without controls keeps the rows missing a control"""
+        raw = self.raw.copy()
+        raw.loc[::7, "rain_amount"] = np.nan
+        path = os.path.join(self.tmp.name, "missing.csv")
+        raw.to_csv(path, index=False)
+        config = self.config(["entity", "time"])
+        results = streaming_regression(
+            path,
+            "stock_revenue",
+            ["extreme_temperature", "company_size", "rain_amount"],
+            ["entity", "time"],
+            INDEX,
+            chunksize=250,
+            short_vars=["extreme_temperature"],
+        )
+        expected = panel_regression(raw.set_index(INDEX), config)
+        self.assertEqual([r.nobs for r in results], [1000, 857])
+        self.assert_same(results, expected)
+
+    def test_run_regressions_streaming(self):
+        """Basic specs of a research config match run_regressions"""
+        with open(RESEARCH_CONFIG_FILE) as f:
+            research_config = ResearchConfig(**json.load(f), estimator="absorb")
+        configs = {
+            description: config
+            for description, config in (
+                research_config.generate_regression_configs().items()
+            )
+            if not config.instrument_var
+            and not config.group_var
+            and not config.mediating_var
+        }
+        results = run_regressions_streaming(self.parquet, configs, INDEX, chunksize=300)
+        expected = run_regressions(self.df, configs)
+        for res, exp in zip(results, expected):
+            self.assertEqual(res.description, exp.description)
+            self.assert_same(res.results, exp.results)
+
+        with self.assertRaises(ValueError):
+            run_regressions_streaming(
+                self.csv, {"iv": self.config(["entity"], instrument_var="windy")}, INDEX
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+import json
+import os
+from pathlib import Path
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from auto_reg.regression.panel_data import (
+    config_columns,
+    run_regression,
+    run_regressions,
+    short_model_items,
+)
+from auto_reg.regression.regression_config import ResearchConfig
+from auto_reg.regression.validity import ValidityIndex
+
+ROOT = Path(__file__).resolve().parents[2]
+EXAMPLE_DATA_FILE = os.path.join(ROOT, "test_data", "example_data.csv")
+RESEARCH_CONFIG_FILE = os.path.join(ROOT, "examples", "research_config.json")
+
+
+class TestValidityIndex(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        df = pd.read_csv(EXAMPLE_DATA_FILE).set_index(["company_id", "year"])
+        rng = np.random.default_rng(0)
+        for col, share in [("windy", 0.2), ("company_size", 0.05)]:
+            df.loc[rng.random(len(df)) < share, col] = np.nan
+        df.loc[df.index[::23], "stock_revenue_another_measure_method"] = np.nan
+        cls.df = df
+        with open(RESEARCH_CONFIG_FILE) as f:
+            cls.config_data = json.load(f)
+
+    def test_samples(self):
+        """Samples are ANDs of the column bitsets, shared when equal"""
+        validity = ValidityIndex(self.df)
+        self.assertEqual(validity.nbytes, len(self.df.columns) * len(self.df) // 8)
+        columns = ["stock_revenue", "company_size", "windy"]
+        np.testing.assert_array_equal(
+            validity.sample(columns), self.df[columns].notna().all(axis=1)
+        )
+        self.assertEqual(validity.count("windy"), self.df["windy"].notna().sum())
+        # columns without missing values do not change the mask
+        self.assertIs(
+            validity.sample(["company_size", "entity"]),
+            validity.sample(["company_size", "rain_amount"]),
+        )
+        self.assertEqual(validity.shared_samples(), 2)
+
+    def test_specs_keep_their_rows(self):
+        """Each spec is fitted on the rows its own columns leave"""
+        for estimator in ["panelols", "absorb"]:
+            research_config = ResearchConfig(**self.config_data, estimator=estimator)
+            configs = research_config.generate_regression_configs()
+            results = run_regressions(self.df, configs)
+            for (description, config), result in zip(configs.items(), results):
+                # the same fits as on the whole panel, spec by spec
+                expected = run_regression(self.df, description, config)
+                self.assertEqual(len(result.results), len(expected.results))
+                for res, exp in zip(result.results, expected.results):
+                    self.assertEqual(res.nobs, exp.nobs)
+                    np.testing.assert_allclose(res.params, exp.params)
+                    np.testing.assert_allclose(res.std_errors, exp.std_errors)
+                if not short_model_items([(description, config)]):
+                    continue
+                # the model with controls drops the rows its columns miss
+                columns = config_columns(self.df, {description: config})
+                self.assertEqual(
+                    result.results[-1].nobs, len(self.df.dropna(subset=columns))
+                )
+            # rows missing only windy are kept by the specs without it
+            self.assertGreater(results[0].results[1].nobs, len(self.df.dropna()))
+            # and rows missing only company_size by the model without controls
+            without, with_controls = results[0].results
+            self.assertGreater(without.nobs, with_controls.nobs)